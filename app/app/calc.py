@@ -1,7 +1,15 @@
 """
 Calculator functions
+
+The batch functions take NumPy arrays covering many recipes at once.
+Prices are handled as integer cents so sums and scaled prices are exact,
+converted from and to Decimal with `to_cents` and `from_cents`.
 """
 
+from decimal import ROUND_HALF_UP, Decimal
+
+import numpy as np
+
 
 def add(x, y):
     """
@@ -15,3 +23,56 @@ def substract(x, y):
     Substract x from y and return result
     """
     return y - x
+
+
+def to_fixed(values, places):
+    """
+    Convert decimal values to an array of integers counting units of
+    10 ** -places, rounding half up
+    """
+    return np.fromiter(
+        (
+            int(Decimal(value).scaleb(places).to_integral_value(ROUND_HALF_UP))
+            for value in values
+        ),
+        dtype=np.int64,
+    )
+
+
+def to_cents(prices):
+    """
+    Convert decimal prices to an array of integer cents
+    """
+    return to_fixed(prices, 2)
+
+
+def from_cents(cents):
+    """
+    Convert integer cents to a decimal price
+    """
+    return Decimal(int(cents)).scaleb(-2)
+
+
+def total(values, times=None):
+    """
+    Sum values, each counted the given number of times, and return result
+    """
+    values = np.asarray(values, dtype=np.int64)
+    if times is None:
+        return int(values.sum())
+
+    return int(values @ np.asarray(times, dtype=np.int64))
+
+
+def scale(cents, numerators, denominators=1):
+    """
+    Multiply cents by fractions, rounding half up to whole cents
+    """
+    numerators = np.asarray(numerators, dtype=np.int64)
+    denominators = np.asarray(denominators, dtype=np.int64)
+    if np.any(denominators <= 0):
+        raise ValueError("Denominators must be positive")
+
+    products = np.asarray(cents, dtype=np.int64) * numerators
+
+    return (2 * products + denominators) // (2 * denominators)
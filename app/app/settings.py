@@ -43,21 +43,29 @@ INSTALLED_APPS = [
     "core",
     "user",
     "recipe",
+    "benchmarks",
     "rest_framework",
     "rest_framework.authtoken",
     "drf_spectacular",
 ]
 
+# Session, CSRF, authentication, messages and clickjacking middleware is
+# skipped for API paths, see core.middleware.
 MIDDLEWARE = [
+    "core.instrumentation.RequestMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
-    "django.contrib.sessions.middleware.SessionMiddleware",
+    "core.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
-    "django.middleware.csrf.CsrfViewMiddleware",
-    "django.contrib.auth.middleware.AuthenticationMiddleware",
-    "django.contrib.messages.middleware.MessageMiddleware",
-    "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "core.middleware.CsrfViewMiddleware",
+    "core.middleware.AuthenticationMiddleware",
+    "core.profiling.ProfilingMiddleware",
+    "core.middleware.MessageMiddleware",
+    "core.middleware.XFrameOptionsMiddleware",
 ]
 
+# API paths used from a browser, which keep the session middleware.
+API_SESSION_PATHS = ["/api/docs/", "/api/profiles/"]
+
 ROOT_URLCONF = "app.urls"
 
 TEMPLATES = [
@@ -134,6 +142,14 @@ MEDIA_URL = "/static/media/"
 STATIC_ROOT = "/vol/web/static"
 MEDIA_ROOT = "/vol/web/media"
 
+# Media is authorized by the API and sent by nginx from an internal location,
+# runserver has no proxy so it serves the files itself.
+MEDIA_X_ACCEL_REDIRECT = bool(
+    int(os.environ.get("MEDIA_X_ACCEL_REDIRECT", 0 if DEBUG else 1))
+)
+MEDIA_X_ACCEL_REDIRECT_URL = "/protected-media/"
+MEDIA_CACHE_MAX_AGE = int(os.environ.get("MEDIA_CACHE_MAX_AGE", 3600))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
@@ -141,8 +157,102 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 AUTH_USER_MODEL = "core.User"
 
+# Caches. The local memory cache is per process, set CACHE_BACKEND and
+# CACHE_LOCATION to a shared cache, e.g. memcached, to share the tag and
+# ingredient vocabularies and throttling buckets between workers.
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.environ.get("CACHE_LOCATION", ""),
+    }
+}
+
 REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    # Request counters per user and per IP address, see core.throttling.
+    "DEFAULT_THROTTLE_CLASSES": [
+        "core.throttling.UserRateThrottle",
+        "core.throttling.AnonRateThrottle",
+    ],
+    "DEFAULT_THROTTLE_RATES": {
+        "user_read": os.environ.get("THROTTLE_USER_READ", "1200/min"),
+        "user_write": os.environ.get("THROTTLE_USER_WRITE", "300/min"),
+        "user_upload": os.environ.get("THROTTLE_USER_UPLOAD", "120/min"),
+        "anon_read": os.environ.get("THROTTLE_ANON_READ", "300/min"),
+        "anon_write": os.environ.get("THROTTLE_ANON_WRITE", "30/min"),
+        "anon_token": os.environ.get("THROTTLE_ANON_TOKEN", "10/min"),
+    },
+    # Behind the proxy REMOTE_ADDR is the client, X-Forwarded-For is not
+    # to be trusted.
+    "NUM_PROXIES": int(os.environ.get("NUM_PROXIES", 0)),
 }
 
 SPECTACULAR_SETTINGS = {"COMPONENT_SPLIT_REQUSET": True}
+
+# Request instrumentation
+
+# Requests over either budget are logged as warnings.
+REQUEST_QUERY_BUDGET = int(os.environ.get("REQUEST_QUERY_BUDGET", 50))
+REQUEST_LATENCY_BUDGET = int(os.environ.get("REQUEST_LATENCY_BUDGET_MS", 1000))
+REQUEST_SERVER_TIMING = bool(int(os.environ.get("REQUEST_SERVER_TIMING", 1)))
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        # Set REQUEST_LOG_LEVEL=INFO to log every request, not only the
+        # ones over budget.
+        "core.requests": {
+            "handlers": ["console"],
+            "level": os.environ.get("REQUEST_LOG_LEVEL", "WARNING"),
+            "propagate": False,
+        },
+    },
+}
+
+# Slow query log, off unless QUERY_LOG_DIR is set. Thresholds in ms,
+# intervals in seconds.
+QUERY_LOG_DIR = os.environ.get("QUERY_LOG_DIR")
+QUERY_LOG_EXPLAIN_THRESHOLD = int(os.environ.get("QUERY_LOG_EXPLAIN_THRESHOLD", 200))
+QUERY_LOG_EXPLAIN_INTERVAL = int(os.environ.get("QUERY_LOG_EXPLAIN_INTERVAL", 300))
+QUERY_LOG_FLUSH_INTERVAL = int(os.environ.get("QUERY_LOG_FLUSH_INTERVAL", 10))
+
+# Staff requests flagged with X-Profile are run under cProfile, at most
+# PROFILE_MAX_PER_MINUTE per worker and one at a time.
+PROFILE_ROOT = os.environ.get("PROFILE_ROOT", "/vol/profiles")
+PROFILE_MAX_PER_MINUTE = int(os.environ.get("PROFILE_MAX_PER_MINUTE", 6))
+PROFILE_KEEP = int(os.environ.get("PROFILE_KEEP", 50))
+
+# Background jobs
+
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", 3))
+JOB_RETRY_DELAY = int(os.environ.get("JOB_RETRY_DELAY", 30))
+
+# Rows deleted per transaction when purging a deleted user, see core.purge.
+PURGE_BATCH_SIZE = int(os.environ.get("PURGE_BATCH_SIZE", 500))
+
+# Recipe images
+
+RECIPE_IMAGE_VARIANTS = {
+    "thumbnail": (150, 150),
+    "medium": (600, 600),
+}
+
+IMAGE_UPLOAD_TEMP_DIR = os.path.join(MEDIA_ROOT, "uploads", "partial")
+IMAGE_UPLOAD_MAX_SIZE = 50 * 1024 * 1024
+IMAGE_UPLOAD_MAX_CHUNK_SIZE = 5 * 1024 * 1024
+
+# Batch requests, see core.batch. The body size is in bytes.
+BATCH_MAX_OPERATIONS = int(os.environ.get("BATCH_MAX_OPERATIONS", 25))
+BATCH_MAX_BODY_SIZE = int(os.environ.get("BATCH_MAX_BODY_SIZE", 1024 * 1024))
+BATCH_TIMEOUT_MS = int(os.environ.get("BATCH_TIMEOUT_MS", 10000))
+BATCH_MAX_WORKERS = int(os.environ.get("BATCH_MAX_WORKERS", 4))
+
+# Per-user tag and ingredient vocabularies, see core.vocabulary. Kept in
+# the default cache, the timeout is in seconds.
+VOCABULARY_CACHE_TIMEOUT = int(os.environ.get("VOCABULARY_CACHE_TIMEOUT", 3600))
@@ -2,6 +2,9 @@
 Sample tests
 """
 
+from decimal import Decimal
+
+import numpy as np
 from django.test import SimpleTestCase
 
 from app import calc
@@ -29,3 +32,40 @@ class CalcTest(SimpleTestCase):
         res = calc.substract(10, 15)
 
         self.assertEqual(res, 5)
+
+    def test_cents_round_trip(self):
+        """
+        Test converting prices to cents and back is exact
+        """
+
+        cents = calc.to_cents([Decimal("0.10"), Decimal("5.5"), "999.99", 2])
+
+        self.assertEqual(cents.tolist(), [10, 550, 99999, 200])
+        self.assertEqual(calc.from_cents(calc.total(cents)), Decimal("1007.59"))
+
+    def test_total_with_repetitions(self):
+        """
+        Test summing values counted several times
+        """
+
+        res = calc.total(np.array([10, 20, 30]), np.array([1, 0, 3]))
+
+        self.assertEqual(res, 100)
+
+    def test_scale_rounds_half_up(self):
+        """
+        Test scaling cents by fractions
+        """
+
+        factors = calc.to_fixed(["1.5", "0.5", "0.3333", 2], 4)
+        res = calc.scale([101, 101, 300, 7], factors, 10**4)
+
+        self.assertEqual(res.tolist(), [152, 51, 100, 14])
+
+    def test_scale_invalid_denominator(self):
+        """
+        Test scaling by a zero denominator is refused
+        """
+
+        with self.assertRaises(ValueError):
+            calc.scale([100], [1], [0])
@@ -23,6 +23,9 @@ from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/health-check", core_views.health_check, name="health-check"),
+    path("api/batch/", core_views.batch, name="batch"),
+    path("api/metrics", core_views.metrics, name="metrics"),
+    path("api/profiles/<str:profile_id>", core_views.profile, name="profile"),
     path("api/schema/", SpectacularAPIView.as_view(), name="api-schema"),
     path(
         "api/docs/",
@@ -0,0 +1,85 @@
+"""
+Bulk inserts for generated data.
+
+Primary keys are taken from the table sequences up front, so rows can
+reference each other before anything is inserted, and rows are then
+written with PostgreSQL `COPY` or, elsewhere, `bulk_create`.
+"""
+
+import io
+import json
+from datetime import date, datetime
+
+from django.db import connection, models
+
+
+def allocate_ids(model, count):
+    """Reserve `count` primary keys from the sequence of a model table"""
+    if not count:
+        return []
+
+    table = model._meta.db_table
+    column = model._meta.pk.column
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT nextval(pg_get_serial_sequence(%s, %s)) "
+            "FROM generate_series(1, %s)",
+            [table, column, count],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def copy_value(field, value):
+    """Format a value for the COPY text format"""
+    if value is None:
+        return r"\N"
+    if isinstance(field, models.JSONField):
+        value = json.dumps(value)
+    elif isinstance(value, bool):
+        value = "t" if value else "f"
+    elif isinstance(value, (date, datetime)):
+        value = value.isoformat()
+
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def copy_insert(model, objects, with_pk=True):
+    """Insert model instances with COPY, without signals or validation"""
+    fields = [
+        field
+        for field in model._meta.concrete_fields
+        if with_pk or not field.primary_key
+    ]
+    buffer = io.StringIO()
+    for obj in objects:
+        values = []
+        for field in fields:
+            value = field.pre_save(obj, add=True)
+            if not isinstance(field, models.JSONField):
+                value = field.get_db_prep_save(value, connection)
+            values.append(copy_value(field, value))
+        buffer.write("\t".join(values))
+        buffer.write("\n")
+    buffer.seek(0)
+
+    columns = ", ".join(connection.ops.quote_name(field.column) for field in fields)
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(f"COPY {table} ({columns}) FROM STDIN", buffer)
+
+
+def insert(model, objects, use_copy=True, batch_size=5000):
+    """Insert model instances with COPY when available, else bulk_create"""
+    if not objects:
+        return
+
+    if use_copy and connection.vendor == "postgresql":
+        copy_insert(model, objects, with_pk=objects[0].pk is not None)
+    else:
+        model.objects.bulk_create(objects, batch_size=batch_size)
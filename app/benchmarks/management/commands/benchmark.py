@@ -0,0 +1,146 @@
+"""
+Django command to benchmark the API
+"""
+
+import json
+import random
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from benchmarks import runner, seed
+from benchmarks.scenarios import SCENARIOS
+
+
+class Command(BaseCommand):
+    """Django command seeding a dataset and timing the API endpoints"""
+
+    help = (
+        "Seed users with recipes, tags and ingredients, send requests to the "
+        "API endpoints in process or to a server over HTTP, and report latency "
+        "percentiles, throughput and queries per request as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10)
+        parser.add_argument("--recipes", type=int, default=100, help="Per user.")
+        parser.add_argument("--tags", type=int, default=20, help="Per user.")
+        parser.add_argument("--ingredients", type=int, default=50, help="Per user.")
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=200,
+            help="Requests sent per scenario.",
+        )
+        parser.add_argument(
+            "--warmup",
+            type=int,
+            default=10,
+            help="Unmeasured requests sent before each scenario.",
+        )
+        parser.add_argument(
+            "--scenario",
+            action="append",
+            choices=SCENARIOS,
+            help="Scenario to run, may be repeated. All by default.",
+        )
+        parser.add_argument(
+            "--url",
+            help="Base URL of a running server, e.g. http://localhost:8000. "
+            "Requests are handled in process when omitted.",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=1,
+            help="Concurrent clients, over HTTP only.",
+        )
+        parser.add_argument("--seed", type=int, default=0, help="Random seed.")
+        parser.add_argument(
+            "--keep",
+            action="store_true",
+            help="Keep the seeded data instead of deleting it afterwards.",
+        )
+        parser.add_argument("--label", default="", help="Label stored in the report.")
+        parser.add_argument("--output", help="Write the report to this file.")
+
+    def handle(self, *args, **options):
+        """Entrypoints for command."""
+        if options["concurrency"] > 1 and not options["url"]:
+            raise CommandError("--concurrency needs --url.")
+
+        rng = random.Random(options["seed"])
+        scenarios = options["scenario"] or list(SCENARIOS)
+
+        self.stderr.write("Seeding ...")
+        start = time.perf_counter()
+        users = seed.seed(
+            options["users"],
+            options["recipes"],
+            options["tags"],
+            options["ingredients"],
+            rng=rng,
+        )
+        seeded = time.perf_counter() - start
+
+        try:
+            # Server-Timing carries the query counts, the test client needs
+            # its host allowed. Budgets are left without rates so that the
+            # throttles do not refuse the many requests of one client.
+            with override_settings(
+                REQUEST_SERVER_TIMING=True,
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+                REST_FRAMEWORK={
+                    **settings.REST_FRAMEWORK,
+                    "DEFAULT_THROTTLE_RATES": {},
+                },
+            ):
+                results = self.run_scenarios(scenarios, users, rng, options)
+        finally:
+            if not options["keep"]:
+                seed.clear()
+
+        report = {
+            "label": options["label"],
+            "mode": "http" if options["url"] else "in-process",
+            "concurrency": options["concurrency"],
+            "dataset": {
+                key: options[key] for key in ["users", "recipes", "tags", "ingredients"]
+            },
+            "seed_seconds": round(seeded, 2),
+            "results": results,
+        }
+        output = json.dumps(report, indent=2)
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output + "\n")
+        self.stdout.write(output)
+
+    def run_scenarios(self, scenarios, users, rng, options):
+        if options["url"]:
+
+            def client_factory():
+                return runner.HttpClient(options["url"])
+
+        else:
+            client_factory = runner.InProcessClient
+
+        results = {}
+        for name in scenarios:
+            self.stderr.write(f"Running {name} ...")
+            results[name] = runner.run(
+                client_factory,
+                SCENARIOS[name],
+                users,
+                rng,
+                options["requests"],
+                concurrency=options["concurrency"],
+                warmup=options["warmup"],
+            )
+            sys.stderr.flush()
+
+        return results
@@ -0,0 +1,101 @@
+"""
+Django command to benchmark the batch calculator functions
+"""
+
+import json
+import random
+import time
+from decimal import ROUND_HALF_UP, Decimal
+
+import numpy as np
+from app import calc
+from django.core.management.base import BaseCommand
+
+CENT = Decimal("0.01")
+PLACES = 1
+
+
+def scalar(prices, factors, times):
+    """Scale and sum prices and sum times one recipe at a time"""
+    total_price, total_time = Decimal(0), 0
+    for price, factor, minutes in zip(prices, factors, times):
+        scaled = (price * factor).quantize(CENT, ROUND_HALF_UP)
+        total_price = calc.add(total_price, scaled)
+        total_time = calc.add(total_time, minutes)
+
+    return total_price, total_time
+
+
+def batch(cents, factors, times):
+    """Scale and sum prices and sum times of arrays of recipes"""
+    scaled = calc.scale(cents, factors, 10**PLACES)
+
+    return calc.from_cents(calc.total(scaled)), calc.total(times)
+
+
+def best(function, repeat):
+    """Return the result and the fastest of repeated runs in milliseconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+
+    return result, round(min(timings) * 1000, 3)
+
+
+class Command(BaseCommand):
+    """Django command comparing batch and scalar recipe costing"""
+
+    help = (
+        "Generate random recipe prices, scale factors and times, then scale "
+        "and sum them with a scalar Decimal loop and with the NumPy batch "
+        "functions of app.calc. Checks both agree and reports the fastest of "
+        "the repeated runs as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=100000)
+        parser.add_argument("--repeat", type=int, default=5, help="Runs per method.")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed.")
+        parser.add_argument("--output", help="Write the report to this file.")
+
+    def handle(self, *args, **options):
+        """Entrypoints for command."""
+        rng = random.Random(options["seed"])
+        rows, repeat = options["rows"], options["repeat"]
+        prices = [Decimal(rng.randrange(100, 100000)).scaleb(-2) for _ in range(rows)]
+        factors = [Decimal(rng.randrange(1, 40)).scaleb(-PLACES) for _ in range(rows)]
+        times = [rng.randrange(1, 240) for _ in range(rows)]
+
+        expected, scalar_ms = best(lambda: scalar(prices, factors, times), repeat)
+
+        def convert():
+            return (
+                calc.to_cents(prices),
+                calc.to_fixed(factors, PLACES),
+                np.array(times, dtype=np.int64),
+            )
+
+        arrays, convert_ms = best(convert, repeat)
+        result, batch_ms = best(lambda: batch(*arrays), repeat)
+        if result != expected:
+            raise AssertionError(f"Batch result {result} != scalar {expected}")
+
+        report = {
+            "rows": rows,
+            "repeat": repeat,
+            "total_price": str(result[0]),
+            "total_time_minutes": result[1],
+            "scalar_ms": scalar_ms,
+            "convert_ms": convert_ms,
+            "batch_ms": batch_ms,
+            "speedup": round(scalar_ms / batch_ms, 1) if batch_ms else None,
+            "speedup_with_conversion": round(scalar_ms / (convert_ms + batch_ms), 1),
+        }
+        output = json.dumps(report, indent=2)
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output + "\n")
+        self.stdout.write(output)
@@ -0,0 +1,127 @@
+"""
+Django command to benchmark the per-request overhead of the middleware
+"""
+
+import json
+import time
+from importlib import import_module
+
+from core.middleware import BrowserOnlyMixin
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.module_loading import import_string
+
+
+def unskipped(middleware):
+    """Return middleware with the browser-only classes replaced by Django's"""
+    paths = []
+    for path in middleware:
+        cls = import_string(path)
+        if issubclass(cls, BrowserOnlyMixin):
+            base = cls.__bases__[-1]
+            path = f"{base.__module__}.{base.__qualname__}"
+        paths.append(path)
+
+    return paths
+
+
+def measure(middleware, path, requests, repeat, session_key=None):
+    """Return the fastest mean microseconds per request and its queries"""
+    hosts = [*settings.ALLOWED_HOSTS, "testserver"]
+    with override_settings(MIDDLEWARE=middleware, ALLOWED_HOSTS=hosts):
+        client = Client()
+        if session_key:
+            client.cookies[settings.SESSION_COOKIE_NAME] = session_key
+        # The first request loads the middleware chain.
+        status = client.get(path).status_code
+        if status >= 400:
+            raise CommandError(f"{path} responded with {status}")
+
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(requests):
+                client.get(path)
+            timings.append(time.perf_counter() - start)
+
+        with CaptureQueriesContext(connection) as queries:
+            client.get(path)
+
+    return round(min(timings) / requests * 1e6, 1), len(queries)
+
+
+class Command(BaseCommand):
+    """Django command comparing the middleware stacks of API requests"""
+
+    help = (
+        "Send requests to an API path in process with no middleware, with "
+        "every middleware of MIDDLEWARE running and with the browser-only "
+        "middleware skipped, without and with a session cookie. Reports the "
+        "fastest mean time per request, its queries and the middleware "
+        "overhead as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", default="/api/health-check")
+        parser.add_argument("--requests", type=int, default=1000)
+        parser.add_argument("--repeat", type=int, default=5, help="Runs per stack.")
+        parser.add_argument("--output", help="Write the report to this file.")
+
+    def handle(self, *args, **options):
+        """Entrypoints for command."""
+        stacks = {
+            "none": [],
+            "before": unskipped(settings.MIDDLEWARE),
+            "after": list(settings.MIDDLEWARE),
+        }
+        # An anonymous session, loaded by session authentication.
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        session.create()
+
+        results = []
+        try:
+            for name, middleware in stacks.items():
+                for session_key in (None, session.session_key):
+                    us, queries = measure(
+                        middleware,
+                        options["path"],
+                        options["requests"],
+                        options["repeat"],
+                        session_key,
+                    )
+                    results.append(
+                        {
+                            "stack": name,
+                            "session_cookie": session_key is not None,
+                            "us_per_request": us,
+                            "queries": queries,
+                        }
+                    )
+        finally:
+            session.delete()
+
+        # Overhead over the same request without any middleware.
+        bare = {r["session_cookie"]: r["us_per_request"] for r in results[:2]}
+        overhead = {}
+        for result in results[2:]:
+            cookie = result["session_cookie"]
+            overhead.setdefault(result["stack"], {})[
+                "with_session" if cookie else "without_session"
+            ] = round(result["us_per_request"] - bare[cookie], 1)
+
+        report = {
+            "path": options["path"],
+            "requests": options["requests"],
+            "repeat": options["repeat"],
+            "results": results,
+            "overhead_us": overhead,
+        }
+        output = json.dumps(report, indent=2)
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output + "\n")
+        self.stdout.write(output)
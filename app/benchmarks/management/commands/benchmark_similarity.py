@@ -0,0 +1,205 @@
+"""
+Django command to benchmark the similar recipe index
+"""
+
+import json
+import random
+import time
+
+from core import similarity, stats
+from core.models import Recipe
+from django.core.management.base import BaseCommand
+
+from benchmarks import runner, seed
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+
+def plant_variants(users, count, rng):
+    """Copy random recipes of each user with one ingredient swapped"""
+    Tags = Recipe.tags.through
+    Ingredients = Recipe.ingredients.through
+    for user in users:
+        bases = [rng.choice(user.recipes) for _ in range(count)]
+        originals = Recipe.objects.in_bulk(bases)
+        copies = Recipe.objects.bulk_create(
+            [
+                Recipe(
+                    user_id=user.id,
+                    title=originals[pk].title,
+                    time_minutes=originals[pk].time_minutes,
+                    price=originals[pk].price,
+                )
+                for pk in bases
+            ]
+        )
+
+        tag_links, ingredient_links = [], []
+        for base, copy in zip(bases, copies):
+            user.recipes.append(copy.id)
+            for tag_id in Tags.objects.filter(recipe_id=base).values_list(
+                "tag_id", flat=True
+            ):
+                tag_links.append(Tags(recipe_id=copy.id, tag_id=tag_id))
+            ingredients = list(
+                Ingredients.objects.filter(recipe_id=base).values_list(
+                    "ingredient_id", flat=True
+                )
+            )
+            if ingredients:
+                ingredients[rng.randrange(len(ingredients))] = rng.choice(
+                    user.ingredients
+                )
+            for ingredient_id in set(ingredients):
+                ingredient_links.append(
+                    Ingredients(recipe_id=copy.id, ingredient_id=ingredient_id)
+                )
+
+        Tags.objects.bulk_create(tag_links)
+        Ingredients.objects.bulk_create(ingredient_links)
+
+    user_ids = [user.id for user in users]
+    stats.rebuild(user_ids)
+    stats.reconcile(user_ids)
+    similarity.rebuild(user_ids)
+
+
+def latency(samples):
+    values = sorted(seconds * 1000 for seconds in samples)
+
+    return {
+        "mean_ms": round(sum(values) / len(values), 3) if values else None,
+        **{
+            f"p{q}_ms": round(runner.percentile(values, q / 100), 3) if values else None
+            for q in (50, 95, 99)
+        },
+    }
+
+
+class Command(BaseCommand):
+    """Django command measuring recall and latency of similar recipes"""
+
+    help = (
+        "Seed users with recipes and planted near-duplicates, then compare "
+        "the LSH similar recipe lookup with an exact Jaccard scan over every "
+        "recipe of the user. Reports recall of the exact neighbours above the "
+        "threshold and the latency of both as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=5)
+        parser.add_argument("--recipes", type=int, default=1000, help="Per user.")
+        parser.add_argument("--tags", type=int, default=20, help="Per user.")
+        parser.add_argument("--ingredients", type=int, default=50, help="Per user.")
+        parser.add_argument(
+            "--variants",
+            type=int,
+            default=100,
+            help="Near-duplicate recipes planted per user.",
+        )
+        parser.add_argument(
+            "--samples",
+            type=int,
+            default=200,
+            help="Recipes looked up.",
+        )
+        parser.add_argument("--limit", type=int, default=10, help="Neighbours kept.")
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.5,
+            help="Minimum Jaccard similarity of the neighbours to recall.",
+        )
+        parser.add_argument("--seed", type=int, default=0, help="Random seed.")
+        parser.add_argument(
+            "--keep",
+            action="store_true",
+            help="Keep the seeded data instead of deleting it afterwards.",
+        )
+        parser.add_argument("--output", help="Write the report to this file.")
+
+    def handle(self, *args, **options):
+        """Entrypoints for command."""
+        rng = random.Random(options["seed"])
+
+        self.stderr.write("Seeding ...")
+        start = time.perf_counter()
+        users = seed.seed(
+            options["users"],
+            options["recipes"],
+            options["tags"],
+            options["ingredients"],
+            rng=rng,
+        )
+        plant_variants(users, options["variants"], rng)
+        seeded = time.perf_counter() - start
+
+        try:
+            results = self.measure(users, rng, options)
+        finally:
+            if not options["keep"]:
+                seed.clear()
+
+        report = {
+            "dataset": {
+                key: options[key]
+                for key in ["users", "recipes", "tags", "ingredients", "variants"]
+            },
+            "index": {
+                "permutations": similarity.PERMUTATIONS,
+                "bands": similarity.BANDS,
+                "rows": similarity.ROWS,
+            },
+            "seed_seconds": round(seeded, 2),
+            **results,
+        }
+        output = json.dumps(report, indent=2)
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output + "\n")
+        self.stdout.write(output)
+
+    def measure(self, users, rng, options):
+        limit, threshold = options["limit"], options["threshold"]
+        lsh_times, exact_times = [], []
+        relevant = found = 0
+
+        self.stderr.write("Measuring ...")
+        for _ in range(options["samples"]):
+            user = rng.choice(users)
+            recipe = Recipe(pk=rng.choice(user.recipes), user_id=user.id)
+
+            start = time.perf_counter()
+            approximate = similarity.similar(recipe, limit)
+            lsh_times.append(time.perf_counter() - start)
+
+            # The exact baseline reads and compares every recipe of the user.
+            start = time.perf_counter()
+            _, tokens = similarity.recipe_tokens(user.recipes)
+            own = tokens.get(recipe.pk, set())
+            scores = sorted(
+                (
+                    (jaccard(own, other), pk)
+                    for pk, other in tokens.items()
+                    if pk != recipe.pk
+                ),
+                key=lambda item: (-item[0], item[1]),
+            )[:limit]
+            exact_times.append(time.perf_counter() - start)
+
+            expected = {pk for score, pk in scores if score >= threshold}
+            relevant += len(expected)
+            found += len(expected & {pk for pk, _ in approximate})
+
+        return {
+            "samples": options["samples"],
+            "limit": limit,
+            "threshold": threshold,
+            "relevant_neighbours": relevant,
+            "recall": round(found / relevant, 4) if relevant else None,
+            "lsh": latency(lsh_times),
+            "exact": latency(exact_times),
+        }
@@ -0,0 +1,253 @@
+"""
+Django command to generate a large synthetic dataset
+"""
+
+import bisect
+import itertools
+import math
+import os
+import random
+import time
+import uuid
+from decimal import Decimal
+
+from core import similarity, stats, sync
+from core.deferred import deferred
+from core.management.utils import add_counts, batched, parallel_map
+from core.models import Ingredient, Recipe, Tag
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from benchmarks import bulk
+from benchmarks.seed import WORDS
+
+EMAIL_DOMAIN = "seed.example.com"
+PASSWORD = "seed-pass"
+
+
+class Zipf:
+    """Draw ranks 0..n-1 with probability proportional to 1 / (rank + 1) ** s"""
+
+    def __init__(self, n, s):
+        weights = [1 / (rank + 1) ** s for rank in range(n)]
+        self.cumulative = list(itertools.accumulate(weights))
+
+    def sample(self, rng, k):
+        """Return up to k distinct ranks"""
+        k = min(k, len(self.cumulative))
+        total = self.cumulative[-1]
+        ranks = set()
+        while len(ranks) < k:
+            ranks.add(bisect.bisect(self.cumulative, rng.random() * total))
+
+        return ranks
+
+
+def vocabulary_name(rank):
+    return f"{WORDS[rank % len(WORDS)].title()} {rank // len(WORDS)}"
+
+
+def generate(chunk, user_ids, options, password):
+    """Create the users of one chunk with their objects, return row counts"""
+    rng = random.Random(f"{options['seed']}-{chunk}")
+    tag_zipf = Zipf(options["tag_vocabulary"], options["zipf"])
+    ingredient_zipf = Zipf(options["ingredient_vocabulary"], options["zipf"])
+    use_copy = not options["no_copy"]
+    User = get_user_model()
+    counts = dict.fromkeys(["users", "recipes", "tags", "ingredients", "links"], 0)
+
+    for batch in batched(user_ids, options["users_per_batch"]):
+        users, recipes, tags, ingredients = [], [], {}, {}
+        recipe_tags, recipe_ingredients = [], []
+
+        for user_id in batch:
+            users.append(
+                User(
+                    id=user_id,
+                    email=f"user{user_id}-{options['run']}@{EMAIL_DOMAIN}",
+                    name=f"User {user_id}",
+                    password=password,
+                )
+            )
+            count = round(rng.expovariate(1 / options["recipes"]))
+            for _ in range(count):
+                recipe = Recipe(
+                    user_id=user_id,
+                    title=" ".join(rng.choice(WORDS) for _ in range(3)).title(),
+                    description=" ".join(rng.choice(WORDS) for _ in range(20)),
+                    time_minutes=rng.randint(5, 180),
+                    price=Decimal(rng.randint(100, 5000)) / 100,
+                )
+                recipes.append(recipe)
+                for rank in tag_zipf.sample(rng, options["tags_per_recipe"]):
+                    key = (user_id, rank)
+                    tags[key] = tags.get(key, 0) + 1
+                    recipe_tags.append((recipe, key))
+                for rank in ingredient_zipf.sample(
+                    rng, options["ingredients_per_recipe"]
+                ):
+                    key = (user_id, rank)
+                    ingredients[key] = ingredients.get(key, 0) + 1
+                    recipe_ingredients.append((recipe, key))
+
+        with transaction.atomic():
+            for model, objects in [(Tag, tags), (Ingredient, ingredients)]:
+                ids = bulk.allocate_ids(model, len(objects))
+                # Objects are counted while drawn, the signals never see them.
+                for pk, ((user_id, rank), recipe_count) in zip(ids, objects.items()):
+                    objects[user_id, rank] = model(
+                        id=pk,
+                        user_id=user_id,
+                        name=vocabulary_name(rank),
+                        recipe_count=recipe_count,
+                    )
+            for pk, recipe in zip(bulk.allocate_ids(Recipe, len(recipes)), recipes):
+                recipe.id = pk
+
+            bulk.insert(User, users, use_copy)
+            bulk.insert(Recipe, recipes, use_copy)
+            bulk.insert(Tag, list(tags.values()), use_copy)
+            bulk.insert(Ingredient, list(ingredients.values()), use_copy)
+
+            for field, links, objects in [
+                (Recipe.tags, recipe_tags, tags),
+                (Recipe.ingredients, recipe_ingredients, ingredients),
+            ]:
+                through = field.through
+                column = field.field.m2m_reverse_field_name() + "_id"
+                bulk.insert(
+                    through,
+                    [
+                        through(recipe_id=recipe.id, **{column: objects[key].id})
+                        for recipe, key in links
+                    ],
+                    use_copy,
+                )
+
+            stats.rebuild(batch)
+            similarity.index([recipe.id for recipe in recipes])
+            sync.backfill(batch)
+
+        counts["users"] += len(users)
+        counts["recipes"] += len(recipes)
+        counts["tags"] += len(tags)
+        counts["ingredients"] += len(ingredients)
+        counts["links"] += len(recipe_tags) + len(recipe_ingredients)
+
+    return counts
+
+
+class Command(BaseCommand):
+    """Django command generating users, recipes, tags and ingredients"""
+
+    help = (
+        "Generate synthetic users with recipes, tags and ingredients for load "
+        "testing. Tags and ingredients follow a Zipf distribution over a shared "
+        "vocabulary, rows are written with COPY and chunks of users are "
+        "generated by parallel worker processes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument(
+            "--recipes",
+            type=float,
+            default=50,
+            help="Mean recipes per user, exponentially distributed.",
+        )
+        parser.add_argument("--tags-per-recipe", type=int, default=3)
+        parser.add_argument("--ingredients-per-recipe", type=int, default=8)
+        parser.add_argument(
+            "--tag-vocabulary",
+            type=int,
+            default=500,
+            help="Number of distinct tag names.",
+        )
+        parser.add_argument(
+            "--ingredient-vocabulary",
+            type=int,
+            default=2000,
+            help="Number of distinct ingredient names.",
+        )
+        parser.add_argument(
+            "--zipf",
+            type=float,
+            default=1.1,
+            help="Exponent of the Zipf distribution of tags and ingredients.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="Number of worker processes.",
+        )
+        parser.add_argument(
+            "--users-per-batch",
+            type=int,
+            default=500,
+            help="Users written per transaction.",
+        )
+        parser.add_argument("--seed", type=int, default=0, help="Random seed.")
+        parser.add_argument(
+            "--no-copy",
+            action="store_true",
+            help="Insert with bulk_create instead of COPY.",
+        )
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="Delete previously generated data instead of generating.",
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoints for command."""
+        if options["clear"]:
+            self.stdout.write(f"Deleted {clear()} generated user(s)")
+            return
+
+        options["run"] = uuid.uuid4().hex[:8]
+        password = make_password(PASSWORD)
+        user_ids = bulk.allocate_ids(get_user_model(), options["users"])
+        chunk_size = max(1, math.ceil(len(user_ids) / (options["workers"] * 4)))
+        chunks = batched(user_ids, chunk_size)
+
+        start = time.monotonic()
+        totals = dict.fromkeys(["users", "recipes", "tags", "ingredients", "links"], 0)
+
+        for counts in parallel_map(
+            generate,
+            [(i, chunk, options, password) for i, chunk in enumerate(chunks)],
+            options["workers"],
+        ):
+            add_counts(totals, counts)
+            elapsed = time.monotonic() - start
+            rows = sum(totals.values())
+            self.stdout.write(
+                f"{totals['users']} user(s), {rows} row(s), "
+                f"{rows / elapsed if elapsed else 0:.0f} row(s)/s"
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Generated "
+                + ", ".join(f"{count} {name}" for name, count in totals.items())
+                + f" in {time.monotonic() - start:.1f}s"
+            )
+        )
+
+
+def clear():
+    """Delete the generated users and everything they own, return the count"""
+    users = get_user_model().objects.filter(email__endswith=f"@{EMAIL_DOMAIN}")
+
+    # The derived data of the generated users goes with them.
+    with transaction.atomic(), deferred():
+        count = users.count()
+        Recipe.objects.filter(user__in=users).delete()
+        Tag.objects.filter(user__in=users).delete()
+        Ingredient.objects.filter(user__in=users).delete()
+        users.delete()
+
+    return count
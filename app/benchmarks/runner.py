@@ -0,0 +1,133 @@
+"""
+Benchmark runner.
+
+Requests are sent through the Django test client, in process, or to a
+running server over HTTP. Queries per request are read from the
+Server-Timing header added by the request metrics middleware.
+"""
+
+import math
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.test import Client
+
+QUERIES = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+
+class InProcessClient:
+    """Send requests through the full middleware stack without a server"""
+
+    def __init__(self):
+        self.client = Client()
+
+    def send(self, request):
+        headers = {
+            f"HTTP_{name.upper().replace('-', '_')}": value
+            for name, value in request.headers.items()
+        }
+        response = self.client.generic(
+            request.method,
+            request.path,
+            request.body,
+            content_type=request.content_type,
+            **headers,
+        )
+
+        return response.status_code, response.get("Server-Timing", "")
+
+
+class HttpClient:
+    """Send requests to a running server"""
+
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def send(self, request):
+        http_request = urllib.request.Request(
+            self.base_url + request.path,
+            data=request.body or None,
+            method=request.method,
+            headers={"Content-Type": request.content_type, **request.headers},
+        )
+        try:
+            with urllib.request.urlopen(http_request, timeout=self.timeout) as res:
+                res.read()
+                return res.status, res.headers.get("Server-Timing", "")
+        except urllib.error.HTTPError as exc:
+            return exc.code, exc.headers.get("Server-Timing", "")
+
+
+def percentile(values, q):
+    """Return the nearest rank percentile of sorted values"""
+    if not values:
+        return None
+
+    return values[max(0, math.ceil(q * len(values)) - 1)]
+
+
+def summarize(samples, elapsed):
+    """Return the statistics of (seconds, status, queries) samples"""
+    latencies = sorted(seconds * 1000 for seconds, _, _ in samples)
+    queries = [n for _, _, n in samples if n is not None]
+
+    return {
+        "requests": len(samples),
+        "errors": sum(1 for _, status, _ in samples if status >= 400),
+        "rps": round(len(samples) / elapsed, 1) if elapsed else None,
+        "mean_ms": round(sum(latencies) / len(latencies), 2) if latencies else None,
+        **{
+            f"p{q}_ms": round(percentile(latencies, q / 100), 2) if latencies else None
+            for q in (50, 95, 99)
+        },
+        "queries_per_request": (
+            round(sum(queries) / len(queries), 2) if queries else None
+        ),
+    }
+
+
+def run(client_factory, scenario, users, rng, requests, concurrency=1, warmup=0):
+    """Send the requests of a scenario and return their statistics"""
+    lock = threading.Lock()
+    local = threading.local()
+    samples = []
+
+    def build():
+        # Random is not thread safe, build requests under the lock.
+        with lock:
+            return scenario(rng.choice(users), rng)
+
+    def send(record=True):
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = client_factory()
+
+        request = build()
+        start = time.perf_counter()
+        status, server_timing = client.send(request)
+        seconds = time.perf_counter() - start
+
+        if record:
+            match = QUERIES.search(server_timing)
+            with lock:
+                samples.append((seconds, status, int(match[1]) if match else None))
+
+    for _ in range(warmup):
+        send(record=False)
+
+    start = time.perf_counter()
+    if concurrency == 1:
+        for _ in range(requests):
+            send()
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for future in [pool.submit(send) for _ in range(requests)]:
+                future.result()
+    elapsed = time.perf_counter() - start
+
+    return summarize(samples, elapsed)
@@ -0,0 +1,127 @@
+"""
+Benchmark scenarios.
+
+A scenario builds the next request to send for a randomly picked seeded
+user. Requests carry their body already encoded, so the same scenario runs
+in process and over HTTP.
+"""
+
+import io
+import json
+from dataclasses import dataclass, field
+
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from django.urls import reverse
+from PIL import Image
+
+from benchmarks import seed
+
+
+@dataclass
+class Request:
+    """A request to send to the API"""
+
+    method: str
+    path: str
+    body: bytes = b""
+    content_type: str = "application/json"
+    headers: dict = field(default_factory=dict)
+
+
+def authenticated(user, method, path, data=None):
+    return Request(
+        method,
+        path,
+        json.dumps(data).encode() if data is not None else b"",
+        headers={"Authorization": f"Token {user.token}"},
+    )
+
+
+def recipe_list(user, rng):
+    return authenticated(user, "GET", reverse("recipe:recipe-list"))
+
+
+def recipe_filter(user, rng):
+    tags = ",".join(str(i) for i in rng.sample(user.tags, min(2, len(user.tags))))
+    ingredients = ",".join(
+        str(i) for i in rng.sample(user.ingredients, min(2, len(user.ingredients)))
+    )
+    path = reverse("recipe:recipe-list")
+
+    return authenticated(user, "GET", f"{path}?tags={tags}&ingredients={ingredients}")
+
+
+def recipe_detail(user, rng):
+    path = reverse("recipe:recipe-detail", args=[rng.choice(user.recipes)])
+
+    return authenticated(user, "GET", path)
+
+
+def recipe_similar(user, rng):
+    path = reverse("recipe:recipe-similar", args=[rng.choice(user.recipes)])
+
+    return authenticated(user, "GET", path)
+
+
+def recipe_create(user, rng):
+    data = {
+        "title": seed.name(rng, 3),
+        "time_minutes": rng.randint(5, 180),
+        "price": f"{rng.randint(100, 5000) / 100:.2f}",
+        "tags": [{"name": seed.name(rng, 1)} for _ in range(2)],
+        "ingredients": [{"name": seed.name(rng, 1)} for _ in range(4)],
+    }
+
+    return authenticated(user, "POST", reverse("recipe:recipe-list"), data)
+
+
+def recipe_update(user, rng):
+    path = reverse("recipe:recipe-detail", args=[rng.choice(user.recipes)])
+
+    return authenticated(user, "PATCH", path, {"title": seed.name(rng, 3)})
+
+
+def tag_list(user, rng):
+    return authenticated(user, "GET", reverse("recipe:tag-list"))
+
+
+def ingredient_list(user, rng):
+    return authenticated(user, "GET", reverse("recipe:ingredient-list"))
+
+
+def image_upload(user, rng):
+    buffer = io.BytesIO()
+    color = tuple(rng.randrange(256) for _ in range(3))
+    Image.new("RGB", (800, 600), color).save(buffer, format="JPEG")
+    buffer.name = "bench.jpg"
+    buffer.seek(0)
+
+    request = authenticated(
+        user,
+        "POST",
+        reverse("recipe:recipe-upload-image", args=[rng.choice(user.recipes)]),
+    )
+    request.body = encode_multipart(BOUNDARY, {"image": buffer})
+    request.content_type = MULTIPART_CONTENT
+
+    return request
+
+
+def token(user, rng):
+    data = {"email": user.email, "password": seed.PASSWORD}
+
+    return Request("POST", reverse("user:token"), json.dumps(data).encode())
+
+
+SCENARIOS = {
+    "recipe-list": recipe_list,
+    "recipe-filter": recipe_filter,
+    "recipe-detail": recipe_detail,
+    "recipe-similar": recipe_similar,
+    "recipe-create": recipe_create,
+    "recipe-update": recipe_update,
+    "tag-list": tag_list,
+    "ingredient-list": ingredient_list,
+    "image-upload": image_upload,
+    "token": token,
+}
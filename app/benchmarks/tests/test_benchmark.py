@@ -0,0 +1,164 @@
+"""
+Tests for the benchmark suite.
+"""
+
+import json
+import random
+from io import StringIO
+
+from core import models
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+
+from benchmarks import runner, seed
+
+
+class SeedTests(TestCase):
+    """Test seeding benchmark datasets"""
+
+    def test_seed_and_clear(self):
+        """Test the requested volumes are created and removed again"""
+        users = seed.seed(2, 5, 3, 4, rng=random.Random(1))
+
+        self.assertEqual(len(users), 2)
+        self.assertEqual(models.Recipe.objects.count(), 10)
+        self.assertEqual(models.Tag.objects.count(), 6)
+        self.assertEqual(models.Ingredient.objects.count(), 8)
+        self.assertEqual(len(users[0].recipes), 5)
+        recipe = models.Recipe.objects.get(pk=users[0].recipes[0])
+        self.assertEqual(recipe.tags.count(), 3)
+        self.assertEqual(recipe.ingredients.count(), 4)
+        self.assertTrue(
+            get_user_model().objects.get(pk=users[0].id).check_password(seed.PASSWORD)
+        )
+
+        self.assertEqual(seed.clear(), 2)
+        self.assertEqual(models.Recipe.objects.count(), 0)
+
+
+class RunnerTests(TestCase):
+    """Test the statistics"""
+
+    def test_summarize(self):
+        """Test percentiles, throughput and queries are reported"""
+        samples = [(i / 1000, 200, 3) for i in range(1, 101)]
+        samples[-1] = (0.1, 500, 5)
+
+        stats = runner.summarize(samples, elapsed=2)
+
+        self.assertEqual(stats["requests"], 100)
+        self.assertEqual(stats["errors"], 1)
+        self.assertEqual(stats["rps"], 50)
+        self.assertEqual(stats["p50_ms"], 50)
+        self.assertEqual(stats["p95_ms"], 95)
+        self.assertEqual(stats["p99_ms"], 99)
+        self.assertEqual(stats["queries_per_request"], 3.02)
+
+
+class BenchmarkCommandTests(TestCase):
+    """Test the benchmark command"""
+
+    def test_in_process_run(self):
+        """Test every scenario runs and the report is JSON"""
+        out = StringIO()
+
+        call_command(
+            "benchmark",
+            "--users=2",
+            "--recipes=5",
+            "--tags=3",
+            "--ingredients=4",
+            "--requests=3",
+            "--warmup=0",
+            stdout=out,
+            stderr=StringIO(),
+        )
+
+        report = json.loads(out.getvalue())
+        self.assertEqual(report["mode"], "in-process")
+        for name, stats in report["results"].items():
+            self.assertEqual(stats["requests"], 3, name)
+            self.assertEqual(stats["errors"], 0, name)
+            self.assertGreater(stats["queries_per_request"], 0, name)
+        self.assertFalse(
+            get_user_model().objects.filter(email__endswith=seed.EMAIL_DOMAIN).exists()
+        )
+
+    def test_not_throttled(self):
+        """Test more requests than the token budget all succeed"""
+        out = StringIO()
+
+        call_command(
+            "benchmark",
+            "--users=1",
+            "--recipes=2",
+            "--scenario=token",
+            "--requests=20",
+            "--warmup=0",
+            stdout=out,
+            stderr=StringIO(),
+        )
+
+        stats = json.loads(out.getvalue())["results"]["token"]
+        self.assertEqual(stats["requests"], 20)
+        self.assertEqual(stats["errors"], 0)
+
+
+class SimilarityBenchmarkTests(TestCase):
+    """Test the similar recipe benchmark"""
+
+    def test_recall_and_latency(self):
+        """Test planted near-duplicates are recalled and timings reported"""
+        out = StringIO()
+
+        call_command(
+            "benchmark_similarity",
+            "--users=2",
+            "--recipes=20",
+            "--variants=10",
+            "--samples=20",
+            stdout=out,
+            stderr=StringIO(),
+        )
+
+        report = json.loads(out.getvalue())
+        self.assertGreater(report["relevant_neighbours"], 0)
+        self.assertGreaterEqual(report["recall"], 0.5)
+        self.assertIsNotNone(report["lsh"]["p95_ms"])
+        self.assertIsNotNone(report["exact"]["p95_ms"])
+        self.assertFalse(models.RecipeSignature.objects.exists())
+
+
+class CalcBenchmarkTests(SimpleTestCase):
+    """Test the batch calculator benchmark"""
+
+    def test_batch_matches_scalar(self):
+        """Test the batch and scalar totals agree and timings are reported"""
+        out = StringIO()
+
+        call_command("benchmark_calc", "--rows=1000", "--repeat=1", stdout=out)
+
+        report = json.loads(out.getvalue())
+        self.assertEqual(report["rows"], 1000)
+        self.assertGreater(report["scalar_ms"], 0)
+        self.assertGreater(report["batch_ms"], 0)
+
+
+class MiddlewareBenchmarkTests(TestCase):
+    """Test the middleware overhead benchmark"""
+
+    def test_before_and_after(self):
+        """Test every stack is timed and the skipped session saves its query"""
+        out = StringIO()
+
+        call_command("benchmark_middleware", "--requests=5", "--repeat=1", stdout=out)
+
+        report = json.loads(out.getvalue())
+        self.assertEqual(len(report["results"]), 6)
+        self.assertEqual(set(report["overhead_us"]), {"before", "after"})
+        queries = {
+            (r["stack"], r["session_cookie"]): r["queries"] for r in report["results"]
+        }
+        self.assertEqual(queries[("after", True)], 0)
+        self.assertGreater(queries[("before", True)], 0)
@@ -0,0 +1,106 @@
+"""
+Tests for the seed_data command.
+"""
+
+import random
+from collections import Counter
+from io import StringIO
+
+from core import models
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+
+from benchmarks.management.commands.seed_data import PASSWORD, Zipf
+
+
+class ZipfTests(SimpleTestCase):
+    """Test the Zipf sampler"""
+
+    def test_distinct_ranks(self):
+        """Test samples hold distinct ranks in range"""
+        ranks = Zipf(10, 1.1).sample(random.Random(0), 5)
+
+        self.assertEqual(len(ranks), 5)
+        self.assertTrue(all(0 <= rank < 10 for rank in ranks))
+
+    def test_skewed(self):
+        """Test low ranks are drawn far more often"""
+        zipf = Zipf(100, 1.1)
+        rng = random.Random(0)
+        counts = Counter(rank for _ in range(2000) for rank in zipf.sample(rng, 1))
+
+        self.assertGreater(counts[0], 10 * counts[50])
+
+
+def seed(*args):
+    """Run the seed_data command on a small dataset"""
+    call_command(
+        "seed_data",
+        "--users=5",
+        "--recipes=4",
+        "--tags-per-recipe=2",
+        "--ingredients-per-recipe=3",
+        "--workers=1",
+        "--users-per-batch=2",
+        *args,
+        stdout=StringIO(),
+    )
+
+
+class SeedDataTests(TestCase):
+    """Test generating data"""
+
+    def assert_generated(self):
+        users = get_user_model().objects.filter(email__endswith="@seed.example.com")
+        self.assertEqual(users.count(), 5)
+        self.assertTrue(users.first().check_password(PASSWORD))
+
+        recipes = models.Recipe.objects.filter(user__in=users)
+        for recipe in recipes:
+            tags = recipe.tags.all()
+            self.assertEqual(len(tags), 2)
+            self.assertTrue(all(tag.user_id == recipe.user_id for tag in tags))
+            self.assertEqual(recipe.ingredients.count(), 3)
+            self.assertEqual(recipe.image_status, models.Recipe.ImageStatus.NONE)
+            self.assertEqual(recipe.image_variants, {})
+
+    def test_seed_with_copy(self):
+        """Test rows written with COPY are complete"""
+        seed()
+
+        self.assert_generated()
+
+    def test_seed_with_bulk_create(self):
+        """Test rows can be written with bulk_create"""
+        seed("--no-copy")
+
+        self.assert_generated()
+
+    def test_clear(self):
+        """Test generated data is deleted"""
+        seed()
+        other = get_user_model().objects.create_user("user@example.com", "pass")
+
+        seed("--clear")
+
+        self.assertEqual(list(get_user_model().objects.all()), [other])
+        self.assertFalse(models.Recipe.objects.exists())
+        self.assertFalse(models.Tag.objects.exists())
+
+
+class ClearTests(TransactionTestCase):
+    """Test deleting generated data in committed transactions"""
+
+    def test_clear_commits(self):
+        """Test generated data is deleted without violating constraints"""
+        seed()
+        other = get_user_model().objects.create_user("user@example.com", "pass")
+        models.Tag.objects.create(user=other, name="Vegan")
+
+        seed("--clear")
+
+        self.assertEqual(list(get_user_model().objects.all()), [other])
+        self.assertFalse(models.Recipe.objects.exists())
+        self.assertFalse(models.Change.objects.exclude(user=other).exists())
+        self.assertEqual(models.Tag.objects.get().user, other)
@@ -2,14 +2,14 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.utils.translation import gettext_lazy as _
 
-from core import models
+from core import models, purge
 
 
 class UserAdmin(BaseUserAdmin):
     """Define he admin pages for users."""
 
     ordering = ["id"]
-    list_display = ["email", "name"]
+    list_display = ["email", "name", "is_active", "deleted_at"]
     fieldsets = (
         (None, {"fields": ("email", "password")}),
         (
@@ -22,9 +22,9 @@ class UserAdmin(BaseUserAdmin):
                 )
             },
         ),
-        (_("Important dates"), {"fields": ("last_login",)}),
+        (_("Important dates"), {"fields": ("last_login", "deleted_at")}),
     )
-    readonly_fields = ["last_login"]
+    readonly_fields = ["last_login", "deleted_at"]
 
     add_fieldsets = (
         (
@@ -44,8 +44,34 @@ class UserAdmin(BaseUserAdmin):
         ),
     )
 
+    def get_deleted_objects(self, objs, request):
+        # Users are purged in the background, collecting everything that
+        # cascades from them for the confirmation page is what we avoid.
+        perms_needed = set()
+        if not self.has_delete_permission(request):
+            perms_needed.add(self.opts.verbose_name)
+
+        return [str(obj) for obj in objs], {}, perms_needed, []
+
+    def delete_model(self, request, obj):
+        purge.delete_user(obj)
+
+    def delete_queryset(self, request, queryset):
+        for user in queryset.filter(deleted_at__isnull=True):
+            purge.delete_user(user)
+
+
+class JobAdmin(admin.ModelAdmin):
+    """Define the admin pages for background jobs."""
+
+    ordering = ["-id"]
+    list_display = ["id", "kind", "status", "attempts", "run_after", "updated_at"]
+    list_filter = ["status", "kind"]
+    readonly_fields = ["progress", "created_at", "updated_at"]
+
 
 admin.site.register(models.User, UserAdmin)
 admin.site.register(models.Recipe)
 admin.site.register(models.Tag)
 admin.site.register(models.Ingredient)
+admin.site.register(models.Job, JobAdmin)
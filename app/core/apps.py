@@ -4,3 +4,14 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        # Register the job handlers and signal receivers
+        from core import images, purge  # noqa: F401
+        from core import duplicates, similarity, stats, sync, vocabulary  # noqa: F401
+        from core import querylog
+        from django.core.signals import request_finished
+        from django.db.backends.signals import connection_created
+
+        connection_created.connect(querylog.install)
+        request_finished.connect(querylog.query_log.flush_if_due)
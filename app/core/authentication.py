@@ -0,0 +1,18 @@
+"""
+Authentication of the operations of a batch.
+
+A batch is authenticated once, see `core.batch`. The requests of its
+operations carry the user and token of the batch in the `batch_auth`
+attribute, set by the batch and out of reach of clients, and no
+Authorization header, so the views they are dispatched to take them from
+there instead of checking the token again.
+"""
+
+from rest_framework import authentication
+
+
+class BatchAuthentication(authentication.BaseAuthentication):
+    """Authenticate batch operations as the batch request"""
+
+    def authenticate(self, request):
+        return getattr(request._request, "batch_auth", None)
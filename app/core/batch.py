@@ -0,0 +1,162 @@
+"""
+Batch requests.
+
+A batch is a list of operations, each a method, an API path with an
+optional query string and a JSON body. Every operation is dispatched to
+the view its path resolves to as the user authenticated by the batch
+request, without going through the middleware again, and its status and
+body are returned in order.
+
+Batches with writes run in one transaction, stopping at the first
+operation that fails, which rolls back the ones before it. Batches of
+only reads can run in parallel threads, each with its own database
+connection. Operations not started within BATCH_TIMEOUT_MS are reported
+with a 504 status, those already running are finished.
+"""
+
+import io
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait as wait_for
+from contextlib import nullcontext
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connections, transaction
+from django.http import Http404
+from django.urls import Resolver404, resolve
+from rest_framework.response import Response
+
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+
+# Headers of the batch request not passed on to its operations.
+BATCH_ONLY_META = (
+    "CONTENT_LENGTH",
+    "CONTENT_TYPE",
+    "HTTP_AUTHORIZATION",
+    "HTTP_CONTENT_LENGTH",
+)
+
+
+class InvalidOperation(Exception):
+    """Raised for operations that cannot be part of a batch"""
+
+
+def check_path(path):
+    """Raise InvalidOperation unless a path can be run in a batch"""
+    parts = urlsplit(path)
+    if parts.scheme or parts.netloc or not parts.path.startswith("/api/"):
+        raise InvalidOperation(f"Not an API path: {path}")
+    if parts.path.rstrip("/") == "/api/batch":
+        raise InvalidOperation("Batches cannot be nested.")
+
+
+def sub_request(request, operation):
+    """Return a request for an operation, authenticated like request"""
+    parts = urlsplit(operation["path"])
+    body = b""
+    if operation.get("body") is not None:
+        body = json.dumps(operation["body"]).encode()
+
+    environ = {
+        key: value for key, value in request.META.items() if key not in BATCH_ONLY_META
+    }
+    environ.update(
+        {
+            "REQUEST_METHOD": operation["method"],
+            "PATH_INFO": parts.path,
+            "QUERY_STRING": parts.query,
+            "CONTENT_TYPE": "application/json",
+            "CONTENT_LENGTH": str(len(body)),
+            "wsgi.input": io.BytesIO(body),
+        }
+    )
+    sub = WSGIRequest(environ)
+    # Authenticated once by the batch, see core.authentication.
+    sub.batch_auth = (request.user, request.auth)
+
+    return sub
+
+
+def dispatch(request, operation):
+    """Run one operation and return its status and body"""
+    sub = sub_request(request, operation)
+    try:
+        match = resolve(sub.path_info)
+    except Resolver404:
+        return {"status": 404, "body": {"detail": "Not found."}}
+
+    try:
+        response = match.func(sub, *match.args, **match.kwargs)
+    except Http404:
+        return {"status": 404, "body": {"detail": "Not found."}}
+
+    if isinstance(response, Response):
+        body = response.data
+    elif response.get("Content-Type", "").startswith("application/json"):
+        body = json.loads(response.content or b"null")
+    else:
+        body = None
+
+    return {"status": response.status_code, "body": body}
+
+
+def skipped(status, detail):
+    """Return the result of an operation that was not run"""
+    return {"status": status, "body": {"detail": detail}}
+
+
+def run(request, operations, parallel=False):
+    """Run the operations of a batch, return the results and if it committed"""
+    deadline = time.monotonic() + settings.BATCH_TIMEOUT_MS / 1000
+    reads_only = all(op["method"] in READ_METHODS for op in operations)
+
+    if reads_only and parallel and len(operations) > 1:
+        return run_parallel(request, operations, deadline), True
+
+    results = []
+    with nullcontext() if reads_only else transaction.atomic():
+        for operation in operations:
+            if time.monotonic() > deadline:
+                result = skipped(504, "Not run, the batch timed out.")
+            else:
+                result = dispatch(request, operation)
+            results.append(result)
+
+            if result["status"] >= 400 and not reads_only:
+                transaction.set_rollback(True)
+                break
+
+    committed = reads_only or all(result["status"] < 400 for result in results)
+    for _ in range(len(operations) - len(results)):
+        results.append(skipped(424, "Not run, an earlier operation failed."))
+
+    return results, committed
+
+
+def dispatch_in_thread(request, operation):
+    try:
+        return dispatch(request, operation)
+    finally:
+        connections.close_all()
+
+
+def run_parallel(request, operations, deadline):
+    """Run read operations in threads until the deadline"""
+    pool = ThreadPoolExecutor(min(settings.BATCH_MAX_WORKERS, len(operations)))
+    futures = [pool.submit(dispatch_in_thread, request, op) for op in operations]
+    wait_for(futures, timeout=max(deadline - time.monotonic(), 0))
+    # Operations already running are waited for, not left behind using
+    # their connections after the response.
+    pool.shutdown(wait=True, cancel_futures=True)
+
+    return [
+        (
+            skipped(504, "Not run, the batch timed out.")
+            if future.cancelled()
+            else future.result()
+        )
+        for future in futures
+    ]
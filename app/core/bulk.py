@@ -0,0 +1,239 @@
+"""
+Set-based updates and deletes of recipes, tags and ingredients.
+
+Each operation selects the objects of one user, changes them with single
+UPDATE or DELETE statements and join table edits in one transaction, and
+returns the number of rows affected. The per-object signal handlers are
+deferred, see `core.deferred`, and the statistics, recipe counts,
+similarity and duplicate indexes and change log are brought up to date
+for all affected rows at the end instead.
+"""
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Exists, OuterRef, Value, When
+
+from core import duplicates, images, similarity, stats, sync, vocabulary
+from core.deferred import deferred
+from core.models import Change, Ingredient, Recipe, Tag
+
+# Models linked to recipes, with the field of the recipe linking them.
+LINKS = {Tag: Recipe.tags, Ingredient: Recipe.ingredients}
+
+
+class UnknownObjects(Exception):
+    """Raised with the requested ids of objects the user does not own"""
+
+    def __init__(self, field, ids):
+        super().__init__(f"Unknown {field}: {ids}")
+        self.field = field
+        self.ids = ids
+
+
+class DuplicateNames(Exception):
+    """Raised with the requested names other tags or ingredients already use"""
+
+    def __init__(self, names):
+        super().__init__(f"Names already used: {names}")
+        self.names = names
+
+
+def owned(model, user, ids, field):
+    """Return ids, raise UnknownObjects unless the user owns every object"""
+    ids = sorted(set(ids))
+    found = set(
+        model.objects.filter(user=user, id__in=ids).values_list("id", flat=True)
+    )
+    if len(found) != len(ids):
+        raise UnknownObjects(field, sorted(set(ids) - found))
+
+    return ids
+
+
+def link_column(model):
+    """Return the join table column of a tag or ingredient"""
+    return LINKS[model].field.m2m_reverse_field_name() + "_id"
+
+
+def linked_recipes(model, ids):
+    """Return the ids of the recipes linked to tags or ingredients"""
+    through = LINKS[model].through
+
+    return list(
+        through.objects.filter(**{f"{link_column(model)}__in": ids})
+        .values_list("recipe_id", flat=True)
+        .distinct()
+    )
+
+
+def select_recipes(user, ids=None, tags=None, ingredients=None, title=None):
+    """Return the recipes of a user with ids or matching a filter"""
+    queryset = Recipe.objects.filter(user=user)
+    if ids is not None:
+        queryset = queryset.filter(id__in=owned(Recipe, user, ids, "ids"))
+
+    for model, values in ((Tag, tags), (Ingredient, ingredients)):
+        if values:
+            through = LINKS[model].through
+            queryset = queryset.filter(
+                id__in=through.objects.filter(
+                    **{f"{link_column(model)}__in": values}
+                ).values("recipe_id")
+            )
+
+    if title:
+        queryset = queryset.filter(title__icontains=title)
+
+    return queryset
+
+
+def select_attrs(model, user, ids=None, name=None, assigned=None):
+    """Return the tags or ingredients of a user with ids or matching a filter"""
+    queryset = model.objects.filter(user=user)
+    if ids is not None:
+        queryset = queryset.filter(id__in=owned(model, user, ids, "ids"))
+    if name:
+        queryset = queryset.filter(name__icontains=name)
+    if assigned is not None:
+        through = LINKS[model].through
+        is_assigned = Exists(
+            through.objects.filter(**{link_column(model): OuterRef("pk")})
+        )
+        queryset = queryset.filter(is_assigned if assigned else ~is_assigned)
+
+    return queryset
+
+
+def edit_links(model, recipe_ids, add, remove):
+    """Add and remove the links of recipes, return the counts"""
+    through = LINKS[model].through
+    column = link_column(model)
+    added = removed = 0
+
+    if remove:
+        removed = through.objects.filter(
+            recipe_id__in=recipe_ids, **{f"{column}__in": remove}
+        ).delete()[0]
+
+    if add:
+        existing = through.objects.filter(
+            recipe_id__in=recipe_ids, **{f"{column}__in": add}
+        ).count()
+        through.objects.bulk_create(
+            [through(recipe_id=r, **{column: pk}) for r in recipe_ids for pk in add],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+        added = len(recipe_ids) * len(add) - existing
+
+    return added, removed
+
+
+def update_recipes(user, queryset, values=None, links=None):
+    """
+    Set the field values of the selected recipes and add or remove their
+    tags and ingredients, links mapping Tag and Ingredient to pairs of
+    ids to add and to remove. Return the affected counts.
+    """
+    values = values or {}
+    links = {
+        model: (owned(model, user, add, f"add_{LINKS[model].field.name}"), remove)
+        for model, (add, remove) in (links or {}).items()
+        if add or remove
+    }
+    counts = {"updated": 0, "links_added": 0, "links_removed": 0}
+
+    with transaction.atomic(), deferred():
+        ids = list(queryset.order_by("id").values_list("id", flat=True))
+        if not ids:
+            return counts
+
+        counts["updated"] = len(ids)
+        if values:
+            counts["updated"] = Recipe.objects.filter(id__in=ids).update(**values)
+
+        for model, (add, remove) in links.items():
+            added, removed = edit_links(model, ids, add, remove)
+            counts["links_added"] += added
+            counts["links_removed"] += removed
+
+        if {"time_minutes", "price"} & values.keys():
+            stats.rebuild([user.id])
+        if links:
+            stats.reconcile([user.id])
+            similarity.index(ids)
+        if "title" in values or Ingredient in links:
+            duplicates.index(ids)
+        sync.record(user.id, Change.Kind.RECIPE, ids)
+
+    return counts
+
+
+def delete_recipes(user, queryset):
+    """Delete the selected recipes, return the count"""
+    with transaction.atomic(), deferred():
+        ids = list(queryset.values_list("id", flat=True))
+        if not ids:
+            return 0
+
+        images.release(ids)
+        deleted = Recipe.objects.filter(id__in=ids).delete()[1]
+
+        stats.rebuild([user.id])
+        stats.reconcile([user.id])
+        sync.record(user.id, Change.Kind.RECIPE, ids, deleted=True)
+
+    return deleted.get(Recipe._meta.label, 0)
+
+
+def used_names(model, user, names):
+    """Return the new names in names taken by other tags or ingredients"""
+    values = list(names.values())
+    taken = model.objects.filter(user=user, name__in=values).values_list("id", "name")
+
+    return sorted(
+        {name for pk, name in taken if names.get(pk) != name}
+        | {name for name in values if values.count(name) > 1}
+    )
+
+
+def rename_attrs(model, user, names):
+    """Rename tags or ingredients by id, return the count"""
+    ids = owned(model, user, names, "names")
+
+    with transaction.atomic(), deferred():
+        try:
+            with transaction.atomic():
+                renamed = model.objects.filter(id__in=ids).update(
+                    name=Case(*[When(id=pk, then=Value(names[pk])) for pk in ids])
+                )
+        except IntegrityError:
+            raise DuplicateNames(used_names(model, user, names))
+        vocabulary.forget(model, user.id)
+
+        recipe_ids = linked_recipes(model, ids)
+        similarity.index(recipe_ids)
+        if model is Ingredient:
+            duplicates.index(recipe_ids)
+        sync.record(user.id, sync.KINDS[model], ids)
+        sync.record(user.id, Change.Kind.RECIPE, recipe_ids)
+
+    return renamed
+
+
+def delete_attrs(model, user, queryset):
+    """Delete the selected tags or ingredients, return the count"""
+    with transaction.atomic(), deferred():
+        ids = list(queryset.values_list("id", flat=True))
+        if not ids:
+            return 0
+
+        recipe_ids = linked_recipes(model, ids)
+        deleted = model.objects.filter(id__in=ids).delete()[1]
+
+        similarity.index(recipe_ids)
+        if model is Ingredient:
+            duplicates.index(recipe_ids)
+        sync.record(user.id, sync.KINDS[model], ids, deleted=True)
+        sync.record(user.id, Change.Kind.RECIPE, recipe_ids)
+
+    return deleted.get(model._meta.label, 0)
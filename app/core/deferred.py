@@ -0,0 +1,79 @@
+"""
+Deferred maintenance of derived data.
+
+The signal handlers keeping statistics, recipe counts, the similarity
+and duplicate indexes and the sync change log current work one object
+at a time. Set-based writes, see `core.bulk`, run inside `deferred()`
+where handlers decorated with `deferrable` do nothing, and bring the
+derived data of every affected row up to date at once afterwards.
+
+Writes of a single object fire several signals, e.g. a recipe saved and
+its tags and ingredients linked. Handlers queue their index and change
+log updates with `coalesce`, which inside `coalesced()` runs each update
+once for all the ids queued with the same arguments when the block ends.
+"""
+
+import functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_deferred = ContextVar("deferred", default=False)
+_coalesced = ContextVar("coalesced", default=None)
+
+
+def active():
+    """Return whether maintenance is deferred"""
+    return _deferred.get()
+
+
+@contextmanager
+def deferred():
+    """Skip the deferrable signal handlers within the block"""
+    token = _deferred.set(True)
+    try:
+        yield
+    finally:
+        _deferred.reset(token)
+
+
+def deferrable(handler):
+    """Make a signal handler do nothing while maintenance is deferred"""
+
+    @functools.wraps(handler)
+    def wrapper(*args, **kwargs):
+        if not _deferred.get():
+            return handler(*args, **kwargs)
+
+    return wrapper
+
+
+@contextmanager
+def coalesced():
+    """Run the updates queued with `coalesce` once, at the end of the block"""
+    if _coalesced.get() is not None:
+        # Nested blocks are run by the outermost one.
+        yield
+        return
+
+    pending = {}
+    token = _coalesced.set(pending)
+    try:
+        yield
+    finally:
+        _coalesced.reset(token)
+
+    for (function, args, kwargs), ids in pending.items():
+        function(*args, sorted(ids), **dict(kwargs))
+
+
+def coalesce(function, *args, ids, **kwargs):
+    """
+    Call function(*args, ids, **kwargs), or inside `coalesced()` queue the
+    ids to call it once with all those queued with the same arguments.
+    """
+    pending = _coalesced.get()
+    if pending is None:
+        function(*args, ids, **kwargs)
+    else:
+        key = (function, args, tuple(sorted(kwargs.items())))
+        pending.setdefault(key, set()).update(ids)
@@ -0,0 +1,255 @@
+"""
+Near-duplicate recipes.
+
+The fingerprint of a recipe is the SHA-1 of its title and sorted
+ingredient names, normalized like `similarity.normalize`, so recipes
+differing only by casing or whitespace share it and are found through
+the (user, fingerprint) index. Recipes differing a little more are found
+with MinHash over shingles, the character trigrams of the title and the
+ingredient names, banded into buckets like `core.similarity`. Pairs with
+an estimated similarity of at least THRESHOLD are duplicates.
+
+Both are stored in RecipeFingerprint and kept current by signal handlers,
+so checking a new recipe costs two indexed lookups whatever the number
+of recipes of the user.
+"""
+
+import hashlib
+from collections import defaultdict
+
+import numpy as np
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from core import similarity
+from core.deferred import coalesce, deferrable
+from core.models import Ingredient, Recipe, RecipeFingerprint
+
+THRESHOLD = 0.8
+
+
+def fingerprint(title, names):
+    """Return the fingerprint of a title with ingredient names"""
+    parts = [similarity.normalize(title)]
+    parts.extend(sorted({similarity.normalize(name) for name in names}))
+
+    return hashlib.sha1("\n".join(parts).encode()).hexdigest()
+
+
+def shingles(title, names):
+    """Return the title trigrams and ingredient names of a recipe"""
+    text = f" {similarity.normalize(title)} "
+    tokens = {"t:" + "".join(chars) for chars in zip(text, text[1:], text[2:])}
+    tokens.update(f"i:{similarity.normalize(name)}" for name in names)
+
+    return sorted(tokens)
+
+
+def recipe_fields(recipe_ids):
+    """Return the owner, title and ingredient names of recipes"""
+    fields = {
+        pk: (user_id, title, [])
+        for pk, user_id, title in Recipe.objects.filter(id__in=recipe_ids)
+        .order_by("id")
+        .values_list("id", "user_id", "title")
+    }
+    links = Recipe.ingredients.through.objects.filter(recipe_id__in=fields)
+    for recipe_id, name in links.values_list("recipe_id", "ingredient__name"):
+        fields[recipe_id][2].append(name)
+
+    return fields
+
+
+def build(fields):
+    """Return the unsaved fingerprints of recipe fields"""
+    if not fields:
+        return []
+
+    ids = list(fields)
+    matrix = similarity.signatures(
+        [shingles(title, names) for _, title, names in fields.values()]
+    )
+    keys = similarity.buckets(matrix, [user_id for user_id, _, _ in fields.values()])
+
+    return [
+        RecipeFingerprint(
+            recipe_id=pk,
+            user_id=fields[pk][0],
+            fingerprint=fingerprint(fields[pk][1], fields[pk][2]),
+            minhash=row.tobytes(),
+            buckets=key.tolist(),
+        )
+        for pk, row, key in zip(ids, matrix, keys)
+    ]
+
+
+def index(recipe_ids):
+    """Recompute the fingerprints of recipes"""
+    recipe_ids = list(recipe_ids)
+    rows = build(recipe_fields(recipe_ids))
+
+    with transaction.atomic():
+        RecipeFingerprint.objects.filter(recipe_id__in=recipe_ids).delete()
+        RecipeFingerprint.objects.bulk_create(rows)
+
+    return len(rows)
+
+
+def find(user_id, title, names, exclude=None):
+    """
+    Return the id of the oldest recipe duplicating a title with ingredient
+    names among the recipes of a user, None when there is none.
+
+    Duplicates of a flagged recipe resolve to the recipe it duplicates.
+    """
+    fingerprints = RecipeFingerprint.objects.filter(user_id=user_id)
+    if exclude is not None:
+        fingerprints = fingerprints.exclude(recipe_id=exclude)
+
+    exact = (
+        fingerprints.filter(fingerprint=fingerprint(title, names))
+        .order_by("recipe_id")
+        .values_list("recipe_id", "recipe__duplicate_of_id")
+        .first()
+    )
+    if exact is not None:
+        return exact[1] or exact[0]
+
+    signature = similarity.signatures([shingles(title, names)])
+    keys = similarity.buckets(signature, [user_id])[0].tolist()
+    candidates = list(
+        fingerprints.filter(buckets__overlap=keys)
+        .order_by("recipe_id")
+        .values_list("recipe_id", "recipe__duplicate_of_id", "minhash")
+    )
+    if not candidates:
+        return None
+
+    scores = similarity.similarities(
+        signature[0], similarity.load(minhash for _, _, minhash in candidates)
+    )
+    best = int(np.argmax(scores))
+    if scores[best] < THRESHOLD:
+        return None
+
+    recipe_id, duplicate_of_id, _ = candidates[best]
+
+    return duplicate_of_id or recipe_id
+
+
+def groups(user_id):
+    """
+    Return the groups of duplicate recipes of a user, oldest first.
+
+    Every group is the oldest recipe not grouped yet with the later ones
+    duplicating it, so all recipes of a group are duplicates of the one
+    they would be merged into, not merely chained through others.
+    """
+    rows = list(
+        RecipeFingerprint.objects.filter(user_id=user_id)
+        .order_by("recipe_id")
+        .values_list("recipe_id", "fingerprint", "minhash", "buckets")
+    )
+    if not rows:
+        return []
+
+    by_key = defaultdict(list)
+    for i, (_, value, _, keys) in enumerate(rows):
+        by_key[value].append(i)
+        for key in keys:
+            by_key[key].append(i)
+
+    matrix = similarity.load(minhash for _, _, minhash, _ in rows)
+    grouped = [False] * len(rows)
+    found = []
+    for i, (recipe_id, value, _, keys) in enumerate(rows):
+        if grouped[i]:
+            continue
+
+        candidates = {j for key in [value, *keys] for j in by_key[key]}
+        candidates = np.array(sorted(j for j in candidates if j > i and not grouped[j]))
+        if not len(candidates):
+            continue
+
+        close = similarity.similarities(matrix[i], matrix[candidates]) >= THRESHOLD
+        members = [
+            int(j) for j, near in zip(candidates, close) if near or rows[j][1] == value
+        ]
+        for j in members:
+            grouped[j] = True
+        if members:
+            found.append([recipe_id, *(rows[j][0] for j in members)])
+
+    return found
+
+
+def merge(ids):
+    """Move the tags of duplicate recipes to the oldest and delete them"""
+    keep, others = ids[0], ids[1:]
+    Tags = Recipe.tags.through
+
+    with transaction.atomic():
+        recipe = Recipe.objects.get(pk=keep)
+        tag_ids = set(
+            Tags.objects.filter(recipe_id__in=others).values_list("tag_id", flat=True)
+        )
+        if tag_ids:
+            recipe.tags.add(*tag_ids)
+        Recipe.objects.filter(duplicate_of_id__in=others).update(duplicate_of=keep)
+        Recipe.objects.filter(id__in=others).delete()
+
+
+def flag(ids):
+    """Mark recipes as duplicates of the oldest"""
+    return Recipe.objects.filter(id__in=ids[1:]).update(duplicate_of=ids[0])
+
+
+@receiver(post_save, sender=Recipe)
+@deferrable
+def recipe_saved(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and "title" not in update_fields):
+        return
+
+    coalesce(index, ids=[instance.pk])
+
+
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+@deferrable
+def ingredients_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            coalesce(index, ids=[instance.pk])
+        return
+
+    if action == "pre_clear":
+        instance._duplicates_recipes = list(
+            instance.recipe_set.values_list("id", flat=True)
+        )
+    elif action == "post_clear":
+        coalesce(index, ids=instance.__dict__.pop("_duplicates_recipes", []))
+    elif action in ("post_add", "post_remove") and pk_set:
+        coalesce(index, ids=pk_set)
+
+
+@receiver(post_save, sender=Ingredient)
+@deferrable
+def ingredient_saved(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        coalesce(index, ids=instance.recipe_set.values_list("id", flat=True))
+
+
+@receiver(pre_delete, sender=Ingredient)
+@deferrable
+def remember_recipes(sender, instance, **kwargs):
+    instance._duplicates_recipes = list(
+        instance.recipe_set.values_list("id", flat=True)
+    )
+
+
+@receiver(post_delete, sender=Ingredient)
+@deferrable
+def ingredient_deleted(sender, instance, **kwargs):
+    recipe_ids = instance.__dict__.pop("_duplicates_recipes", None)
+    if recipe_ids:
+        coalesce(index, ids=recipe_ids)
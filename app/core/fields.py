@@ -0,0 +1,74 @@
+"""
+Custom model fields.
+"""
+
+from django.core.files import File
+from django.db.models import signals
+from django.db.models.fields.files import (
+    ImageField,
+    ImageFieldFile,
+    ImageFileDescriptor,
+)
+
+from core.deferred import active as deferred
+
+
+def replaced_files(instance, field):
+    """Return the stored files to release once the instance is saved"""
+    return instance.__dict__.setdefault(f"_replaced_{field.attname}", [])
+
+
+class ReleasingImageFieldFile(ImageFieldFile):
+    def save(self, name, content, save=True):
+        if self.name and self._committed:
+            replaced_files(self.instance, self.field).append(self.name)
+
+        super().save(name, content, save)
+
+
+class ReleasingImageDescriptor(ImageFileDescriptor):
+    def __set__(self, instance, value):
+        previous = instance.__dict__.get(self.field.attname)
+        name = getattr(previous, "name", previous)
+        committed = getattr(previous, "_committed", True)
+        uploaded = isinstance(value, File) and not getattr(value, "_committed", False)
+
+        if name and committed and (not value or uploaded):
+            replaced_files(instance, self.field).append(name)
+
+        super().__set__(instance, value)
+
+
+class ReleasingImageField(ImageField):
+    """
+    Image field releasing its file from the storage when it is replaced,
+    cleared or its instance deleted.
+
+    Storages that reference count their files, like the content addressed
+    storage, treat `delete` as releasing one reference. Set-based deletes
+    running with maintenance deferred release the files themselves.
+    """
+
+    attr_class = ReleasingImageFieldFile
+    descriptor_class = ReleasingImageDescriptor
+
+    def contribute_to_class(self, cls, name, **kwargs):
+        super().contribute_to_class(cls, name, **kwargs)
+
+        if not cls._meta.abstract:
+            signals.post_save.connect(self.release_replaced, sender=cls)
+            signals.post_delete.connect(self.release_deleted, sender=cls)
+
+    def release_replaced(self, instance, update_fields=None, **kwargs):
+        if update_fields is not None and self.attname not in update_fields:
+            return
+
+        names = replaced_files(instance, self)
+        while names:
+            self.storage.delete(names.pop())
+
+    def release_deleted(self, instance, **kwargs):
+        name = getattr(instance, self.attname).name
+
+        if name and not deferred():
+            self.storage.delete(name)
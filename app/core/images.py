@@ -0,0 +1,140 @@
+"""
+Recipe image processing.
+
+Uploads are stored as-is and a background job renders the resized variants
+configured in `RECIPE_IMAGE_VARIANTS`.
+"""
+
+import io
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from PIL import Image, ImageOps
+
+from core import jobs
+from core.deferred import deferrable
+from core.models import Recipe
+from core.storage import recipe_images
+
+PROCESS_RECIPE_IMAGE = "process_recipe_image"
+
+
+def variant_path(image_name, variant):
+    """Generate file path for an image variant"""
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+
+    return os.path.join("uploads", "recipe", "variants", f"{stem}-{variant}.jpg")
+
+
+def encode_variants(source, sizes):
+    """
+    Decode an image and return its resized JPEG encodings by variant.
+
+    Only needs Pillow, so it can run in worker processes.
+    """
+    with Image.open(source) as img:
+        img = ImageOps.exif_transpose(img).convert("RGB")
+
+    encoded = {}
+    for variant, size in sizes.items():
+        resized = img.copy()
+        resized.thumbnail(size)
+
+        buffer = io.BytesIO()
+        resized.save(buffer, format="JPEG", quality=85, optimize=True)
+        encoded[variant] = buffer.getvalue()
+
+    return encoded
+
+
+def store_variants(image_name, encoded, storage=recipe_images):
+    """Store encoded variants of an image and return their file names"""
+    return {
+        variant: storage.save(variant_path(image_name, variant), ContentFile(data))
+        for variant, data in encoded.items()
+    }
+
+
+def render_variants(image_name, storage=recipe_images):
+    """Resize a stored image into every variant and return their file names."""
+    with storage.open(image_name, "rb") as source:
+        encoded = encode_variants(source, settings.RECIPE_IMAGE_VARIANTS)
+
+    return store_variants(image_name, encoded, storage)
+
+
+def delete_files(names, storage=recipe_images):
+    """Release files from the storage"""
+    for name in names:
+        storage.delete(name)
+
+
+@receiver(post_delete, sender=Recipe)
+@deferrable
+def recipe_deleted(sender, instance, **kwargs):
+    # The image itself is released by its field.
+    delete_files(instance.image_variants.values())
+
+
+def release(recipe_ids, storage=recipe_images):
+    """Release the images and variants of recipes about to be deleted"""
+    names = []
+    recipes = Recipe.objects.filter(id__in=recipe_ids)
+    for image, variants in recipes.values_list("image", "image_variants"):
+        names.append(image)
+        names.extend(variants.values())
+
+    storage.release(names)
+
+
+def swap_variants(recipe_id, image_name, variants):
+    """
+    Point the recipe at freshly rendered variants in one transaction.
+
+    Returns False and discards the variants when the image was replaced or
+    the recipe deleted while they were rendered.
+    """
+    with transaction.atomic():
+        recipe = Recipe.objects.select_for_update().filter(pk=recipe_id).first()
+
+        if recipe is None or recipe.image.name != image_name:
+            delete_files(variants.values())
+            return False
+
+        delete_files(recipe.image_variants.values())
+        recipe.image_variants = variants
+        recipe.image_status = Recipe.ImageStatus.READY
+        recipe.save(update_fields=["image_variants", "image_status"])
+
+    return True
+
+
+def schedule_processing(recipe):
+    """Mark the recipe image as pending and queue rendering its variants"""
+    recipe.image_status = Recipe.ImageStatus.PENDING
+    recipe.save(update_fields=["image_status"])
+
+    return jobs.enqueue(
+        PROCESS_RECIPE_IMAGE, recipe_id=recipe.pk, image_name=recipe.image.name
+    )
+
+
+@jobs.register(PROCESS_RECIPE_IMAGE)
+def process_recipe_image(recipe_id, image_name):
+    """Job handler rendering the variants of a recipe image"""
+    current = Recipe.objects.filter(pk=recipe_id, image=image_name)
+
+    if not current.update(image_status=Recipe.ImageStatus.PROCESSING):
+        return
+
+    try:
+        variants = render_variants(image_name)
+    except Exception:
+        current.update(image_status=Recipe.ImageStatus.FAILED)
+        raise
+
+    swap_variants(recipe_id, image_name, variants)
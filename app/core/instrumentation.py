@@ -0,0 +1,166 @@
+"""
+Per-request instrumentation.
+
+`RequestMetricsMiddleware` counts the SQL queries and database time of
+every request, times serialization and rendering, and reports them in a
+`Server-Timing` header and a structured log line.
+"""
+
+import json
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+from core import metrics as core_metrics
+
+logger = logging.getLogger("core.requests")
+
+_current = ContextVar("request_metrics", default=None)
+
+
+class RequestMetrics:
+    """Measurements collected while handling one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.timings = {"db": 0.0, "serializer": 0.0, "render": 0.0}
+        self.active = set()
+
+    def __call__(self, execute, sql, params, many, context):
+        # Installed as a database execute wrapper.
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.timings["db"] += time.perf_counter() - start
+
+    @property
+    def total(self):
+        return time.perf_counter() - self.started
+
+
+def current():
+    """Return the metrics of the request being handled, if any"""
+    return _current.get()
+
+
+@contextmanager
+def timed(name):
+    """Add the time spent in the block to the current request"""
+    metrics = current()
+
+    # Nested blocks of the same name, like nested serializers, count once.
+    if metrics is None or name in metrics.active:
+        yield
+        return
+
+    metrics.active.add(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.active.discard(name)
+        metrics.timings[name] = metrics.timings.get(name, 0.0) + (
+            time.perf_counter() - start
+        )
+
+
+class TimedSerializerMixin:
+    """Count validation and representation as serializer time"""
+
+    def run_validation(self, *args, **kwargs):
+        with timed("serializer"):
+            return super().run_validation(*args, **kwargs)
+
+    def to_representation(self, instance):
+        with timed("serializer"):
+            return super().to_representation(instance)
+
+
+class RequestMetricsMiddleware:
+    """Record query count and timings of every request"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        self.report(request, response, metrics)
+
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered right after the template response
+        # middleware ran, the post render callback marks the end.
+        metrics = current()
+        if metrics is not None:
+            start = time.perf_counter()
+
+            def rendered(response):
+                metrics.timings["render"] += time.perf_counter() - start
+
+            response.add_post_render_callback(rendered)
+
+        return response
+
+    def report(self, request, response, metrics):
+        """Add the Server-Timing header and log the request"""
+        total = metrics.total * 1000
+        timings = {name: value * 1000 for name, value in metrics.timings.items()}
+        match = request.resolver_match
+
+        over_budget = []
+        if metrics.queries > settings.REQUEST_QUERY_BUDGET:
+            over_budget.append("queries")
+        if total > settings.REQUEST_LATENCY_BUDGET:
+            over_budget.append("latency")
+
+        if settings.REQUEST_SERVER_TIMING:
+            entries = [f'db;dur={timings["db"]:.1f};desc="{metrics.queries} queries"']
+            entries += [
+                f"{name};dur={value:.1f}"
+                for name, value in timings.items()
+                if name != "db"
+            ]
+            entries.append(f"total;dur={total:.1f}")
+            response["Server-Timing"] = ", ".join(entries)
+
+        fields = {
+            "method": request.method,
+            "path": request.path,
+            "view": match.view_name if match else None,
+            "status": response.status_code,
+            "queries": metrics.queries,
+            "total_ms": round(total, 1),
+            **{f"{name}_ms": round(value, 1) for name, value in timings.items()},
+            "over_budget": over_budget,
+        }
+        core_metrics.observe_request(
+            fields["view"],
+            request.method,
+            response.status_code,
+            metrics.total,
+            metrics.queries,
+            metrics.timings["db"],
+        )
+        logger.log(
+            logging.WARNING if over_budget else logging.INFO,
+            json.dumps(fields),
+            extra={"request_metrics": fields},
+        )
@@ -0,0 +1,119 @@
+"""
+Database backed background jobs.
+
+Jobs are rows in the `Job` table. The `process_jobs` management command
+claims them with `SELECT ... FOR UPDATE SKIP LOCKED`, so any number of
+workers can run side by side without an external broker.
+"""
+
+import logging
+import traceback
+from contextvars import ContextVar
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import Job
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+
+_running = ContextVar("running_job", default=None)
+
+
+def register(kind):
+    """Register the decorated function as the handler for `kind` jobs."""
+
+    def decorator(func):
+        HANDLERS[kind] = func
+        return func
+
+    return decorator
+
+
+def enqueue(kind, **payload):
+    """Create and return a pending job."""
+    return Job.objects.create(kind=kind, payload=payload)
+
+
+def claim_next():
+    """Lock the next runnable job, mark it as running and return it."""
+    with transaction.atomic():
+        job = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status=Job.Status.PENDING, run_after__lte=timezone.now())
+            .order_by("run_after", "id")
+            .first()
+        )
+
+        if job is None:
+            return None
+
+        job.status = Job.Status.RUNNING
+        job.attempts += 1
+        job.save(update_fields=["status", "attempts", "updated_at"])
+
+    return job
+
+
+def run(job):
+    """Run a claimed job and record the outcome, retrying with backoff."""
+    token = _running.set(job)
+    try:
+        handler = HANDLERS[job.kind]
+        handler(**job.payload)
+    except Exception:
+        logger.exception("Job %s failed", job)
+        job.last_error = traceback.format_exc()
+
+        if job.attempts < settings.JOB_MAX_ATTEMPTS:
+            delay = settings.JOB_RETRY_DELAY * 2 ** (job.attempts - 1)
+            job.status = Job.Status.PENDING
+            job.run_after = timezone.now() + timedelta(seconds=delay)
+        else:
+            job.status = Job.Status.FAILED
+    else:
+        job.status = Job.Status.DONE
+    finally:
+        _running.reset(token)
+
+    job.save(update_fields=["status", "run_after", "last_error", "updated_at"])
+
+    return job
+
+
+def report(**progress):
+    """
+    Record the progress of the running job, merged into what was reported
+    before. Reporting also keeps long jobs from being requeued as stale.
+    """
+    job = _running.get()
+    if job is None:
+        return
+
+    job.progress.update(progress)
+    Job.objects.filter(pk=job.pk).update(
+        progress=job.progress, updated_at=timezone.now()
+    )
+
+
+def run_next():
+    """Claim and run the next job, return None when the queue is empty."""
+    job = claim_next()
+
+    if job is not None:
+        run(job)
+
+    return job
+
+
+def requeue_stale(timeout):
+    """Put jobs left running by a dead worker back in the queue."""
+    cutoff = timezone.now() - timedelta(seconds=timeout)
+
+    return Job.objects.filter(status=Job.Status.RUNNING, updated_at__lt=cutoff).update(
+        status=Job.Status.PENDING
+    )
@@ -0,0 +1,127 @@
+"""
+Django command to find and resolve duplicate recipes
+"""
+
+import os
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from core import duplicates
+from core.management.utils import add_counts, batched, parallel_map
+from core.models import Recipe
+
+
+def dedupe(user_ids, action, batch_size):
+    """Index and resolve the duplicates of users, return counts"""
+    counts = {"users": 0, "recipes": 0, "groups": 0, "duplicates": 0}
+
+    for user_id in user_ids:
+        recipe_ids = list(
+            Recipe.objects.filter(user_id=user_id)
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        for batch in batched(recipe_ids, batch_size):
+            duplicates.index(batch)
+
+        groups = duplicates.groups(user_id)
+        for ids in groups:
+            if action == "merge":
+                duplicates.merge(ids)
+            elif action == "flag":
+                duplicates.flag(ids)
+
+        counts["users"] += 1
+        counts["recipes"] += len(recipe_ids)
+        counts["groups"] += len(groups)
+        counts["duplicates"] += sum(len(ids) - 1 for ids in groups)
+
+    return counts
+
+
+class Command(BaseCommand):
+    """Django command deduplicating the recipes of every user"""
+
+    help = (
+        "Fingerprint the recipes of every user, group recipes that are "
+        "duplicates up to casing and whitespace or near-duplicates by title "
+        "and ingredients, and flag or merge them into the oldest recipe of "
+        "each group. Users are processed in chunks by parallel workers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--merge",
+            action="store_true",
+            help="Move the tags of duplicates to the oldest recipe and delete "
+            "them instead of flagging them.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report the duplicates found.",
+        )
+        parser.add_argument(
+            "--user",
+            type=int,
+            action="append",
+            dest="users",
+            help="Only deduplicate the recipes of this user id, repeatable.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="Number of worker processes.",
+        )
+        parser.add_argument(
+            "--users-per-chunk",
+            type=int,
+            default=50,
+            help="Users handed to a worker at a time.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=2000,
+            help="Recipes fingerprinted per query.",
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoints for command."""
+        if options["dry_run"]:
+            action = "report"
+        else:
+            action = "merge" if options["merge"] else "flag"
+
+        user_ids = options["users"] or list(
+            get_user_model()
+            .objects.filter(recipe__isnull=False)
+            .distinct()
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        chunks = batched(user_ids, options["users_per_chunk"])
+        args = (action, options["batch_size"])
+
+        start = time.monotonic()
+        totals = {"users": 0, "recipes": 0, "groups": 0, "duplicates": 0}
+
+        for counts in parallel_map(
+            dedupe, [(chunk, *args) for chunk in chunks], options["workers"]
+        ):
+            add_counts(totals, counts)
+            self.stdout.write(
+                f"{totals['users']} user(s), {totals['duplicates']} duplicate(s)"
+            )
+
+        verb = {"report": "Found", "flag": "Flagged", "merge": "Merged"}[action]
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{verb} {totals['duplicates']} duplicate(s) in {totals['groups']} "
+                f"group(s) among {totals['recipes']} recipe(s) "
+                f"in {time.monotonic() - start:.1f}s"
+            )
+        )
@@ -0,0 +1,218 @@
+"""
+Django command to garbage collect media files
+"""
+
+import os
+import uuid
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from core import uploads
+from core.management.utils import batched
+from core.models import ImageUpload, Recipe, StoredFile
+from core.storage import recipe_images
+
+
+def scan(directory, exclude=()):
+    """Yield the path and stat of every file below a directory"""
+    try:
+        entries = os.scandir(directory)
+    except FileNotFoundError:
+        return
+
+    with entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if entry.path not in exclude:
+                    yield from scan(entry.path, exclude)
+            elif entry.is_file(follow_symlinks=False):
+                yield entry.path, entry.stat(follow_symlinks=False)
+
+
+def upload_id(path):
+    """Return the upload id of a partial file, None if it has none"""
+    try:
+        return uuid.UUID(os.path.basename(path).split(".")[0])
+    except ValueError:
+        return None
+
+
+def remove(path):
+    """Remove a file that may already be gone"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class Command(BaseCommand):
+    """Django command removing unreferenced and orphaned media files"""
+
+    help = (
+        "Remove recipe images nobody references any more, files under "
+        "MEDIA_ROOT/uploads unknown to the database and abandoned chunked "
+        "uploads. Files younger than the grace period are always kept."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace-hours",
+            type=int,
+            default=24,
+            help="Only collect files untouched for this many hours.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of files looked up or removed per query.",
+        )
+        parser.add_argument(
+            "--recount",
+            action="store_true",
+            help="Recompute reference counts from the recipes first. "
+            "Run it while no images are being uploaded.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report what would be removed without removing anything.",
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoints for command."""
+        self.batch_size = options["batch_size"]
+        self.dry_run = options["dry_run"]
+        cutoff = timezone.now() - timedelta(hours=options["grace_hours"])
+
+        if options["recount"]:
+            fixed = self.recount()
+            self.stdout.write(f"Fixed {fixed} reference count(s)")
+
+        removed = self.collect_unreferenced(cutoff)
+        self.stdout.write(f"Unreferenced files: {removed}")
+
+        removed = self.collect_orphans(cutoff)
+        self.stdout.write(f"Orphaned files: {removed}")
+
+        removed = self.collect_uploads(cutoff)
+        self.stdout.write(f"Abandoned uploads: {removed}")
+
+        self.stdout.write(self.style.SUCCESS("Media collected!"))
+
+    def recount(self):
+        """Reset reference counts to the references held by recipes"""
+        counts = Counter()
+        recipes = Recipe.objects.exclude(image__isnull=True).exclude(image="")
+        for image, variants in recipes.values_list("image", "image_variants").iterator(
+            chunk_size=self.batch_size
+        ):
+            counts[image] += 1
+            counts.update(variants.values())
+
+        fixed = 0
+        with transaction.atomic():
+            stored = StoredFile.objects.select_for_update().order_by("id")
+            for batch in batched(stored.iterator(self.batch_size), self.batch_size):
+                changed = []
+                for stored_file in batch:
+                    refcount = counts.pop(stored_file.name, 0)
+                    if stored_file.refcount != refcount:
+                        stored_file.refcount = refcount
+                        stored_file.updated_at = timezone.now()
+                        changed.append(stored_file)
+
+                fixed += len(changed)
+                if not self.dry_run:
+                    StoredFile.objects.bulk_update(changed, ["refcount", "updated_at"])
+
+            fixed += len(counts)
+            if not self.dry_run:
+                StoredFile.objects.bulk_create(
+                    [StoredFile(name=name, refcount=n) for name, n in counts.items()],
+                    batch_size=self.batch_size,
+                )
+
+        return fixed
+
+    def collect_unreferenced(self, cutoff):
+        """Remove stored files whose reference count dropped to zero"""
+        removed = 0
+        last_id = 0
+
+        while True:
+            with transaction.atomic():
+                batch = list(
+                    StoredFile.objects.select_for_update(skip_locked=True)
+                    .filter(refcount=0, updated_at__lt=cutoff, id__gt=last_id)
+                    .order_by("id")[: self.batch_size]
+                )
+
+                if not batch:
+                    return removed
+
+                last_id = batch[-1].id
+                removed += len(batch)
+                if self.dry_run:
+                    continue
+
+                for stored_file in batch:
+                    remove(recipe_images.path(stored_file.name))
+                StoredFile.objects.filter(id__in=[f.id for f in batch]).delete()
+
+    def collect_orphans(self, cutoff):
+        """Remove files no stored file row knows about"""
+        root = os.path.join(settings.MEDIA_ROOT, "uploads")
+        files = scan(root, exclude={settings.IMAGE_UPLOAD_TEMP_DIR})
+        cutoff = cutoff.timestamp()
+        removed = 0
+
+        for batch in batched(files, self.batch_size):
+            names = {
+                os.path.relpath(path, settings.MEDIA_ROOT): path
+                for path, stat in batch
+                if stat.st_mtime < cutoff
+            }
+            known = StoredFile.objects.filter(name__in=names).values_list(
+                "name", flat=True
+            )
+
+            for name in names.keys() - set(known):
+                removed += 1
+                if not self.dry_run:
+                    remove(names[name])
+
+        return removed
+
+    def collect_uploads(self, cutoff):
+        """Remove chunked uploads nobody finished"""
+        stale = ImageUpload.objects.filter(updated_at__lt=cutoff)
+        removed = 0
+
+        for upload in stale.iterator(self.batch_size):
+            removed += 1
+            if not self.dry_run:
+                uploads.discard(upload)
+
+        cutoff = cutoff.timestamp()
+        files = scan(settings.IMAGE_UPLOAD_TEMP_DIR)
+        for batch in batched(files, self.batch_size):
+            paths = {
+                upload_id(path) or path: path
+                for path, stat in batch
+                if stat.st_mtime < cutoff
+            }
+            ids = [key for key in paths if isinstance(key, uuid.UUID)]
+            known = ImageUpload.objects.filter(pk__in=ids)
+
+            for pk in paths.keys() - set(known.values_list("pk", flat=True)):
+                removed += 1
+                if not self.dry_run:
+                    remove(paths[pk])
+
+        return removed
@@ -0,0 +1,78 @@
+"""
+Django command to process background jobs
+"""
+
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core import jobs, querylog
+
+
+class Command(BaseCommand):
+    """Django command running queued jobs until stopped"""
+
+    help = "Process jobs from the database backed job queue."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit as soon as the queue is empty.",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=1.0,
+            help="Seconds to wait when the queue is empty.",
+        )
+        parser.add_argument(
+            "--stale-after",
+            type=int,
+            default=600,
+            help="Requeue jobs running for longer than this many seconds.",
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoints for command."""
+        self.running = True
+        handlers = {
+            signum: signal.signal(signum, self.stop)
+            for signum in (signal.SIGTERM, signal.SIGINT)
+        }
+
+        self.stdout.write("Processing jobs ...")
+
+        try:
+            self.work(options)
+        finally:
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+
+        self.stdout.write(self.style.SUCCESS("Worker stopped!"))
+
+    def work(self, options):
+        """Run jobs until stopped or, with --once, the queue is empty"""
+        while self.running:
+            close_old_connections()
+            querylog.query_log.flush_if_due()
+
+            requeued = jobs.requeue_stale(options["stale_after"])
+            if requeued:
+                self.stdout.write(f"Requeued {requeued} stale job(s)")
+
+            job = jobs.run_next()
+
+            if job is None:
+                if options["once"]:
+                    break
+                time.sleep(options["sleep"])
+                continue
+
+            self.stdout.write(f"{job} after {job.attempts} attempt(s)")
+
+    def stop(self, signum, frame):
+        """Finish the current job and exit"""
+        self.running = False
@@ -0,0 +1,40 @@
+"""
+Django command to recompute the recipe statistics
+"""
+
+from django.core.management.base import BaseCommand
+
+from core import stats
+
+
+class Command(BaseCommand):
+    """Django command rebuilding the recipe statistics of users"""
+
+    help = (
+        "Recompute the recipe statistics of every user, or of the given "
+        "users, from their recipes and reconcile the recipe counts of their "
+        "tags and ingredients. Run it after writes bypassing the model "
+        "signals, such as raw SQL or COPY imports."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            type=int,
+            action="append",
+            dest="users",
+            help="Only rebuild the statistics of this user id, repeatable.",
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoints for command."""
+        count = stats.rebuild(options["users"])
+        self.stdout.write(f"Rebuilt the statistics of {count} user(s)")
+
+        tags, ingredients = stats.reconcile(options["users"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Fixed the recipe count of {tags} tag(s) "
+                f"and {ingredients} ingredient(s)"
+            )
+        )
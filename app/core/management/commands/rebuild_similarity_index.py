@@ -0,0 +1,52 @@
+"""
+Django command to rebuild the similar recipe index
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import similarity
+
+
+class Command(BaseCommand):
+    """Django command recomputing the MinHash signatures of recipes"""
+
+    help = (
+        "Recompute the MinHash signatures and LSH buckets of every recipe, or "
+        "of the recipes of the given users, in batches hashed with NumPy. Run "
+        "it after migrating and after writes bypassing the model signals."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            type=int,
+            action="append",
+            dest="users",
+            help="Only rebuild the recipes of this user id, repeatable.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=2000,
+            help="Recipes hashed and written per transaction.",
+        )
+        parser.add_argument(
+            "--missing",
+            action="store_true",
+            help="Only index the recipes without a signature, e.g. on deploys.",
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoints for command."""
+        start = time.monotonic()
+        count = similarity.rebuild(
+            options["users"], options["batch_size"], options["missing"]
+        )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Indexed {count} recipe(s) in {time.monotonic() - start:.1f}s"
+            )
+        )
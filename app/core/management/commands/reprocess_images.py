@@ -0,0 +1,157 @@
+"""
+Django command to regenerate the variants of existing recipe images
+"""
+
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import images
+from core.models import Recipe
+from core.storage import recipe_images
+
+
+class Command(BaseCommand):
+    """Django command rendering recipe image variants in parallel"""
+
+    help = (
+        "Regenerate the variants of every recipe image, e.g. after changing "
+        "RECIPE_IMAGE_VARIANTS. Decoding and resizing run in a process pool; "
+        "progress is checkpointed after every batch so an interrupted run "
+        "resumes where it stopped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="Number of worker processes.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=200,
+            help="Images handed to the pool between checkpoints.",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            default="reprocess_images.checkpoint",
+            help="File recording the last recipe id done.",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Ignore the checkpoint and start from the first recipe.",
+        )
+        parser.add_argument(
+            "--max-rate",
+            type=float,
+            default=0,
+            help="Process at most this many images per second, 0 for no limit.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report the images that would be processed and exit.",
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoints for command."""
+        self.options = options
+        start_id = 0 if options["restart"] else self.read_checkpoint()
+
+        recipes = (
+            Recipe.objects.exclude(image__isnull=True)
+            .exclude(image="")
+            .filter(id__gt=start_id)
+            .order_by("id")
+        )
+        total = recipes.count()
+        self.stdout.write(f"{total} image(s) to process after recipe {start_id}")
+
+        if options["dry_run"] or not total:
+            return
+
+        rows = recipes.values_list("id", "image").iterator(options["batch_size"])
+        self.done = self.failed = 0
+        self.started = time.monotonic()
+
+        with ProcessPoolExecutor(max_workers=options["workers"]) as pool:
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) == options["batch_size"]:
+                    self.process(pool, batch, total)
+                    batch = []
+            if batch:
+                self.process(pool, batch, total)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Processed {self.done} image(s), {self.failed} failed")
+        )
+
+    def process(self, pool, batch, total):
+        """Render a batch in the pool, swap the variants in and checkpoint"""
+        sizes = settings.RECIPE_IMAGE_VARIANTS
+        path = recipe_images.path
+        futures = [
+            (recipe_id, name, pool.submit(images.encode_variants, path(name), sizes))
+            for recipe_id, name in batch
+        ]
+
+        for recipe_id, name, future in futures:
+            try:
+                variants = images.store_variants(name, future.result())
+            except Exception as exc:
+                self.failed += 1
+                self.stderr.write(f"Recipe {recipe_id}: {exc}")
+                Recipe.objects.filter(pk=recipe_id, image=name).update(
+                    image_status=Recipe.ImageStatus.FAILED
+                )
+            else:
+                images.swap_variants(recipe_id, name, variants)
+
+            self.done += 1
+
+        self.write_checkpoint(batch[-1][0])
+        self.report(total)
+        self.throttle()
+
+    def report(self, total):
+        """Write progress and throughput"""
+        elapsed = time.monotonic() - self.started
+        rate = self.done / elapsed if elapsed else 0
+        eta = (total - self.done) / rate if rate else 0
+
+        self.stdout.write(
+            f"{self.done}/{total} image(s), {self.failed} failed, "
+            f"{rate:.1f} image(s)/s, ETA {eta:.0f}s"
+        )
+
+    def throttle(self):
+        """Sleep to stay under --max-rate"""
+        if self.options["max_rate"] > 0:
+            expected = self.done / self.options["max_rate"]
+            elapsed = time.monotonic() - self.started
+            if expected > elapsed:
+                time.sleep(expected - elapsed)
+
+    def read_checkpoint(self):
+        """Return the last recipe id processed by a previous run"""
+        try:
+            with open(self.options["checkpoint"]) as f:
+                return json.load(f)["last_id"]
+        except FileNotFoundError:
+            return 0
+
+    def write_checkpoint(self, last_id):
+        """Atomically record the last recipe id processed"""
+        path = self.options["checkpoint"]
+        with open(f"{path}.tmp", "w") as f:
+            json.dump({"last_id": last_id}, f)
+        os.replace(f"{path}.tmp", path)
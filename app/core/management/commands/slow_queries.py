@@ -0,0 +1,104 @@
+"""
+Django command to report the slowest queries of the query log
+"""
+
+import json
+import os
+import shutil
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import querylog
+
+SORT_KEYS = {
+    "total": lambda stats: stats["total_ms"],
+    "calls": lambda stats: stats["calls"],
+    "mean": lambda stats: stats["total_ms"] / stats["calls"],
+    "p50": lambda stats: stats["p50_ms"],
+    "p99": lambda stats: stats["p99_ms"],
+    "max": lambda stats: stats["max_ms"],
+    "rows": lambda stats: stats["rows"],
+}
+
+
+class Command(BaseCommand):
+    """Django command dumping the top offenders of the query log"""
+
+    help = (
+        "Merge the query log of every process in QUERY_LOG_DIR and print the "
+        "statements with the highest total time, or another --sort key."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sort",
+            choices=SORT_KEYS,
+            default="total",
+            help="Order the statements by this statistic.",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=20,
+            help="Number of statements to report.",
+        )
+        parser.add_argument(
+            "--plans",
+            action="store_true",
+            help="Include the captured EXPLAIN plans.",
+        )
+        parser.add_argument(
+            "--json",
+            action="store_true",
+            help="Write the report as JSON.",
+        )
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help="Delete the query log instead of reporting it.",
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoints for command."""
+        directory = settings.QUERY_LOG_DIR
+        if not directory:
+            raise CommandError("QUERY_LOG_DIR is not set.")
+
+        if options["reset"]:
+            shutil.rmtree(directory, ignore_errors=True)
+            os.makedirs(directory, exist_ok=True)
+            self.stdout.write(self.style.SUCCESS("Query log reset!"))
+            return
+
+        report = []
+        for key, stats in querylog.load(directory).items():
+            stats["fingerprint"] = key
+            # Bucket bounds, never above the slowest call seen.
+            for name, q in [("p50_ms", 0.5), ("p99_ms", 0.99)]:
+                bound = querylog.percentile(stats["buckets"], q)
+                stats[name] = min(bound, round(stats["max_ms"], 1))
+            del stats["buckets"]
+            if not options["plans"]:
+                del stats["plan"]
+            report.append(stats)
+
+        report.sort(key=SORT_KEYS[options["sort"]], reverse=True)
+        report = report[: options["limit"]]
+
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        for stats in report:
+            self.stdout.write(
+                f"{stats['fingerprint']}  calls={stats['calls']} "
+                f"total={stats['total_ms']:.1f}ms "
+                f"mean={stats['total_ms'] / stats['calls']:.2f}ms "
+                f"p50<={stats['p50_ms']}ms p99<={stats['p99_ms']}ms "
+                f"max={stats['max_ms']:.1f}ms rows={stats['rows']}"
+            )
+            self.stdout.write(f"    {stats['sql']}")
+            if stats.get("plan"):
+                for line in stats["plan"].splitlines():
+                    self.stdout.write(f"    | {line}")
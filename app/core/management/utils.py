@@ -0,0 +1,55 @@
+"""
+Helpers shared by the management commands working through large tables.
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.db import connections
+
+
+def batched(iterable, size):
+    """Yield lists of up to size items"""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
+def in_worker(function, *args):
+    # The parent closed its connections before forking, workers open their own.
+    try:
+        return function(*args)
+    finally:
+        connections.close_all()
+
+
+def parallel_map(function, arguments, workers):
+    """
+    Call a function with every tuple of arguments, in forked worker
+    processes when there are several workers and calls, and yield the
+    results as they complete.
+    """
+    arguments = list(arguments)
+    if workers < 2 or len(arguments) < 2:
+        for args in arguments:
+            yield function(*args)
+        return
+
+    connections.close_all()
+    context = multiprocessing.get_context("fork")
+    with ProcessPoolExecutor(workers, mp_context=context) as pool:
+        futures = [pool.submit(in_worker, function, *args) for args in arguments]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def add_counts(totals, counts):
+    """Add the counts returned for a chunk to the totals"""
+    for name, count in counts.items():
+        totals[name] += count
@@ -0,0 +1,52 @@
+"""
+Access checked media delivery.
+
+Views authorize the request and hand the transfer to nginx with
+`X-Accel-Redirect`, so workers never stream file bytes in production.
+"""
+
+import mimetypes
+import os
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from rest_framework.renderers import BaseRenderer
+
+
+class ImageRenderer(BaseRenderer):
+    """Let clients accepting only images reach the media views"""
+
+    media_type = "image/*"
+    format = "image"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data if isinstance(data, bytes) else b""
+
+
+def etag_for(name):
+    """Return the ETag of a stored file, named after its content"""
+    return f'"{os.path.splitext(os.path.basename(name))[0]}"'
+
+
+def media_response(request, storage, name):
+    """Return a response delivering a stored file"""
+    etag = etag_for(name)
+    response = get_conditional_response(request, etag=etag)
+
+    if response is None:
+        content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+
+        if settings.MEDIA_X_ACCEL_REDIRECT:
+            response = HttpResponse(content_type=content_type)
+            response["X-Accel-Redirect"] = quote(
+                settings.MEDIA_X_ACCEL_REDIRECT_URL + name
+            )
+        else:
+            response = FileResponse(storage.open(name), content_type=content_type)
+
+    response["ETag"] = etag
+    patch_cache_control(response, private=True, max_age=settings.MEDIA_CACHE_MAX_AGE)
+
+    return response
@@ -0,0 +1,120 @@
+"""
+Prometheus metrics.
+
+uWSGI runs several worker processes, so when `PROMETHEUS_MULTIPROC_DIR` is
+set every worker writes its samples to memory mapped files in that
+directory and a scrape aggregates the files of all workers. Without it,
+as under runserver and in tests, metrics live in the process.
+"""
+
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+try:
+    import uwsgi
+except ImportError:
+    uwsgi = None
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Request latency by view, method and status code.",
+    ["view", "method", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries",
+    "SQL queries run per request by view.",
+    ["view"],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200),
+)
+REQUEST_DB_SECONDS = Counter(
+    "http_request_db_seconds",
+    "Time spent in SQL queries by view.",
+    ["view"],
+)
+CACHE_LOOKUPS = Counter(
+    "cache_lookups",
+    "Cache lookups by cache and result, hit or miss.",
+    ["cache", "result"],
+)
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+
+def observe_request(view, method, status, seconds, queries, db_seconds):
+    """Record a handled request"""
+    view = view or "unmatched"
+    REQUEST_LATENCY.labels(view, method, status).observe(seconds)
+    REQUEST_QUERIES.labels(view).observe(queries)
+    REQUEST_DB_SECONDS.labels(view).inc(db_seconds)
+
+
+def cache_lookup(cache, hit):
+    """Record a lookup in one of the application caches"""
+    CACHE_LOOKUPS.labels(cache, "hit" if hit else "miss").inc()
+
+
+class UwsgiCollector:
+    """Report the uWSGI workers, read from the master shared memory"""
+
+    def collect(self):
+        if uwsgi is None:
+            return
+
+        workers = uwsgi.workers()
+        requests = GaugeMetricFamily(
+            "uwsgi_worker_requests", "Requests handled by worker.", labels=["worker"]
+        )
+        busy = GaugeMetricFamily(
+            "uwsgi_worker_busy",
+            "1 if the worker is handling a request.",
+            labels=["worker"],
+        )
+        avg_rt = GaugeMetricFamily(
+            "uwsgi_worker_avg_response_seconds",
+            "Average response time of the worker.",
+            labels=["worker"],
+        )
+        rss = GaugeMetricFamily(
+            "uwsgi_worker_rss_bytes",
+            "Resident memory of the worker.",
+            labels=["worker"],
+        )
+
+        for worker in workers:
+            worker_id = str(worker["id"])
+            requests.add_metric([worker_id], worker["requests"])
+            busy.add_metric([worker_id], worker["status"] == "busy")
+            avg_rt.add_metric([worker_id], worker["avg_rt"] / 1e6)
+            rss.add_metric([worker_id], worker["rss"])
+
+        yield GaugeMetricFamily(
+            "uwsgi_workers", "Number of uWSGI workers.", value=len(workers)
+        )
+        yield from [requests, busy, avg_rt, rss]
+
+
+uwsgi_collector = UwsgiCollector()
+REGISTRY.register(uwsgi_collector)
+
+
+def exposition():
+    """Return the metrics of all workers in the text exposition format"""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(uwsgi_collector)
+    else:
+        registry = REGISTRY
+
+    return generate_latest(registry)
@@ -0,0 +1,62 @@
+"""
+Browser-only middleware.
+
+API views authenticate by token, so sessions, CSRF protection, messages
+and X-Frame-Options only serve the admin and other pages used from a
+browser. The middleware classes here are Django's, skipped for paths
+under /api/ except API_SESSION_PATHS, the API pages staff open in a
+browser with their session. Skipping the session middleware also saves
+the session and user lookups of clients sending a session cookie.
+"""
+
+from django.conf import settings
+from django.contrib.auth import middleware as auth
+from django.contrib.messages import middleware as messages
+from django.contrib.sessions import middleware as sessions
+from django.middleware import clickjacking, csrf
+
+API_PREFIX = "/api/"
+
+
+def is_api(path):
+    """Return whether a path is only used by token authenticated clients"""
+    return path.startswith(API_PREFIX) and not path.startswith(
+        tuple(settings.API_SESSION_PATHS)
+    )
+
+
+class BrowserOnlyMixin:
+    """Run a middleware for browser paths only"""
+
+    async_capable = False
+
+    def __call__(self, request):
+        if is_api(request.path_info):
+            return self.get_response(request)
+
+        return super().__call__(request)
+
+
+class SessionMiddleware(BrowserOnlyMixin, sessions.SessionMiddleware):
+    pass
+
+
+class CsrfViewMiddleware(BrowserOnlyMixin, csrf.CsrfViewMiddleware):
+    def process_view(self, request, callback, callback_args, callback_kwargs):
+        # Called by the handler itself, not from __call__.
+        if is_api(request.path_info):
+            return None
+
+        return super().process_view(request, callback, callback_args, callback_kwargs)
+
+
+class AuthenticationMiddleware(BrowserOnlyMixin, auth.AuthenticationMiddleware):
+    pass
+
+
+class MessageMiddleware(BrowserOnlyMixin, messages.MessageMiddleware):
+    pass
+
+
+class XFrameOptionsMiddleware(BrowserOnlyMixin, clickjacking.XFrameOptionsMiddleware):
+    pass
@@ -0,0 +1,71 @@
+# Generated by Django 4.0.6 on 2026-10-19 08:51
+
+from collections import Counter
+
+import core.fields
+import core.models
+from django.db import migrations, models
+
+
+def register_existing_files(apps, schema_editor):
+    """Reference count the recipe images stored before deduplication"""
+    Recipe = apps.get_model("core", "Recipe")
+    StoredFile = apps.get_model("core", "StoredFile")
+
+    counts = Counter()
+    recipes = Recipe.objects.exclude(image__isnull=True).exclude(image="")
+    for image, variants in recipes.values_list("image", "image_variants").iterator():
+        counts[image] += 1
+        counts.update(variants.values())
+
+    StoredFile.objects.bulk_create(
+        [StoredFile(name=name, refcount=count) for name, count in counts.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0007_imageupload"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="recipe",
+            name="image",
+            field=core.fields.ReleasingImageField(
+                null=True,
+                storage=core.models.recipe_image_storage,
+                upload_to=core.models.recipe_image_file_path,
+            ),
+        ),
+        migrations.CreateModel(
+            name="StoredFile",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=255, unique=True)),
+                ("size", models.PositiveBigIntegerField(default=0)),
+                ("refcount", models.PositiveIntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["refcount", "updated_at"],
+                        name="core_stored_refcoun_16a18f_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(register_existing_files, migrations.RunPython.noop),
+    ]
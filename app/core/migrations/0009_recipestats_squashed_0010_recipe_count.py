@@ -0,0 +1,88 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+# The statistics and recipe counts of the existing rows, computed in SQL
+# rather than with core.stats, which follows the current models.
+COMPUTE_STATS = """
+    INSERT INTO core_recipestats
+        (user_id, recipe_count, total_time_minutes, total_price, updated_at)
+    SELECT user_id, count(*), sum(time_minutes), sum(price), now()
+    FROM core_recipe
+    GROUP BY user_id;
+
+    UPDATE core_tag SET recipe_count = counts.n
+    FROM (
+        SELECT tag_id, count(*) AS n FROM core_recipe_tags GROUP BY tag_id
+    ) AS counts
+    WHERE core_tag.id = counts.tag_id;
+
+    UPDATE core_ingredient SET recipe_count = counts.n
+    FROM (
+        SELECT ingredient_id, count(*) AS n
+        FROM core_recipe_ingredients
+        GROUP BY ingredient_id
+    ) AS counts
+    WHERE core_ingredient.id = counts.ingredient_id;
+"""
+
+
+class Migration(migrations.Migration):
+
+    replaces = [
+        ("core", "0009_recipestats"),
+        ("core", "0010_recipe_count"),
+    ]
+
+    dependencies = [
+        ("core", "0008_content_addressed_storage"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RecipeStats",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                ("recipe_count", models.PositiveIntegerField(default=0)),
+                ("total_time_minutes", models.BigIntegerField(default=0)),
+                (
+                    "total_price",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="ingredient",
+            name="recipe_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="tag",
+            name="recipe_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name="ingredient",
+            index=models.Index(
+                fields=["user", "-recipe_count", "-id"],
+                name="core_ingred_user_id_2f332e_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="tag",
+            index=models.Index(
+                fields=["user", "-recipe_count", "-id"],
+                name="core_tag_user_id_1793e2_idx",
+            ),
+        ),
+        migrations.RunSQL(COMPUTE_STATS, migrations.RunSQL.noop),
+    ]
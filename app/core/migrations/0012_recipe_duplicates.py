@@ -0,0 +1,35 @@
+# Generated by Django 4.0.6 on 2026-10-19 09:31
+
+from django.conf import settings
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_recipesignature'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='duplicate_of',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='duplicates', to='core.recipe'),
+        ),
+        migrations.CreateModel(
+            name='RecipeFingerprint',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='fingerprint', serialize=False, to='core.recipe')),
+                ('fingerprint', models.CharField(max_length=40)),
+                ('minhash', models.BinaryField()),
+                ('buckets', django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), size=None)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'fingerprint'], name='core_recipe_user_id_5d458c_idx'), django.contrib.postgres.indexes.GinIndex(fields=['buckets'], name='core_recipe_buckets_64153a_gin')],
+            },
+        ),
+    ]
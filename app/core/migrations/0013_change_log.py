@@ -0,0 +1,104 @@
+# Generated by Django 4.0.6 on 2026-10-19 09:41
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+# Every existing tag, ingredient and recipe recorded as changed, tags and
+# ingredients first, inlined rather than run with core.sync, which follows
+# the current models.
+RECORD_EXISTING = """
+    WITH objects AS (
+        SELECT user_id, 'tag' AS kind, 0 AS position, id FROM core_tag
+        UNION ALL
+        SELECT user_id, 'ingredient', 1, id FROM core_ingredient
+        UNION ALL
+        SELECT user_id, 'recipe', 2, id FROM core_recipe
+    ),
+    counters AS (
+        INSERT INTO core_changesequence (user_id, value)
+        SELECT user_id, count(*) FROM objects GROUP BY user_id
+    )
+    INSERT INTO core_change (user_id, kind, object_id, sequence, deleted, changed_at)
+    SELECT user_id, kind, id, row_number() OVER (
+        PARTITION BY user_id ORDER BY position, id
+    ), false, now()
+    FROM objects
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0012_recipe_duplicates"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChangeSequence",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                ("value", models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="Change",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("recipe", "Recipe"),
+                            ("tag", "Tag"),
+                            ("ingredient", "Ingredient"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("object_id", models.BigIntegerField()),
+                ("sequence", models.BigIntegerField()),
+                ("deleted", models.BooleanField(default=False)),
+                ("changed_at", models.DateTimeField(default=django.utils.timezone.now)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["user", "sequence"],
+                        name="core_change_user_id_d0f23d_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="change",
+            constraint=models.UniqueConstraint(
+                fields=("user", "kind", "object_id"), name="unique_change_per_object"
+            ),
+        ),
+        migrations.RunSQL(RECORD_EXISTING, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,82 @@
+from django.db import migrations
+from django.db.models import Count, Min
+
+# The next sequence numbers of a user given to changed objects, like
+# core.sync.record, inlined as core.sync follows the current models.
+RECORD = """
+    WITH counter AS (
+        INSERT INTO core_changesequence (user_id, value) VALUES (%(user)s, %(count)s)
+        ON CONFLICT (user_id)
+        DO UPDATE SET value = core_changesequence.value + EXCLUDED.value
+        RETURNING value
+    )
+    INSERT INTO core_change (user_id, kind, object_id, sequence, deleted, changed_at)
+    SELECT %(user)s, %(kind)s, ids.id, counter.value - %(count)s + ids.n,
+           %(deleted)s, now()
+    FROM counter, unnest(%(ids)s::bigint[]) WITH ORDINALITY AS ids (id, n)
+    ON CONFLICT (user_id, kind, object_id) DO UPDATE
+    SET sequence = EXCLUDED.sequence,
+        deleted = EXCLUDED.deleted,
+        changed_at = EXCLUDED.changed_at
+"""
+
+
+def record(schema_editor, user_id, kind, object_ids, deleted=False):
+    ids = sorted(object_ids)
+    if ids:
+        params = {
+            "user": user_id,
+            "kind": kind,
+            "ids": ids,
+            "count": len(ids),
+            "deleted": deleted,
+        }
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(RECORD, params)
+
+
+def merge_duplicate_names(apps, schema_editor):
+    """Merge the tags and ingredients of a user sharing a name into the oldest"""
+    Recipe = apps.get_model("core", "Recipe")
+    for relation in ["tags", "ingredients"]:
+        through = getattr(Recipe, relation).through
+        model = through._meta.get_field(relation[:-1]).related_model
+        column = through._meta.get_field(relation[:-1]).column
+        groups = (
+            model.objects.values("user_id", "name")
+            .annotate(keep=Min("id"), count=Count("id"))
+            .filter(count__gt=1)
+            .order_by()
+        )
+
+        for group in groups:
+            extra = list(
+                model.objects.filter(user_id=group["user_id"], name=group["name"])
+                .exclude(id=group["keep"])
+                .values_list("id", flat=True)
+            )
+            links = through.objects.filter(**{f"{column}__in": extra})
+            recipe_ids = set(links.values_list("recipe_id", flat=True))
+            through.objects.bulk_create(
+                [through(recipe_id=pk, **{column: group["keep"]}) for pk in recipe_ids],
+                ignore_conflicts=True,
+            )
+            links.delete()
+            model.objects.filter(id__in=extra).delete()
+            model.objects.filter(id=group["keep"]).update(
+                recipe_count=through.objects.filter(**{column: group["keep"]}).count()
+            )
+
+            record(schema_editor, group["user_id"], relation[:-1], extra, deleted=True)
+            record(schema_editor, group["user_id"], "recipe", recipe_ids)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0013_change_log"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_names, migrations.RunPython.noop),
+    ]
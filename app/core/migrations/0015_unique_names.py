@@ -0,0 +1,25 @@
+# Generated by Django 4.0.6 on 2026-10-19 09:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0014_merge_duplicate_names"),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name="ingredient",
+            constraint=models.UniqueConstraint(
+                fields=("user", "name"), name="unique_ingredient_name_per_user"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="tag",
+            constraint=models.UniqueConstraint(
+                fields=("user", "name"), name="unique_tag_name_per_user"
+            ),
+        ),
+    ]
@@ -12,15 +12,26 @@ from django.contrib.auth.models import (
     BaseUserManager,
     PermissionsMixin,
 )
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
+from django.utils import timezone
+
+from core.fields import ReleasingImageField
 
 
 def recipe_image_file_path(instance, filename):
-    """Generate file path for new recipe image"""
-    ext = os.path.splitext(filename)[1]
-    filename = f"{uuid.uuid4()}{ext}"
+    """Generate file path for new recipe image, named by its content on save"""
+    ext = os.path.splitext(filename)[1].lower()
+
+    return os.path.join("uploads", "recipe", f"image{ext}")
+
+
+def recipe_image_storage():
+    """Return the content addressed storage for recipe images"""
+    from core.storage import recipe_images
 
-    return os.path.join("uploads", "recipe", filename)
+    return recipe_images
 
 
 class UserManager(BaseUserManager):
@@ -53,6 +64,8 @@ class User(AbstractBaseUser, PermissionsMixin):
     name = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    # Set when the user asked to be deleted, see `core.purge`.
+    deleted_at = models.DateTimeField(null=True, blank=True)
 
     objects = UserManager()
 
@@ -62,6 +75,13 @@ class User(AbstractBaseUser, PermissionsMixin):
 class Recipe(models.Model):
     """Recipe object."""
 
+    class ImageStatus(models.TextChoices):
+        NONE = "none"
+        PENDING = "pending"
+        PROCESSING = "processing"
+        READY = "ready"
+        FAILED = "failed"
+
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True)
@@ -70,7 +90,20 @@ class Recipe(models.Model):
     link = models.CharField(max_length=255, blank=True)
     tags = models.ManyToManyField("Tag")
     ingredients = models.ManyToManyField("Ingredient")
-    image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    image = ReleasingImageField(
+        null=True, upload_to=recipe_image_file_path, storage=recipe_image_storage
+    )
+    image_status = models.CharField(
+        max_length=20, choices=ImageStatus.choices, default=ImageStatus.NONE
+    )
+    image_variants = models.JSONField(default=dict, blank=True)
+    duplicate_of = models.ForeignKey(
+        "self",
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="duplicates",
+    )
 
     def __str__(self):
         return self.title
@@ -81,6 +114,16 @@ class Tag(models.Model):
 
     name = models.CharField(max_length=255)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    # Number of recipes using it, maintained by `core.stats`.
+    recipe_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [models.Index(fields=["user", "-recipe_count", "-id"])]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "name"], name="unique_tag_name_per_user"
+            )
+        ]
 
     def __str__(self):
         return self.name
@@ -91,6 +134,170 @@ class Ingredient(models.Model):
 
     name = models.CharField(max_length=255)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    # Number of recipes using it, maintained by `core.stats`.
+    recipe_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [models.Index(fields=["user", "-recipe_count", "-id"])]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "name"], name="unique_ingredient_name_per_user"
+            )
+        ]
 
     def __str__(self):
         return self.name
+
+
+class StoredFile(models.Model):
+    """Reference counted file in the content addressed storage."""
+
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField(default=0)
+    refcount = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["refcount", "updated_at"])]
+
+    def __str__(self):
+        return f"{self.name} ({self.refcount})"
+
+
+class ImageUpload(models.Model):
+    """Chunked upload of a recipe image."""
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    recipe = models.ForeignKey("Recipe", on_delete=models.CASCADE)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    checksum = models.CharField(max_length=64)
+    received = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.filename} ({self.received}/{self.size})"
+
+
+class Job(models.Model):
+    """Background job run by the `process_jobs` command."""
+
+    class Status(models.TextChoices):
+        PENDING = "pending"
+        RUNNING = "running"
+        DONE = "done"
+        FAILED = "failed"
+
+    kind = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(
+        max_length=20, choices=Status.choices, default=Status.PENDING
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    # Reported by the handler while it runs, see `jobs.report`.
+    progress = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "run_after"])]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+
+class RecipeStats(models.Model):
+    """Recipe statistics of a user, maintained by `core.stats`."""
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True
+    )
+    recipe_count = models.PositiveIntegerField(default=0)
+    total_time_minutes = models.BigIntegerField(default=0)
+    total_price = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user} ({self.recipe_count} recipes)"
+
+
+class RecipeSignature(models.Model):
+    """MinHash signature and LSH buckets of a recipe, see `core.similarity`."""
+
+    recipe = models.OneToOneField(
+        Recipe, on_delete=models.CASCADE, primary_key=True, related_name="signature"
+    )
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    minhash = models.BinaryField()
+    buckets = ArrayField(models.BigIntegerField())
+
+    class Meta:
+        indexes = [GinIndex(fields=["buckets"])]
+
+    def __str__(self):
+        return f"Signature of recipe #{self.recipe_id}"
+
+
+class RecipeFingerprint(models.Model):
+    """Duplicate detection fingerprint of a recipe, see `core.duplicates`."""
+
+    recipe = models.OneToOneField(
+        Recipe, on_delete=models.CASCADE, primary_key=True, related_name="fingerprint"
+    )
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    fingerprint = models.CharField(max_length=40)
+    minhash = models.BinaryField()
+    buckets = ArrayField(models.BigIntegerField())
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "fingerprint"]),
+            GinIndex(fields=["buckets"]),
+        ]
+
+    def __str__(self):
+        return f"Fingerprint of recipe #{self.recipe_id}"
+
+
+class ChangeSequence(models.Model):
+    """Last change sequence number of a user, see `core.sync`."""
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True
+    )
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user} at change {self.value}"
+
+
+class Change(models.Model):
+    """Latest change of a recipe, tag or ingredient, see `core.sync`."""
+
+    class Kind(models.TextChoices):
+        RECIPE = "recipe"
+        TAG = "tag"
+        INGREDIENT = "ingredient"
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    object_id = models.BigIntegerField()
+    sequence = models.BigIntegerField()
+    deleted = models.BooleanField(default=False)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "kind", "object_id"], name="unique_change_per_object"
+            )
+        ]
+        indexes = [models.Index(fields=["user", "sequence"])]
+
+    def __str__(self):
+        return f"{self.kind} #{self.object_id} at change {self.sequence}"
@@ -0,0 +1,115 @@
+"""
+Opt-in profiling of single requests.
+
+Staff users add an `X-Profile: 1` header or a `?profile=1` query flag to a
+request to run it under cProfile. The stats are dumped to PROFILE_ROOT and
+the response carries the URL to download them from, to open with
+`python -m pstats` or a viewer like snakeviz.
+"""
+
+import cProfile
+import os
+import re
+import threading
+import time
+import uuid
+from collections import deque
+
+from django.conf import settings
+from django.urls import reverse
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+_lock = threading.Lock()
+_started = deque()
+
+
+def requested(request):
+    """Return whether the request asks to be profiled"""
+    flag = request.headers.get("X-Profile") or request.GET.get("profile")
+    return flag in ("1", "true")
+
+
+def is_staff(request):
+    """Return whether the request is made by a staff user"""
+    user = getattr(request, "user", None)
+
+    # API views authenticate by token, after the middleware ran.
+    if user is None or not user.is_authenticated:
+        try:
+            user, _ = TokenAuthentication().authenticate(request) or (None, None)
+        except AuthenticationFailed:
+            return False
+
+    return user is not None and user.is_staff
+
+
+def acquire():
+    """Take the profiler of this process, False when over the limits"""
+    if not _lock.acquire(blocking=False):
+        return False
+
+    now = time.monotonic()
+    while _started and _started[0] <= now - 60:
+        _started.popleft()
+
+    if len(_started) >= settings.PROFILE_MAX_PER_MINUTE:
+        _lock.release()
+        return False
+
+    _started.append(now)
+    return True
+
+
+def path(profile_id):
+    """Return the path of a profile, None for malformed ids"""
+    if not re.fullmatch(r"[0-9a-f]{32}", profile_id):
+        return None
+
+    return os.path.join(settings.PROFILE_ROOT, f"{profile_id}.prof")
+
+
+def save(profiler):
+    """Dump the stats of a profiler and return their id"""
+    os.makedirs(settings.PROFILE_ROOT, exist_ok=True)
+    profile_id = uuid.uuid4().hex
+    profiler.dump_stats(path(profile_id))
+
+    # Only keep the latest profiles.
+    entries = sorted(
+        os.scandir(settings.PROFILE_ROOT), key=lambda entry: entry.stat().st_mtime
+    )
+    for entry in entries[: -settings.PROFILE_KEEP]:
+        os.remove(entry.path)
+
+    return profile_id
+
+
+class ProfilingMiddleware:
+    """Run staff requests flagged for profiling under cProfile"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not (requested(request) and is_staff(request)):
+            return self.get_response(request)
+
+        if not acquire():
+            response = self.get_response(request)
+            response["X-Profile-Skipped"] = "Profiling limit reached"
+            return response
+
+        profiler = cProfile.Profile()
+        try:
+            response = profiler.runcall(self.get_response, request)
+        finally:
+            _lock.release()
+
+        profile_id = save(profiler)
+        response["X-Profile-Id"] = profile_id
+        response["X-Profile-URL"] = request.build_absolute_uri(
+            reverse("profile", args=[profile_id])
+        )
+
+        return response
@@ -0,0 +1,79 @@
+"""
+Deferred deletion of users.
+
+Deleting a user cascades through their recipes, the join tables, tags,
+ingredients, indexes and change log, too much for one request or one
+transaction with heavy users. `delete_user` only deactivates the user,
+who can no longer authenticate, and queues a job purging their rows in
+transactions of at most PURGE_BATCH_SIZE objects, reporting progress on
+the job. The user row goes last, once nothing is left to cascade to.
+
+Purged recipes release their images and variants in the content
+addressed storage, `gc_media` then removes the unreferenced files.
+"""
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from core import images, jobs, uploads
+from core.deferred import deferred
+from core.models import Change, ImageUpload, Ingredient, Recipe, Tag, User
+
+PURGE_USER = "purge_user"
+
+
+def delete_user(user):
+    """Deactivate a user and queue purging their data, return the job"""
+    with transaction.atomic():
+        user.is_active = False
+        user.deleted_at = timezone.now()
+        user.save(update_fields=["is_active", "deleted_at"])
+        Token.objects.filter(user=user).delete()
+
+        return jobs.enqueue(PURGE_USER, user_id=user.pk)
+
+
+def purge_batch(queryset, size):
+    """Delete up to size rows of a queryset in a transaction, return the count"""
+    model = queryset.model
+
+    with transaction.atomic(), deferred():
+        ids = list(queryset.order_by("pk").values_list("pk", flat=True)[:size])
+        if ids:
+            if model is Recipe:
+                images.release(ids)
+            model.objects.filter(pk__in=ids).delete()
+
+    return len(ids)
+
+
+@jobs.register(PURGE_USER)
+def purge_user(user_id):
+    """Job handler deleting a deactivated user and their data in batches"""
+    user = User.objects.filter(pk=user_id, deleted_at__isnull=False).first()
+    if user is None:
+        return
+
+    for upload in ImageUpload.objects.filter(user=user):
+        uploads.discard(upload)
+
+    # Recipes first, so tags and ingredients have no links left.
+    for name, model in [
+        ("recipes", Recipe),
+        ("tags", Tag),
+        ("ingredients", Ingredient),
+        ("changes", Change),
+    ]:
+        queryset = model.objects.filter(user=user)
+        total = queryset.count()
+        deleted = 0
+        while deleted < total:
+            purged = purge_batch(queryset, settings.PURGE_BATCH_SIZE)
+            if not purged:
+                break
+            deleted += purged
+            jobs.report(**{name: {"deleted": deleted, "total": total}})
+
+    user.delete()
@@ -0,0 +1,234 @@
+"""
+Slow query log.
+
+Every statement run on a database connection is normalized into a
+fingerprint, literals and placeholders replaced by `?`, and aggregated per
+fingerprint: calls, rows, total and maximum time and a latency histogram
+for percentiles. SELECTs slower than QUERY_LOG_EXPLAIN_THRESHOLD get their
+`EXPLAIN` plan captured. The plan is estimated without running the
+statement again, and SELECTs locking rows are left out, so capturing it
+costs the request a planning round trip.
+
+Each process periodically writes its aggregates to a JSON file in
+QUERY_LOG_DIR, which the `slow_queries` command merges into a report.
+Logging is off when QUERY_LOG_DIR is not set.
+"""
+
+import functools
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the latency histogram buckets, in milliseconds.
+BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+NORMALIZE = [
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),
+    (re.compile(r"%s"), "?"),
+    (re.compile(r'SAVEPOINT "[^"]+"'), "SAVEPOINT ?"),
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)"), "(...)"),
+    (re.compile(r"\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+"), "(...)"),
+    (re.compile(r"\s+"), " "),
+]
+
+# Row locking clauses, statements with them are not explained.
+LOCKING = re.compile(r"\bFOR (?:UPDATE|NO KEY UPDATE|SHARE|KEY SHARE)\b", re.I)
+
+_lock = threading.Lock()
+_local = threading.local()
+
+
+@functools.lru_cache(maxsize=2048)
+def fingerprint(sql):
+    """Return the fingerprint and normalized text of a statement"""
+    normalized = sql.strip()
+    for pattern, replacement in NORMALIZE:
+        normalized = pattern.sub(replacement, normalized)
+
+    return hashlib.sha1(normalized.encode()).hexdigest()[:16], normalized
+
+
+def percentile(buckets, q):
+    """Estimate a percentile, in milliseconds, from histogram bucket counts"""
+    total = sum(buckets)
+    if not total:
+        return 0.0
+
+    rank = q * total
+    seen = 0
+    for bound, count in zip(BUCKETS + (float("inf"),), buckets):
+        seen += count
+        if seen >= rank:
+            return bound
+
+    return float("inf")
+
+
+def new_stats(sql):
+    return {
+        "sql": sql,
+        "calls": 0,
+        "rows": 0,
+        "total_ms": 0.0,
+        "max_ms": 0.0,
+        "buckets": [0] * (len(BUCKETS) + 1),
+        "plan": None,
+        "plan_ms": None,
+        "plan_at": None,
+    }
+
+
+def merge(into, stats):
+    """Add the stats of a fingerprint to another"""
+    into["calls"] += stats["calls"]
+    into["rows"] += stats["rows"]
+    into["total_ms"] += stats["total_ms"]
+    into["max_ms"] = max(into["max_ms"], stats["max_ms"])
+    into["buckets"] = [a + b for a, b in zip(into["buckets"], stats["buckets"])]
+
+    if stats["plan"] and (stats["plan_at"] or 0) > (into["plan_at"] or 0):
+        into.update(
+            plan=stats["plan"], plan_ms=stats["plan_ms"], plan_at=stats["plan_at"]
+        )
+
+
+class QueryLog:
+    """Database execute wrapper aggregating statements per fingerprint"""
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.stats = {}
+        self.explained = {}
+        self.flushed = time.monotonic()
+
+    def __call__(self, execute, sql, params, many, context):
+        if not settings.QUERY_LOG_DIR or getattr(_local, "paused", False):
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        try:
+            result = execute(sql, params, many, context)
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            rows = max(context["cursor"].rowcount, 0)
+            key, normalized = fingerprint(sql)
+            self.record(key, normalized, elapsed, rows)
+
+        if (
+            elapsed >= settings.QUERY_LOG_EXPLAIN_THRESHOLD
+            and not many
+            and normalized[:6].upper() == "SELECT"
+            and not LOCKING.search(normalized)
+        ):
+            self.explain(key, sql, params, context["connection"])
+
+        return result
+
+    def record(self, key, sql, elapsed, rows):
+        index = next(
+            (i for i, bound in enumerate(BUCKETS) if elapsed <= bound), len(BUCKETS)
+        )
+
+        with _lock:
+            # Forked workers start afresh rather than repeat the parent stats.
+            if os.getpid() != self.pid:
+                self.pid = os.getpid()
+                self.stats.clear()
+
+            stats = self.stats.get(key)
+            if stats is None:
+                stats = self.stats[key] = new_stats(sql)
+            stats["calls"] += 1
+            stats["rows"] += rows
+            stats["total_ms"] += elapsed
+            stats["max_ms"] = max(stats["max_ms"], elapsed)
+            stats["buckets"][index] += 1
+
+    def explain(self, key, sql, params, connection):
+        """Capture the plan of a slow statement, once per interval"""
+        now = time.monotonic()
+        last = self.explained.get(key)
+        if last is not None and now - last < settings.QUERY_LOG_EXPLAIN_INTERVAL:
+            return
+        self.explained[key] = now
+
+        # Run in a savepoint so a failing EXPLAIN leaves the transaction usable.
+        _local.paused = True
+        try:
+            with transaction.atomic(using=connection.alias):
+                with connection.connection.cursor() as cursor:
+                    start = time.perf_counter()
+                    cursor.execute(f"EXPLAIN {sql}", params)
+                    plan = "\n".join(row[0] for row in cursor.fetchall())
+                    elapsed = (time.perf_counter() - start) * 1000
+        except DatabaseError:
+            logger.warning("Could not explain %s", sql, exc_info=True)
+            return
+        finally:
+            _local.paused = False
+
+        with _lock:
+            self.stats[key].update(plan=plan, plan_ms=elapsed, plan_at=time.time())
+
+    def flush(self):
+        """Write the aggregates of this process to QUERY_LOG_DIR"""
+        with _lock:
+            data = json.dumps(self.stats)
+            self.flushed = time.monotonic()
+
+        os.makedirs(settings.QUERY_LOG_DIR, exist_ok=True)
+        path = os.path.join(settings.QUERY_LOG_DIR, f"{os.getpid()}.json")
+        with open(f"{path}.tmp", "w") as f:
+            f.write(data)
+        os.replace(f"{path}.tmp", path)
+
+    def flush_if_due(self, **kwargs):
+        """Flush when the interval passed, connected to request_finished"""
+        if (
+            settings.QUERY_LOG_DIR
+            and time.monotonic() - self.flushed >= settings.QUERY_LOG_FLUSH_INTERVAL
+        ):
+            self.flush()
+
+    def reset(self):
+        with _lock:
+            self.stats.clear()
+            self.explained.clear()
+
+
+query_log = QueryLog()
+
+
+def install(connection, **kwargs):
+    """Add the query log to a new connection, connected to connection_created"""
+    if query_log not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_log)
+
+
+def load(directory):
+    """Return the merged aggregates of all processes by fingerprint"""
+    merged = {}
+
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return merged
+
+    for name in names:
+        if not name.endswith(".json"):
+            continue
+        with open(os.path.join(directory, name)) as f:
+            for key, stats in json.load(f).items():
+                merge(merged.setdefault(key, new_stats(stats["sql"])), stats)
+
+    return merged
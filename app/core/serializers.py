@@ -0,0 +1,55 @@
+"""
+Serializers for the core API views.
+"""
+
+from django.conf import settings
+from rest_framework import serializers
+
+from core import batch
+
+
+class BatchOperationSerializer(serializers.Serializer):
+    """Serializer for an operation of a batch"""
+
+    method = serializers.ChoiceField(["GET", "POST", "PUT", "PATCH", "DELETE"])
+    path = serializers.CharField(
+        max_length=2000, help_text="API path with an optional query string"
+    )
+    body = serializers.JSONField(required=False, allow_null=True)
+
+    def validate_path(self, value):
+        try:
+            batch.check_path(value)
+        except batch.InvalidOperation as exc:
+            raise serializers.ValidationError(str(exc))
+
+        return value
+
+
+class BatchSerializer(serializers.Serializer):
+    """Serializer for a batch of operations"""
+
+    operations = serializers.ListField(
+        child=BatchOperationSerializer(),
+        min_length=1,
+        max_length=settings.BATCH_MAX_OPERATIONS,
+    )
+    parallel = serializers.BooleanField(
+        default=False, help_text="Run batches of only reads in parallel"
+    )
+
+
+class BatchResultSerializer(serializers.Serializer):
+    """Serializer for the result of an operation"""
+
+    status = serializers.IntegerField()
+    body = serializers.JSONField(allow_null=True)
+
+
+class BatchResponseSerializer(serializers.Serializer):
+    """Serializer for the results of a batch"""
+
+    committed = serializers.BooleanField(
+        help_text="Whether the writes of the batch were committed"
+    )
+    results = BatchResultSerializer(many=True)
@@ -0,0 +1,106 @@
+"""
+Shopping lists and recipe costing.
+
+The ingredients of a set of recipes are aggregated with one query
+grouping the recipe ingredient join table by ingredient, each row
+carrying the array of its recipes, and the counts and totals are summed
+with NumPy. A recipe listed several times, e.g. cooked twice in a meal
+plan, counts as many times. Prices are summed and scaled as integer
+cents with `app.calc`, exactly.
+"""
+
+import numpy as np
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.db.models import F, IntegerField
+from django.db.models.functions import Cast
+
+from app import calc
+from core.models import Recipe
+
+# Scale factors are exact up to this many decimal places.
+SCALE_PLACES = 4
+
+
+class UnknownRecipes(Exception):
+    """Raised with the requested recipe ids the user does not own"""
+
+    def __init__(self, ids):
+        super().__init__(f"Unknown recipes: {ids}")
+        self.ids = ids
+
+
+def load(user, ids):
+    """Return the id, price in cents and time of sorted unique recipe ids"""
+    recipes = np.array(
+        Recipe.objects.filter(user=user, id__in=ids.tolist())
+        .order_by("id")
+        .annotate(cents=Cast(F("price") * 100, IntegerField()))
+        .values_list("id", "cents", "time_minutes"),
+        dtype=np.int64,
+    ).reshape(-1, 3)
+    if len(recipes) != len(ids):
+        raise UnknownRecipes(sorted(set(ids.tolist()) - set(recipes[:, 0].tolist())))
+
+    return recipes
+
+
+def shopping_list(user, recipe_ids):
+    """Return the aggregated ingredients and totals of recipes of a user"""
+    ids, times = np.unique(np.asarray(recipe_ids, dtype=np.int64), return_counts=True)
+    recipes = load(user, ids)
+
+    through = Recipe.ingredients.through
+    rows = list(
+        through.objects.filter(recipe_id__in=ids.tolist())
+        .values("ingredient_id", "ingredient__name")
+        .annotate(recipes=ArrayAgg("recipe_id", ordering="recipe_id"))
+        .order_by("ingredient_id")
+        .values_list("ingredient_id", "ingredient__name", "recipes")
+    )
+
+    counts = np.zeros(0, dtype=np.int64)
+    if rows:
+        lengths = np.array([len(row[2]) for row in rows])
+        linked = np.concatenate([row[2] for row in rows])
+        weights = times[np.searchsorted(ids, linked)]
+        counts = np.add.reduceat(weights, np.cumsum(lengths) - lengths)
+
+    ingredients = [
+        {"id": pk, "name": name, "count": int(count), "recipes": linked_ids}
+        for (pk, name, linked_ids), count in zip(rows, counts)
+    ]
+    ingredients.sort(key=lambda item: (-item["count"], item["name"]))
+
+    return {
+        "recipe_count": int(times.sum()),
+        "total_price": calc.from_cents(calc.total(recipes[:, 1], times)),
+        "total_time_minutes": calc.total(recipes[:, 2], times),
+        "ingredients": ingredients,
+    }
+
+
+def cost(user, recipe_ids, factors):
+    """Return the prices of recipes of a user scaled by factors, with totals"""
+    requested = np.asarray(recipe_ids, dtype=np.int64)
+    ids = np.unique(requested)
+    recipes = load(user, ids)[np.searchsorted(ids, requested)]
+
+    scaled = calc.scale(
+        recipes[:, 1], calc.to_fixed(factors, SCALE_PLACES), 10**SCALE_PLACES
+    )
+
+    return {
+        "recipes": [
+            {
+                "id": pk,
+                "scale": factor,
+                "price": calc.from_cents(cents),
+                "scaled_price": calc.from_cents(scaled_cents),
+            }
+            for pk, factor, cents, scaled_cents in zip(
+                recipe_ids, factors, recipes[:, 1].tolist(), scaled.tolist()
+            )
+        ],
+        "total_price": calc.from_cents(calc.total(scaled)),
+        "total_time_minutes": calc.total(recipes[:, 2]),
+    }
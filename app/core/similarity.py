@@ -0,0 +1,244 @@
+"""
+Similar recipes through MinHash signatures and LSH banding.
+
+A recipe is the set of its normalized tag and ingredient names. Its
+MinHash signature holds, for each of PERMUTATIONS hash functions, the
+minimum hash over the set, so the share of equal positions of two
+signatures estimates the Jaccard similarity of the sets. Signatures are
+stored as little endian uint32 bytes.
+
+The signature is split into BANDS bands of ROWS positions, each hashed
+with the owner into a bucket. Recipes sharing a bucket are candidates,
+found through a GIN index on the bucket array, and only candidates are
+compared. Pairs with a similarity s share a bucket with probability
+1 - (1 - s ** ROWS) ** BANDS, about 0.5 at s = 0.5 and 0.98 at s = 0.75.
+
+Signal handlers reindex recipes whenever their tags or ingredients
+change, `rebuild` indexes everything from scratch.
+"""
+
+from functools import lru_cache
+from hashlib import blake2b
+
+import numpy as np
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from core.deferred import coalesce, deferrable
+from core.models import Ingredient, Recipe, RecipeSignature, Tag
+
+PERMUTATIONS = 64
+BANDS = 16
+ROWS = PERMUTATIONS // BANDS
+
+# Multiply-shift hashing: h(x) = (a * x + b mod 2 ** 64) >> 32 with odd a.
+_random = np.random.default_rng(20221019)
+MULTIPLIERS = _random.integers(0, 2**64, PERMUTATIONS, dtype=np.uint64) | np.uint64(1)
+INCREMENTS = _random.integers(0, 2**64, PERMUTATIONS, dtype=np.uint64)
+ROW_MULTIPLIERS = _random.integers(0, 2**64, ROWS, dtype=np.uint64) | np.uint64(1)
+BAND_OFFSETS = _random.integers(0, 2**64, BANDS, dtype=np.uint64)
+USER_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+DTYPE = np.dtype("<u4")
+TOKEN_DTYPE = np.dtype("<u8")
+
+
+def normalize(name):
+    """Fold casing and whitespace of a tag or ingredient name"""
+    return " ".join(name.casefold().split())
+
+
+@lru_cache(maxsize=65536)
+def token_hash(token):
+    """Return a 64 bit hash of a token"""
+    return int.from_bytes(blake2b(token.encode(), digest_size=8).digest(), "little")
+
+
+def token_hashes(tokens):
+    """Return the hashes of tokens as an array"""
+    return np.fromiter(map(token_hash, tokens), dtype=TOKEN_DTYPE, count=len(tokens))
+
+
+def signatures(token_sets):
+    """Return the MinHash signatures of token sets, one row per set"""
+    lengths = np.array([len(tokens) for tokens in token_sets], dtype=np.int64)
+    result = np.full((len(token_sets), PERMUTATIONS), np.iinfo(DTYPE).max, DTYPE)
+    if not lengths.sum():
+        return result
+
+    hashes = token_hashes([token for tokens in token_sets for token in tokens])
+    with np.errstate(over="ignore"):
+        values = (hashes[:, None] * MULTIPLIERS + INCREMENTS) >> np.uint64(32)
+
+    nonempty = lengths > 0
+    starts = (np.cumsum(lengths) - lengths)[nonempty]
+    result[nonempty] = np.minimum.reduceat(values.astype(DTYPE), starts, axis=0)
+
+    return result
+
+
+def buckets(matrix, user_ids):
+    """Return the LSH bucket of every band of signatures, one row per signature"""
+    bands = matrix.reshape(len(matrix), BANDS, ROWS).astype(np.uint64)
+    users = np.asarray(user_ids, dtype=np.uint64)[:, None]
+    with np.errstate(over="ignore"):
+        keys = (bands * ROW_MULTIPLIERS).sum(axis=2, dtype=np.uint64)
+        keys += users * USER_MULTIPLIER + BAND_OFFSETS
+
+    return keys.view(np.int64)
+
+
+def similarities(signature, matrix):
+    """Estimate the Jaccard similarity of a signature with signatures"""
+    return (matrix == signature).mean(axis=1)
+
+
+def load(minhashes):
+    """Return stored signatures as a matrix"""
+    data = b"".join(bytes(minhash) for minhash in minhashes)
+
+    return np.frombuffer(data, dtype=DTYPE).reshape(-1, PERMUTATIONS)
+
+
+def recipe_tokens(recipe_ids):
+    """Return the owner and token set of the recipes with tags or ingredients"""
+    owners, tokens = {}, {}
+    for prefix, field in [("t", Recipe.tags), ("i", Recipe.ingredients)]:
+        through = field.through
+        name = field.field.m2m_reverse_field_name() + "__name"
+        links = through.objects.filter(recipe_id__in=recipe_ids).values_list(
+            "recipe_id", "recipe__user_id", name
+        )
+        for recipe_id, user_id, value in links:
+            owners[recipe_id] = user_id
+            tokens.setdefault(recipe_id, set()).add(f"{prefix}:{normalize(value)}")
+
+    return owners, tokens
+
+
+def build(recipe_ids):
+    """Return the unsaved signatures of recipes with tags or ingredients"""
+    owners, tokens = recipe_tokens(recipe_ids)
+    ids = sorted(tokens)
+    if not ids:
+        return []
+
+    matrix = signatures([sorted(tokens[pk]) for pk in ids])
+    keys = buckets(matrix, [owners[pk] for pk in ids])
+
+    return [
+        RecipeSignature(
+            recipe_id=pk,
+            user_id=owners[pk],
+            minhash=row.tobytes(),
+            buckets=key.tolist(),
+        )
+        for pk, row, key in zip(ids, matrix, keys)
+    ]
+
+
+def index(recipe_ids):
+    """Recompute the signatures of recipes"""
+    recipe_ids = list(recipe_ids)
+    rows = build(recipe_ids)
+
+    with transaction.atomic():
+        RecipeSignature.objects.filter(recipe_id__in=recipe_ids).delete()
+        RecipeSignature.objects.bulk_create(rows)
+
+    return len(rows)
+
+
+def rebuild(user_ids=None, batch_size=2000, missing=False):
+    """
+    Recompute the signatures of the recipes of users, of all when None,
+    only of the recipes without one when missing.
+    """
+    recipes = Recipe.objects.order_by("id")
+    if user_ids is not None:
+        recipes = recipes.filter(user_id__in=user_ids)
+    if missing:
+        recipes = recipes.filter(signature__isnull=True)
+
+    count = 0
+    last_id = 0
+    while True:
+        ids = list(
+            recipes.filter(id__gt=last_id).values_list("id", flat=True)[:batch_size]
+        )
+        if not ids:
+            return count
+
+        last_id = ids[-1]
+        count += index(ids)
+
+
+def similar(recipe, limit=10):
+    """Return up to limit (recipe id, similarity) of the closest recipes"""
+    own = RecipeSignature.objects.filter(recipe_id=recipe.pk).first()
+    if own is None:
+        return []
+
+    candidates = list(
+        RecipeSignature.objects.filter(
+            user_id=own.user_id, buckets__overlap=own.buckets
+        )
+        .exclude(recipe_id=recipe.pk)
+        .values_list("recipe_id", "minhash")
+    )
+    if not candidates:
+        return []
+
+    ids, minhashes = zip(*candidates)
+    scores = similarities(load([own.minhash])[0], load(minhashes))
+    order = np.lexsort((np.asarray(ids), -scores))[:limit]
+
+    return [(ids[i], round(float(scores[i]), 4)) for i in order]
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+@deferrable
+def relations_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            coalesce(index, ids=[instance.pk])
+        return
+
+    if action == "pre_clear":
+        instance._similarity_recipes = list(
+            instance.recipe_set.values_list("id", flat=True)
+        )
+    elif action == "post_clear":
+        coalesce(index, ids=instance.__dict__.pop("_similarity_recipes", []))
+    elif action in ("post_add", "post_remove") and pk_set:
+        coalesce(index, ids=pk_set)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@deferrable
+def attribute_saved(sender, instance, created, raw=False, **kwargs):
+    # Renaming changes the tokens of every recipe using it.
+    if not created and not raw:
+        coalesce(index, ids=instance.recipe_set.values_list("id", flat=True))
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+@deferrable
+def remember_recipes(sender, instance, **kwargs):
+    # The join rows are deleted along the tag without m2m_changed.
+    instance._similarity_recipes = list(
+        instance.recipe_set.values_list("id", flat=True)
+    )
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+@deferrable
+def attribute_deleted(sender, instance, **kwargs):
+    recipe_ids = instance.__dict__.pop("_similarity_recipes", None)
+    if recipe_ids:
+        coalesce(index, ids=recipe_ids)
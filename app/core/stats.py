@@ -0,0 +1,237 @@
+"""
+Incrementally maintained recipe statistics.
+
+Every user has a `RecipeStats` row holding the number of recipes and their
+total cooking time and price, and every tag and ingredient its number of
+recipes in `recipe_count`. Signal handlers apply the change of every recipe
+save, delete and tag or ingredient assignment, so reading the statistics
+never aggregates the recipe or join tables. `rebuild` and `reconcile`
+recompute them from scratch, after bulk writes bypassing the signals.
+"""
+
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Greatest
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from core.deferred import deferrable
+from core.models import Ingredient, Recipe, RecipeStats, Tag
+
+TOP = 10
+
+COLUMNS = {Recipe.tags.through: "tag_id", Recipe.ingredients.through: "ingredient_id"}
+
+
+@contextmanager
+def locked(user_id, create=True):
+    """
+    Lock the statistics of a user and save them when the block exits.
+
+    Without create a missing row yields None, so deletes cascading from a
+    user never recreate its statistics.
+    """
+    with transaction.atomic():
+        queryset = RecipeStats.objects.select_for_update()
+        if create:
+            stats, _ = queryset.get_or_create(user_id=user_id)
+        else:
+            stats = queryset.filter(user_id=user_id).first()
+
+        yield stats
+
+        if stats is not None:
+            stats.save()
+
+
+def count(counts, ids, delta):
+    """Add delta to the counts of ids, dropping counts that reach zero"""
+    for pk in ids:
+        key = str(pk)
+        value = counts.get(key, 0) + delta
+        if value > 0:
+            counts[key] = value
+        else:
+            counts.pop(key, None)
+
+
+def top(user, model):
+    """Return the tags or ingredients of a user used by the most recipes"""
+    return list(
+        model.objects.filter(user=user, recipe_count__gt=0)
+        .order_by("-recipe_count", "-id")
+        .values("id", "name", "recipe_count")[:TOP]
+    )
+
+
+def add_recipe_count(model, ids, delta):
+    """Add delta to the recipe count of tags or ingredients"""
+    model.objects.filter(id__in=ids).update(
+        recipe_count=Greatest(F("recipe_count") + delta, 0)
+    )
+
+
+@receiver(pre_save, sender=Recipe)
+@deferrable
+def remember_totals(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or instance._state.adding:
+        return
+    if update_fields is not None and not {"time_minutes", "price"} & update_fields:
+        return
+
+    instance._stats_previous = (
+        Recipe.objects.filter(pk=instance.pk)
+        .values_list("time_minutes", "price")
+        .first()
+    )
+
+
+@receiver(post_save, sender=Recipe)
+@deferrable
+def recipe_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+
+    previous = (0, Decimal(0))
+    if not created:
+        previous = instance.__dict__.pop("_stats_previous", None)
+        if previous is None:
+            return
+
+    time_minutes, price = previous
+    with locked(instance.user_id) as stats:
+        stats.recipe_count += created
+        stats.total_time_minutes += instance.time_minutes - time_minutes
+        stats.total_price += Decimal(instance.price) - price
+
+
+@receiver(pre_delete, sender=Recipe)
+@deferrable
+def remember_relations(sender, instance, **kwargs):
+    # The join rows are deleted along the recipe without m2m_changed.
+    instance._stats_relations = {
+        Tag: list(instance.tags.values_list("id", flat=True)),
+        Ingredient: list(instance.ingredients.values_list("id", flat=True)),
+    }
+
+
+@receiver(post_delete, sender=Recipe)
+@deferrable
+def recipe_deleted(sender, instance, **kwargs):
+    for model, ids in instance.__dict__.pop("_stats_relations", {}).items():
+        if ids:
+            add_recipe_count(model, ids, -1)
+
+    with locked(instance.user_id, create=False) as stats:
+        if stats is None:
+            return
+
+        stats.recipe_count = max(stats.recipe_count - 1, 0)
+        stats.total_time_minutes -= instance.time_minutes
+        stats.total_price -= Decimal(instance.price)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+@deferrable
+def relations_changed(sender, instance, action, reverse, model, pk_set, **kwargs):
+    column = COLUMNS[sender]
+    if action == "pre_clear":
+        # The cleared rows are only known before they are deleted.
+        if reverse:
+            links = sender.objects.filter(**{column: instance.pk})
+            instance._stats_cleared = list(links.values_list("recipe_id", flat=True))
+        else:
+            links = sender.objects.filter(recipe_id=instance.pk)
+            instance._stats_cleared = list(links.values_list(column, flat=True))
+        return
+
+    if action in ("post_add", "post_remove"):
+        ids = pk_set
+    elif action == "post_clear":
+        ids = instance.__dict__.pop("_stats_cleared", [])
+    else:
+        return
+
+    if not ids:
+        return
+
+    delta = 1 if action == "post_add" else -1
+    if reverse:
+        # A tag or ingredient assigned to recipes, ids are the recipes.
+        add_recipe_count(type(instance), [instance.pk], delta * len(ids))
+    else:
+        add_recipe_count(model, ids, delta)
+
+
+def rebuild(user_ids=None):
+    """Recompute the statistics of the given users, of all when None"""
+    recipes = Recipe.objects.all()
+    if user_ids is not None:
+        recipes = recipes.filter(user_id__in=user_ids)
+
+    totals = (
+        recipes.order_by()
+        .values("user_id")
+        .annotate(
+            recipe_count=Count("id"),
+            total_time_minutes=Sum("time_minutes"),
+            total_price=Sum("price"),
+        )
+    )
+    rows = {total["user_id"]: RecipeStats(**total) for total in totals}
+
+    with transaction.atomic():
+        stale = RecipeStats.objects.all()
+        if user_ids is not None:
+            stale = stale.filter(user_id__in=user_ids)
+        stale.delete()
+        RecipeStats.objects.bulk_create(rows.values(), batch_size=1000)
+
+    return len(rows)
+
+
+def reconcile(user_ids=None):
+    """
+    Reset the recipe counts of tags and ingredients to their join rows.
+
+    Only rows whose count drifted are written. Return the number of fixed
+    tags and of fixed ingredients.
+    """
+    fixed = []
+
+    for relation in ["tags", "ingredients"]:
+        through = getattr(Recipe, relation).through
+        model = through._meta.get_field(relation[:-1]).related_model
+        column = through._meta.get_field(relation[:-1]).column
+        actual = Coalesce(
+            Subquery(
+                through.objects.filter(**{column: OuterRef("pk")})
+                .order_by()
+                .values(column)
+                .annotate(n=Count("id"))
+                .values("n")
+            ),
+            0,
+        )
+
+        objects = model.objects.all()
+        if user_ids is not None:
+            objects = objects.filter(user_id__in=user_ids)
+        drifted = objects.annotate(actual=actual).exclude(recipe_count=F("actual"))
+        fixed.append(
+            model.objects.filter(id__in=drifted.values("id")).update(
+                recipe_count=actual
+            )
+        )
+
+    return tuple(fixed)
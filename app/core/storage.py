@@ -0,0 +1,124 @@
+"""
+Content addressed storage for recipe images.
+
+Files are named after the SHA-256 of their bytes, so identical uploads are
+stored once. Every save takes a reference on the file and every delete
+releases one; files nobody references any more are removed by the
+`gc_media` command after a grace period.
+"""
+
+import hashlib
+import os
+import tempfile
+from collections import Counter
+
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+COPY_BUFFER_SIZE = 64 * 1024
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """File system storage deduplicating files by content"""
+
+    def get_available_name(self, name, max_length=None):
+        # Names are derived from the content in _save, never suffixed.
+        return name
+
+    def content_name(self, name, digest):
+        """Return the name for content with the given digest"""
+        directory = os.path.dirname(name)
+        ext = os.path.splitext(name)[1].lower()
+
+        return os.path.join(directory, digest[:2], f"{digest}{ext}")
+
+    def _save(self, name, content):
+        directory = os.path.dirname(self.path(name))
+        os.makedirs(directory, exist_ok=True)
+
+        # Files already on disk are moved into place, others are copied.
+        moving = hasattr(content, "temporary_file_path")
+        if moving:
+            temp_path = content.temporary_file_path()
+            digest = file_digest(temp_path)
+        else:
+            temp_path, digest = _write_temp(directory, content)
+
+        name = self.content_name(name, digest)
+        path = self.path(name)
+
+        with transaction.atomic():
+            self.acquire(name, content.size)
+
+            if os.path.exists(path):
+                if not moving:
+                    os.remove(temp_path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(temp_path, path)
+                os.chmod(path, self.file_permissions_mode or 0o644)
+
+        return name
+
+    def acquire(self, name, size=0):
+        """Take a reference on a stored file"""
+        StoredFile = apps.get_model("core", "StoredFile")
+
+        stored, created = StoredFile.objects.select_for_update().get_or_create(
+            name=name, defaults={"size": size, "refcount": 1}
+        )
+
+        if not created:
+            stored.refcount = F("refcount") + 1
+            stored.save(update_fields=["refcount", "updated_at"])
+
+    def delete(self, name):
+        """Release a reference, the file is collected once unreferenced"""
+        if name:
+            StoredFile = apps.get_model("core", "StoredFile")
+            StoredFile.objects.filter(name=name, refcount__gt=0).update(
+                refcount=F("refcount") - 1, updated_at=timezone.now()
+            )
+
+    def release(self, names):
+        """Release one reference per name, with one query per repeat count"""
+        StoredFile = apps.get_model("core", "StoredFile")
+        by_count = {}
+        for name, count in Counter(name for name in names if name).items():
+            by_count.setdefault(count, []).append(name)
+
+        for count, batch in by_count.items():
+            StoredFile.objects.filter(name__in=batch, refcount__gt=0).update(
+                refcount=Greatest(F("refcount") - count, 0), updated_at=timezone.now()
+            )
+
+
+def file_digest(path):
+    """Return the SHA-256 hex digest of a file"""
+    digest = hashlib.sha256()
+
+    with open(path, "rb") as f:
+        for data in iter(lambda: f.read(COPY_BUFFER_SIZE), b""):
+            digest.update(data)
+
+    return digest.hexdigest()
+
+
+def _write_temp(directory, content):
+    """Stream content into a temporary file next to its destination"""
+    digest = hashlib.sha256()
+
+    with tempfile.NamedTemporaryFile(dir=directory, delete=False) as temp:
+        content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+            temp.write(chunk)
+
+    return temp.name, digest.hexdigest()
+
+
+recipe_images = ContentAddressedStorage()
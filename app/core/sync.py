@@ -0,0 +1,205 @@
+"""
+Change log for incremental sync.
+
+Every change to a recipe, tag or ingredient takes the next number of a
+per-user sequence, kept in ChangeSequence, and stores it on the Change
+row of the object, one row per object, so a client passing the last
+number it saw reads only what changed since through the (user, sequence)
+index. Deleted objects keep their row as a tombstone.
+
+The sequence row is incremented with an upsert that locks it until the
+transaction commits, so the changes of a user become visible in sequence
+order and a cursor never skips a change committed later.
+
+Signal handlers record the changes. Renaming or deleting a tag or
+ingredient is also recorded as a change of the recipes using it. Rows written without
+signals, e.g. by COPY, are picked up by `backfill`.
+"""
+
+from django.db import connection
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from core.deferred import coalesce, deferrable
+from core.models import Change, ChangeSequence, Ingredient, Recipe, Tag, User
+
+KINDS = {
+    Recipe: Change.Kind.RECIPE,
+    Tag: Change.Kind.TAG,
+    Ingredient: Change.Kind.INGREDIENT,
+}
+
+RECORD = """
+    WITH counter AS (
+        INSERT INTO {sequences} (user_id, value) VALUES (%(user)s, %(count)s)
+        ON CONFLICT (user_id)
+        DO UPDATE SET value = {sequences}.value + EXCLUDED.value
+        RETURNING value
+    )
+    INSERT INTO {changes} (user_id, kind, object_id, sequence, deleted, changed_at)
+    SELECT %(user)s, %(kind)s, ids.id, counter.value - %(count)s + ids.n,
+           %(deleted)s, now()
+    FROM counter, unnest(%(ids)s::bigint[]) WITH ORDINALITY AS ids (id, n)
+    ON CONFLICT (user_id, kind, object_id) DO UPDATE
+    SET sequence = EXCLUDED.sequence,
+        deleted = EXCLUDED.deleted,
+        changed_at = EXCLUDED.changed_at
+"""
+
+# Tags and ingredients come first, before the recipes linking them.
+BACKFILL = """
+    WITH objects AS (
+        SELECT user_id, 'tag' AS kind, 0 AS position, id FROM {tags}
+        UNION ALL
+        SELECT user_id, 'ingredient', 1, id FROM {ingredients}
+        UNION ALL
+        SELECT user_id, 'recipe', 2, id FROM {recipes}
+    ),
+    missing AS (
+        SELECT user_id, kind, id, row_number() OVER (
+            PARTITION BY user_id ORDER BY position, id
+        ) AS n
+        FROM objects
+        WHERE (%(users)s::bigint[] IS NULL OR user_id = ANY(%(users)s))
+        AND NOT EXISTS (
+            SELECT 1 FROM {changes} change
+            WHERE change.user_id = objects.user_id
+            AND change.kind = objects.kind
+            AND change.object_id = objects.id
+        )
+    ),
+    counts AS (
+        SELECT user_id, count(*) AS count FROM missing GROUP BY user_id
+    ),
+    counters AS (
+        INSERT INTO {sequences} (user_id, value) SELECT user_id, count FROM counts
+        ON CONFLICT (user_id)
+        DO UPDATE SET value = {sequences}.value + EXCLUDED.value
+        RETURNING user_id, value
+    )
+    INSERT INTO {changes} (user_id, kind, object_id, sequence, deleted, changed_at)
+    SELECT missing.user_id, missing.kind, missing.id,
+           counters.value - counts.count + missing.n, false, now()
+    FROM missing
+    JOIN counts ON counts.user_id = missing.user_id
+    JOIN counters ON counters.user_id = missing.user_id
+"""
+
+
+def tables(**models):
+    """Return the quoted tables of models by placeholder name"""
+    return {
+        key: connection.ops.quote_name(model._meta.db_table)
+        for key, model in models.items()
+    }
+
+
+def record(user_id, kind, object_ids, deleted=False):
+    """Give the next sequence numbers of a user to changed objects"""
+    ids = sorted(set(object_ids))
+    if not ids:
+        return
+
+    sql = RECORD.format(**tables(sequences=ChangeSequence, changes=Change))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            sql,
+            {
+                "user": user_id,
+                "kind": kind,
+                "ids": ids,
+                "count": len(ids),
+                "deleted": deleted,
+            },
+        )
+
+
+def backfill(user_ids=None):
+    """Record the objects without a change, return how many were recorded"""
+    sql = BACKFILL.format(
+        **tables(
+            tags=Tag,
+            ingredients=Ingredient,
+            recipes=Recipe,
+            sequences=ChangeSequence,
+            changes=Change,
+        )
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {"users": None if user_ids is None else list(user_ids)})
+
+        return cursor.rowcount
+
+
+def current(user):
+    """Return the last sequence number of a user"""
+    return (
+        ChangeSequence.objects.filter(user=user).values_list("value", flat=True).first()
+        or 0
+    )
+
+
+def changes(user, since, limit):
+    """Return up to limit changes of a user after a sequence number"""
+    return list(
+        Change.objects.filter(user=user, sequence__gt=since)
+        .order_by("sequence")
+        .values_list("kind", "object_id", "deleted", "sequence")[:limit]
+    )
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@deferrable
+def object_saved(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+
+    coalesce(record, instance.user_id, KINDS[sender], ids=[instance.pk])
+    if sender is not Recipe and not created:
+        recipe_ids = instance.recipe_set.values_list("id", flat=True)
+        coalesce(record, instance.user_id, Change.Kind.RECIPE, ids=recipe_ids)
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+@deferrable
+def remember_recipes(sender, instance, **kwargs):
+    instance._sync_recipes = list(instance.recipe_set.values_list("id", flat=True))
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+@deferrable
+def object_deleted(sender, instance, **kwargs):
+    recipe_ids = instance.__dict__.pop("_sync_recipes", [])
+    coalesce(record, instance.user_id, KINDS[sender], ids=[instance.pk], deleted=True)
+    coalesce(record, instance.user_id, Change.Kind.RECIPE, ids=recipe_ids)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+@deferrable
+def links_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            coalesce(record, instance.user_id, Change.Kind.RECIPE, ids=[instance.pk])
+        return
+
+    if action == "pre_clear":
+        instance._sync_recipes = list(instance.recipe_set.values_list("id", flat=True))
+    elif action == "post_clear":
+        recipe_ids = instance.__dict__.pop("_sync_recipes", [])
+        coalesce(record, instance.user_id, Change.Kind.RECIPE, ids=recipe_ids)
+    elif action in ("post_add", "post_remove") and pk_set:
+        coalesce(record, instance.user_id, Change.Kind.RECIPE, ids=pk_set)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    # Deletes cascading from the user record changes after its own were
+    # removed, drop them before the foreign keys are checked on commit.
+    Change.objects.filter(user_id=instance.pk).delete()
+    ChangeSequence.objects.filter(user_id=instance.pk).delete()
@@ -0,0 +1,225 @@
+"""
+Tests for the batch API.
+"""
+
+import time
+from decimal import Decimal
+from unittest.mock import patch
+
+from core import models
+from django.contrib.auth import get_user_model
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+BATCH_URL = reverse("batch")
+
+
+def create_user(email="user@example.com", password="testpass123"):
+    """Create and return user"""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def create_recipe(user, **params):
+    """Create and return a sample recipe."""
+    defaults = {"title": "Sample recipe", "time_minutes": 10, "price": Decimal("5.00")}
+    defaults.update(params)
+
+    return models.Recipe.objects.create(user=user, **defaults)
+
+
+def recipe_payload(title):
+    return {"title": title, "time_minutes": 5, "price": "2.50"}
+
+
+class PublicBatchApiTests(TestCase):
+    """Test unauthenticated API requests."""
+
+    def test_auth_required(self):
+        operations = [{"method": "GET", "path": "/api/recipe/tags/"}]
+
+        res = APIClient().post(BATCH_URL, {"operations": operations}, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateBatchApiTests(TestCase):
+    """Test authenticated API requests."""
+
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=self.user).key}"
+        )
+        self.recipe = create_recipe(self.user, title="Soup")
+
+    def post(self, operations, **params):
+        return self.client.post(
+            BATCH_URL, {"operations": operations, **params}, format="json"
+        )
+
+    def test_reads(self):
+        """Test reads return the status and body of each operation in order"""
+        res = self.post(
+            [
+                {"method": "GET", "path": "/api/recipe/recipes/"},
+                {"method": "GET", "path": f"/api/recipe/recipes/{self.recipe.id}/"},
+                {"method": "GET", "path": "/api/recipe/tags/?assigned_only=1"},
+                {"method": "GET", "path": "/api/recipe/recipes/999999/"},
+                {"method": "GET", "path": "/api/nowhere/"},
+            ]
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        results = res.data["results"]
+        self.assertEqual([r["status"] for r in results], [200, 200, 200, 404, 404])
+        self.assertEqual(results[0]["body"][0]["title"], "Soup")
+        self.assertEqual(results[1]["body"]["id"], self.recipe.id)
+        self.assertEqual(results[2]["body"], [])
+
+    def test_writes_committed(self):
+        res = self.post(
+            [
+                {
+                    "method": "POST",
+                    "path": "/api/recipe/recipes/",
+                    "body": recipe_payload("Stew"),
+                },
+                {
+                    "method": "PATCH",
+                    "path": f"/api/recipe/recipes/{self.recipe.id}/",
+                    "body": {"title": "Tomato soup"},
+                },
+            ]
+        )
+
+        self.assertTrue(res.data["committed"])
+        self.assertEqual([r["status"] for r in res.data["results"]], [201, 200])
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.title, "Tomato soup")
+        self.assertTrue(models.Recipe.objects.filter(title="Stew").exists())
+
+    def test_failed_write_rolls_back(self):
+        """Test a failing operation rolls back the batch and skips the rest"""
+        res = self.post(
+            [
+                {
+                    "method": "POST",
+                    "path": "/api/recipe/recipes/",
+                    "body": recipe_payload("Stew"),
+                },
+                {
+                    "method": "POST",
+                    "path": "/api/recipe/recipes/",
+                    "body": {"title": "No price"},
+                },
+                {"method": "DELETE", "path": f"/api/recipe/recipes/{self.recipe.id}/"},
+            ]
+        )
+
+        self.assertFalse(res.data["committed"])
+        self.assertEqual([r["status"] for r in res.data["results"]], [201, 400, 424])
+        self.assertEqual(
+            list(models.Recipe.objects.values_list("title", flat=True)), ["Soup"]
+        )
+
+    def test_other_users_objects(self):
+        other = create_recipe(create_user(email="other@example.com"))
+
+        res = self.post(
+            [{"method": "DELETE", "path": f"/api/recipe/recipes/{other.id}/"}]
+        )
+
+        self.assertEqual(res.data["results"][0]["status"], 404)
+        self.assertTrue(models.Recipe.objects.filter(id=other.id).exists())
+
+    def test_invalid_operations(self):
+        for path in ("/api/batch/", "https://example.com/api/recipe/", "/admin/"):
+            res = self.post([{"method": "GET", "path": path}])
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(BATCH_MAX_BODY_SIZE=100)
+    def test_body_size_limit(self):
+        operations = [{"method": "GET", "path": "/api/recipe/tags/"}] * 5
+
+        res = self.post(operations)
+
+        self.assertEqual(res.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+    def test_operation_limit(self):
+        operations = [{"method": "GET", "path": "/api/recipe/tags/"}] * 26
+
+        res = self.post(operations)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(BATCH_TIMEOUT_MS=0)
+    def test_timeout(self):
+        res = self.post(
+            [
+                {
+                    "method": "POST",
+                    "path": "/api/recipe/recipes/",
+                    "body": recipe_payload("Stew"),
+                },
+            ]
+        )
+
+        self.assertEqual(res.data["results"][0]["status"], 504)
+        self.assertFalse(res.data["committed"])
+        self.assertFalse(models.Recipe.objects.filter(title="Stew").exists())
+
+    def test_authenticates_once(self):
+        """Test the token is checked by the batch, not every operation"""
+        operations = [{"method": "GET", "path": "/api/recipe/tags/"}]
+
+        with self.assertNumQueries(2):
+            self.post(operations)
+        with self.assertNumQueries(4):
+            self.post(operations * 3)
+
+
+class ParallelBatchApiTests(TransactionTestCase):
+    """Test batches of reads run in parallel threads"""
+
+    def test_parallel_reads(self):
+        user = create_user()
+        client = APIClient()
+        client.force_authenticate(user)
+        recipes = [create_recipe(user, title=f"Recipe {i}") for i in range(6)]
+        operations = [
+            {"method": "GET", "path": f"/api/recipe/recipes/{recipe.id}/"}
+            for recipe in recipes
+        ]
+
+        res = client.post(
+            BATCH_URL, {"operations": operations, "parallel": True}, format="json"
+        )
+
+        self.assertEqual(
+            [r["body"]["title"] for r in res.data["results"]],
+            [recipe.title for recipe in recipes],
+        )
+
+    @override_settings(BATCH_TIMEOUT_MS=50, BATCH_MAX_WORKERS=1)
+    def test_parallel_timeout_waits_for_running(self):
+        """Test operations running at the deadline finish, later ones do not run"""
+        client = APIClient()
+        client.force_authenticate(create_user())
+        operations = [{"method": "GET", "path": "/api/recipe/tags/"}] * 2
+
+        def slow_dispatch(request, operation):
+            time.sleep(0.2)
+            return {"status": 200, "body": []}
+
+        with patch("core.batch.dispatch", side_effect=slow_dispatch) as dispatch:
+            res = client.post(
+                BATCH_URL, {"operations": operations, "parallel": True}, format="json"
+            )
+
+        self.assertEqual(dispatch.call_count, 1)
+        self.assertEqual([r["status"] for r in res.data["results"]], [200, 504])
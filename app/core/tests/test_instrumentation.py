@@ -0,0 +1,71 @@
+"""
+Tests for the request instrumentation middleware.
+"""
+
+import json
+from decimal import Decimal
+
+from core import models
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+RECIPES_URL = reverse("recipe:recipe-list")
+
+
+class RequestMetricsTests(TestCase):
+    """Test per-request metrics"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("user@example.com", "pass123")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        models.Recipe.objects.create(
+            user=self.user, title="Soup", time_minutes=5, price=Decimal("1.00")
+        )
+
+    def get_logged(self, level="INFO"):
+        """Request the recipe list and return the response and log fields"""
+        with self.assertLogs("core.requests", level) as logs:
+            res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(len(logs.records), 1)
+        return res, logs.records[0]
+
+    def test_server_timing_header(self):
+        """Test the timings are reported in a Server-Timing header"""
+        res, record = self.get_logged()
+        fields = record.request_metrics
+
+        entries = [entry.split(";")[0] for entry in res["Server-Timing"].split(", ")]
+        self.assertEqual(entries, ["db", "serializer", "render", "total"])
+        self.assertIn(f'desc="{fields["queries"]} queries"', res["Server-Timing"])
+        self.assertGreater(fields["queries"], 0)
+
+    def test_structured_log_line(self):
+        """Test every request is logged as JSON with its view name"""
+        res, record = self.get_logged()
+        fields = json.loads(record.getMessage())
+
+        self.assertEqual(fields["view"], "recipe:recipe-list")
+        self.assertEqual(fields["status"], 200)
+        self.assertEqual(fields["over_budget"], [])
+        self.assertEqual(record.levelname, "INFO")
+        for key in ["db_ms", "serializer_ms", "render_ms", "total_ms"]:
+            self.assertIn(key, fields)
+
+    @override_settings(REQUEST_QUERY_BUDGET=0, REQUEST_LATENCY_BUDGET=0)
+    def test_over_budget_warns(self):
+        """Test requests over the budgets are logged as warnings"""
+        res, record = self.get_logged("WARNING")
+
+        self.assertEqual(record.levelname, "WARNING")
+        self.assertEqual(record.request_metrics["over_budget"], ["queries", "latency"])
+
+    @override_settings(REQUEST_SERVER_TIMING=False)
+    def test_server_timing_disabled(self):
+        """Test the header can be turned off"""
+        res, record = self.get_logged()
+
+        self.assertNotIn("Server-Timing", res)
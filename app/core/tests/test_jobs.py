@@ -0,0 +1,146 @@
+"""
+Tests for background jobs and image processing.
+"""
+
+import os
+import tempfile
+from decimal import Decimal
+from unittest.mock import patch
+
+from core import images, jobs, models
+from django.contrib.auth import get_user_model
+from django.core.files import File
+from django.core.management import call_command
+from django.test import TestCase
+from PIL import Image
+
+
+def create_recipe(user):
+    """Create and return a sample recipe."""
+    return models.Recipe.objects.create(
+        user=user,
+        title="Sample recipe",
+        time_minutes=5,
+        price=Decimal("5.50"),
+    )
+
+
+class JobTests(TestCase):
+    """Test the job queue."""
+
+    def setUp(self):
+        self.calls = []
+        jobs.register("test_job")(self.handler)
+
+    def tearDown(self):
+        jobs.HANDLERS.pop("test_job")
+
+    def handler(self, **payload):
+        self.calls.append(payload)
+        if payload.get("fail"):
+            raise RuntimeError("boom")
+
+    def test_run_next_runs_handler(self):
+        """Test running a queued job."""
+        job = jobs.enqueue("test_job", value=1)
+
+        jobs.run_next()
+
+        job.refresh_from_db()
+        self.assertEqual(self.calls, [{"value": 1}])
+        self.assertEqual(job.status, models.Job.Status.DONE)
+        self.assertEqual(job.attempts, 1)
+
+    def test_run_next_empty_queue(self):
+        """Test that an empty queue returns None."""
+        self.assertIsNone(jobs.run_next())
+
+    def test_failed_job_is_retried(self):
+        """Test a failing job is requeued with a delay."""
+        job = jobs.enqueue("test_job", fail=True)
+
+        with self.assertLogs("core.jobs", level="ERROR"):
+            jobs.run_next()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, models.Job.Status.PENDING)
+        self.assertIn("boom", job.last_error)
+        self.assertIsNone(jobs.run_next())
+
+    def test_job_fails_after_max_attempts(self):
+        """Test a job is marked failed once out of attempts."""
+        job = jobs.enqueue("test_job", fail=True)
+        job.attempts = 2
+        job.save()
+
+        with self.settings(JOB_MAX_ATTEMPTS=3), self.assertLogs("core.jobs"):
+            jobs.run_next()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, models.Job.Status.FAILED)
+
+    def test_progress_reported(self):
+        """Test handlers record their progress on the running job."""
+        jobs.register("report_job")(
+            lambda: [jobs.report(done=1), jobs.report(done=2, total=2)]
+        )
+        self.addCleanup(jobs.HANDLERS.pop, "report_job")
+        job = jobs.enqueue("report_job")
+
+        jobs.run_next()
+        jobs.report(done=3)
+
+        job.refresh_from_db()
+        self.assertEqual(job.progress, {"done": 2, "total": 2})
+
+    @patch("core.management.commands.process_jobs.close_old_connections")
+    def test_process_jobs_command(self, patched_close):
+        """Test the worker command drains the queue."""
+        jobs.enqueue("test_job", value=1)
+        jobs.enqueue("test_job", value=2)
+
+        call_command("process_jobs", "--once", stdout=open(os.devnull, "w"))
+
+        self.assertEqual(self.calls, [{"value": 1}, {"value": 2}])
+
+
+class ProcessRecipeImageTests(TestCase):
+    """Test rendering recipe image variants."""
+
+    def setUp(self):
+        user = get_user_model().objects.create_user("user@example.com", "pass123")
+        self.recipe = create_recipe(user)
+
+        with tempfile.NamedTemporaryFile(suffix=".jpg") as image_file:
+            Image.new("RGB", (1000, 800)).save(image_file, format="JPEG")
+            image_file.seek(0)
+            self.recipe.image.save("sample.jpg", File(image_file))
+
+    def tearDown(self):
+        self.recipe.refresh_from_db()
+        images.delete_files(self.recipe.image_variants.values())
+        self.recipe.image.delete()
+
+    def test_schedule_and_process(self):
+        """Test variants are rendered and swapped in."""
+        images.schedule_processing(self.recipe)
+        self.assertEqual(self.recipe.image_status, models.Recipe.ImageStatus.PENDING)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            jobs.run_next()
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, models.Recipe.ImageStatus.READY)
+        self.assertEqual(set(self.recipe.image_variants), {"thumbnail", "medium"})
+        with Image.open(
+            self.recipe.image.storage.path(self.recipe.image_variants["thumbnail"])
+        ) as thumbnail:
+            self.assertLessEqual(max(thumbnail.size), 150)
+
+    def test_replaced_image_is_skipped(self):
+        """Test a job for a replaced image does nothing."""
+        images.process_recipe_image(self.recipe.id, "uploads/recipe/old.jpg")
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, models.Recipe.ImageStatus.NONE)
+        self.assertEqual(self.recipe.image_variants, {})
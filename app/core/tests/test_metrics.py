@@ -0,0 +1,128 @@
+"""
+Tests for the metrics endpoint.
+"""
+
+import tempfile
+from unittest.mock import Mock, patch
+
+from core import metrics
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+METRICS_URL = reverse("metrics")
+
+WORKERS = [
+    {"id": 1, "requests": 10, "status": "busy", "avg_rt": 20000, "rss": 1024},
+    {"id": 2, "requests": 4, "status": "idle", "avg_rt": 0, "rss": 2048},
+]
+
+
+def sample(text, name, **labels):
+    """Return the value of a sample in the exposition text, None if absent"""
+    labels = ",".join(f'{key}="{value}"' for key, value in sorted(labels.items()))
+    prefix = f"{name}{{{labels}}} " if labels else f"{name} "
+
+    for line in text.splitlines():
+        if line.startswith(prefix):
+            return float(line.split()[-1])
+
+
+class MetricsTests(TestCase):
+    """Test the Prometheus metrics endpoint"""
+
+    def setUp(self):
+        self.staff = get_user_model().objects.create_superuser(
+            "admin@example.com", "pass123"
+        )
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=self.staff)}"
+        )
+
+    def test_auth_required(self):
+        """Test anonymous and non-staff requests are refused"""
+        user = get_user_model().objects.create_user("user@example.com", "pass123")
+
+        res = APIClient().get(METRICS_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertNotIn(b"http_request", res.content)
+
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=user)}"
+        )
+        res = client.get(METRICS_URL)
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_scraper_accept_header(self):
+        """Test the Accept header of Prometheus scrapers is served"""
+        res = self.client.get(
+            METRICS_URL,
+            HTTP_ACCEPT="application/openmetrics-text;version=1.0.0,"
+            "text/plain;version=0.0.4;q=0.5",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res["Content-Type"].startswith("text/plain"))
+
+    def test_request_metrics(self):
+        """Test handled requests are counted by view and status"""
+        labels = {"view": "recipe:recipe-list", "method": "GET", "status": "200"}
+        name = "http_request_duration_seconds_count"
+
+        before = sample(self.client.get(METRICS_URL).content.decode(), name, **labels)
+        self.client.get(reverse("recipe:recipe-list"))
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res["Content-Type"].startswith("text/plain"))
+        text = res.content.decode()
+        self.assertEqual(sample(text, name, **labels), (before or 0) + 1)
+        self.assertIsNotNone(
+            sample(text, "http_request_db_queries_count", view="recipe:recipe-list")
+        )
+
+    def test_cache_lookups(self):
+        """Test cache hits and misses are counted"""
+        metrics.cache_lookup("test", True)
+        metrics.cache_lookup("test", False)
+        metrics.cache_lookup("test", True)
+
+        text = self.client.get(METRICS_URL).content.decode()
+
+        self.assertEqual(
+            sample(text, "cache_lookups_total", cache="test", result="hit"), 2
+        )
+        self.assertEqual(
+            sample(text, "cache_lookups_total", cache="test", result="miss"), 1
+        )
+
+    def test_uwsgi_workers(self):
+        """Test uWSGI worker stats are reported under uWSGI"""
+        with patch.object(metrics, "uwsgi", Mock(workers=Mock(return_value=WORKERS))):
+            text = self.client.get(METRICS_URL).content.decode()
+
+        self.assertEqual(sample(text, "uwsgi_workers"), 2)
+        self.assertEqual(sample(text, "uwsgi_worker_requests", worker="1"), 10)
+        self.assertEqual(sample(text, "uwsgi_worker_busy", worker="1"), 1)
+        self.assertEqual(sample(text, "uwsgi_worker_busy", worker="2"), 0)
+        self.assertEqual(
+            sample(text, "uwsgi_worker_avg_response_seconds", worker="1"), 0.02
+        )
+
+    def test_multiprocess_exposition(self):
+        """Test metrics are read from the shared directory when configured"""
+        metrics.cache_lookup("test", True)
+        directory = tempfile.mkdtemp()
+
+        with patch.dict("os.environ", {"PROMETHEUS_MULTIPROC_DIR": directory}):
+            text = metrics.exposition().decode()
+
+        # Nothing was written to the empty directory yet.
+        self.assertIsNone(
+            sample(text, "cache_lookups_total", cache="test", result="hit")
+        )
@@ -0,0 +1,48 @@
+"""
+Tests for the browser-only middleware.
+"""
+
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+HEALTH_CHECK_URL = reverse("health-check")
+
+
+class BrowserOnlyMiddlewareTests(TestCase):
+    """Test browser-only middleware is skipped for API paths"""
+
+    def test_api_paths_skip_browser_middleware(self):
+        """Test API responses have no session or clickjacking handling"""
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        session.create()
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+
+        with self.assertNumQueries(0):
+            res = self.client.get(HEALTH_CHECK_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertNotIn("X-Frame-Options", res)
+        self.assertNotIn("Cookie", res.get("Vary", ""))
+
+    def test_admin_keeps_browser_middleware(self):
+        user = get_user_model().objects.create_superuser(
+            email="admin@example.com", password="testpass123"
+        )
+        self.client.force_login(user)
+
+        res = self.client.get(reverse("admin:index"))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res["X-Frame-Options"], "DENY")
+        self.assertIn("csrftoken", self.client.cookies)
+
+    def test_admin_checks_csrf(self):
+        client = self.client_class(enforce_csrf_checks=True)
+
+        res = client.post(reverse("admin:login"), {"username": "x", "password": "y"})
+
+        self.assertEqual(res.status_code, 403)
@@ -4,7 +4,6 @@ Tests for models.
 
 from decimal import Decimal
 from multiprocessing.sharedctypes import Value
-from unittest.mock import patch
 
 from core import models
 from django.contrib.auth import get_user_model
@@ -88,12 +87,9 @@ class ModelTest(TestCase):
 
         self.assertEqual(str(ingredient), ingredient.name)
 
-    @patch("core.models.uuid.uuid4")
-    def test_recipe_name_uuid(self, mock_uuid):
-        """Test generating image path."""
+    def test_recipe_image_path(self):
+        """Test generating image path, named by its content on save."""
 
-        uuid = "test-uuid"
-        mock_uuid.return_value = uuid
-        file_path = models.recipe_image_file_path(None, "example.jpg")
+        file_path = models.recipe_image_file_path(None, "example.JPG")
 
-        self.assertEqual(file_path, f"uploads/recipe/{uuid}.jpg")
+        self.assertEqual(file_path, "uploads/recipe/image.jpg")
@@ -0,0 +1,106 @@
+"""
+Tests for per-request profiling.
+"""
+
+import pstats
+import tempfile
+
+from core import profiling
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+ME_URL = reverse("user:me")
+
+
+@override_settings(PROFILE_MAX_PER_MINUTE=2, PROFILE_KEEP=5)
+class ProfilingTests(TestCase):
+    """Test profiling flagged requests"""
+
+    def setUp(self):
+        self.staff = get_user_model().objects.create_superuser(
+            "admin@example.com", "pass123"
+        )
+        self.user = get_user_model().objects.create_user("user@example.com", "pass123")
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=self.staff)}"
+        )
+
+        self.root = tempfile.mkdtemp()
+        settings = override_settings(PROFILE_ROOT=self.root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        profiling._started.clear()
+
+    def test_profile_staff_request(self):
+        """Test a staff request with the header is profiled"""
+        res = self.client.get(ME_URL, HTTP_X_PROFILE="1")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        stats = pstats.Stats(profiling.path(res["X-Profile-Id"]))
+        self.assertGreater(stats.total_calls, 0)
+
+    def test_query_flag(self):
+        """Test the query flag works like the header"""
+        res = self.client.get(ME_URL, {"profile": "1"})
+
+        self.assertIn("X-Profile-Id", res)
+
+    def test_unflagged_request(self):
+        """Test requests are not profiled by default"""
+        res = self.client.get(ME_URL)
+
+        self.assertNotIn("X-Profile-Id", res)
+
+    def test_non_staff_ignored(self):
+        """Test the flag is ignored for other users"""
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token}")
+
+        res = self.client.get(ME_URL, HTTP_X_PROFILE="1")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotIn("X-Profile-Id", res)
+        self.assertNotIn("X-Profile-Skipped", res)
+
+    def test_rate_limit(self):
+        """Test profiling stops once the limit is reached"""
+        for _ in range(2):
+            self.assertIn("X-Profile-Id", self.client.get(ME_URL, HTTP_X_PROFILE="1"))
+
+        res = self.client.get(ME_URL, HTTP_X_PROFILE="1")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotIn("X-Profile-Id", res)
+        self.assertIn("X-Profile-Skipped", res)
+
+    def test_download_profile(self):
+        """Test staff can download a profile"""
+        res = self.client.get(ME_URL, HTTP_X_PROFILE="1")
+
+        res = self.client.get(res["X-Profile-URL"])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn("attachment", res["Content-Disposition"])
+        self.assertGreater(len(b"".join(res.streaming_content)), 0)
+
+    def test_download_requires_staff(self):
+        """Test other users can not download profiles"""
+        profile_url = self.client.get(ME_URL, HTTP_X_PROFILE="1")["X-Profile-URL"]
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        res = client.get(profile_url)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_download_unknown_profile(self):
+        """Test malformed and unknown ids are not found"""
+        for profile_id in ["0" * 32, "..%2Fsecret"]:
+            res = self.client.get(reverse("profile", args=[profile_id]))
+
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,102 @@
+"""
+Tests for purging deleted users.
+"""
+
+from decimal import Decimal
+
+from core import jobs, models, purge
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+
+
+def create_user(email="user@example.com", password="testpass123"):
+    """Create and return user"""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def create_recipe(user, **params):
+    """Create and return a sample recipe."""
+    defaults = {"title": "Sample recipe", "time_minutes": 10, "price": Decimal("5.00")}
+    defaults.update(params)
+
+    return models.Recipe.objects.create(user=user, **defaults)
+
+
+class PurgeTests(TestCase):
+    """Test deleting users in the background."""
+
+    def setUp(self):
+        self.user = create_user()
+        self.other = create_user(email="other@example.com")
+        Token.objects.create(user=self.user)
+        tag = models.Tag.objects.create(user=self.user, name="Vegan")
+        ingredient = models.Ingredient.objects.create(user=self.user, name="Rice")
+        for i in range(5):
+            recipe = create_recipe(self.user, title=f"Curry {i}")
+            recipe.tags.add(tag)
+            recipe.ingredients.add(ingredient)
+        self.kept = create_recipe(self.other, title="Stew")
+
+    def test_delete_deactivates(self):
+        job = purge.delete_user(self.user)
+
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertIsNotNone(self.user.deleted_at)
+        self.assertFalse(Token.objects.filter(user=self.user).exists())
+        self.assertEqual(job.payload, {"user_id": self.user.id})
+        self.assertEqual(models.Recipe.objects.filter(user=self.user).count(), 5)
+
+    @override_settings(PURGE_BATCH_SIZE=2)
+    def test_purge_in_batches(self):
+        """Test the job deletes everything of the user, reporting progress"""
+        job = purge.delete_user(self.user)
+
+        jobs.run_next()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, models.Job.Status.DONE)
+        self.assertEqual(job.progress["recipes"], {"deleted": 5, "total": 5})
+        self.assertEqual(job.progress["tags"], {"deleted": 1, "total": 1})
+        self.assertFalse(get_user_model().objects.filter(id=self.user.id).exists())
+        self.assertEqual(list(models.Recipe.objects.all()), [self.kept])
+        self.assertFalse(models.Tag.objects.exists())
+        self.assertFalse(models.Recipe.tags.through.objects.exists())
+        self.assertFalse(models.Change.objects.filter(user_id=self.user.id).exists())
+
+    def test_batches_bounded(self):
+        """Test one batch deletes at most the batch size"""
+        queryset = models.Recipe.objects.filter(user=self.user)
+
+        self.assertEqual(purge.purge_batch(queryset, 3), 3)
+        self.assertEqual(queryset.count(), 2)
+
+    def test_images_released(self):
+        """Test purged recipes release their images and variants"""
+        models.StoredFile.objects.create(name="image.jpg", refcount=2)
+        models.StoredFile.objects.create(name="thumbnail.jpg", refcount=1)
+        create_recipe(self.user, image="image.jpg")
+        create_recipe(
+            self.user,
+            image="image.jpg",
+            image_variants={"thumbnail": "thumbnail.jpg"},
+        )
+        purge.delete_user(self.user)
+
+        jobs.run_next()
+
+        self.assertEqual(
+            dict(models.StoredFile.objects.values_list("name", "refcount")),
+            {"image.jpg": 0, "thumbnail.jpg": 0},
+        )
+
+    def test_reactivated_user_kept(self):
+        purge.delete_user(self.user)
+        get_user_model().objects.filter(id=self.user.id).update(
+            is_active=True, deleted_at=None
+        )
+
+        jobs.run_next()
+
+        self.assertEqual(models.Recipe.objects.filter(user=self.user).count(), 5)
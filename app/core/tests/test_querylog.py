@@ -0,0 +1,165 @@
+"""
+Tests for the slow query log.
+"""
+
+import io
+import json
+import os
+import tempfile
+
+from core import models, querylog
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+
+
+class FingerprintTests(SimpleTestCase):
+    """Test normalizing statements"""
+
+    def test_literals_and_placeholders(self):
+        """Test values are replaced by placeholders"""
+        key, sql = querylog.fingerprint(
+            "SELECT  *  FROM t WHERE a = 'x''y' AND b = 42 AND c = %s"
+        )
+
+        self.assertEqual(sql, "SELECT * FROM t WHERE a = ? AND b = ? AND c = ?")
+
+    def test_lists_collapse(self):
+        """Test IN lists and VALUES of any length share a fingerprint"""
+        short = querylog.fingerprint("SELECT * FROM t WHERE id IN (%s)")
+        long = querylog.fingerprint("SELECT * FROM t WHERE id IN (%s, %s, %s)")
+        values = querylog.fingerprint("INSERT INTO t VALUES (%s, %s), (%s, %s)")
+
+        self.assertEqual(short, long)
+        self.assertEqual(values[1], "INSERT INTO t VALUES (...)")
+
+    def test_savepoints(self):
+        """Test savepoint names are normalized"""
+        first = querylog.fingerprint('SAVEPOINT "s140_x1"')
+        second = querylog.fingerprint('SAVEPOINT "s2_x12"')
+
+        self.assertEqual(first, second)
+
+    def test_percentile(self):
+        """Test percentiles are estimated from the buckets"""
+        buckets = [0] * (len(querylog.BUCKETS) + 1)
+        buckets[querylog.BUCKETS.index(1)] = 98
+        buckets[querylog.BUCKETS.index(100)] = 2
+
+        self.assertEqual(querylog.percentile(buckets, 0.5), 1)
+        self.assertEqual(querylog.percentile(buckets, 0.99), 100)
+
+
+class QueryLogTests(TestCase):
+    """Test aggregating and reporting statements"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        settings = override_settings(QUERY_LOG_DIR=self.directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        querylog.query_log.reset()
+        self.addCleanup(querylog.query_log.reset)
+
+        self.user = get_user_model().objects.create_user("user@example.com", "pass")
+
+    def test_statements_aggregated(self):
+        """Test repeated statements are counted under one fingerprint"""
+        querylog.query_log.reset()
+        for _ in range(3):
+            list(models.Recipe.objects.filter(user=self.user))
+
+        stats = [
+            s for s in querylog.query_log.stats.values() if "core_recipe" in s["sql"]
+        ]
+        self.assertEqual(len(stats), 1)
+        self.assertEqual(stats[0]["calls"], 3)
+        self.assertEqual(sum(stats[0]["buckets"]), 3)
+
+    def test_rows_counted(self):
+        """Test returned rows are added up"""
+        for title in ["a", "b"]:
+            models.Tag.objects.create(user=self.user, name=title)
+        querylog.query_log.reset()
+
+        list(models.Tag.objects.all())
+
+        (stats,) = querylog.query_log.stats.values()
+        self.assertEqual(stats["rows"], 2)
+
+    @override_settings(QUERY_LOG_EXPLAIN_THRESHOLD=0)
+    def test_slow_select_explained(self):
+        """Test plans are captured for slow selects"""
+        querylog.query_log.reset()
+
+        list(models.Tag.objects.filter(user=self.user))
+
+        (stats,) = querylog.query_log.stats.values()
+        self.assertIn("cost=", stats["plan"])
+        self.assertNotIn("actual time", stats["plan"])
+
+    @override_settings(QUERY_LOG_EXPLAIN_THRESHOLD=0)
+    def test_writes_not_explained(self):
+        """Test statements with side effects are never re-run"""
+        querylog.query_log.reset()
+
+        models.Tag.objects.create(user=self.user, name="Vegan")
+
+        self.assertEqual(models.Tag.objects.count(), 1)
+        insert = [
+            s
+            for s in querylog.query_log.stats.values()
+            if s["sql"].startswith("INSERT")
+        ]
+        self.assertIsNone(insert[0]["plan"])
+
+    @override_settings(QUERY_LOG_EXPLAIN_THRESHOLD=0)
+    def test_locking_selects_not_explained(self):
+        """Test selects taking row locks are not explained"""
+        querylog.query_log.reset()
+
+        with transaction.atomic():
+            list(models.Tag.objects.select_for_update().filter(user=self.user))
+            list(models.Tag.objects.select_for_update(no_key=True))
+
+        locking = [s for s in querylog.query_log.stats.values() if "FOR " in s["sql"]]
+        self.assertEqual(len(locking), 2)
+        self.assertEqual([s["plan"] for s in locking], [None, None])
+
+    def test_disabled_without_directory(self):
+        """Test nothing is recorded when QUERY_LOG_DIR is not set"""
+        querylog.query_log.reset()
+
+        with override_settings(QUERY_LOG_DIR=None):
+            list(models.Tag.objects.all())
+
+        self.assertEqual(querylog.query_log.stats, {})
+
+    def test_flush_and_report(self):
+        """Test the command merges the logs of all processes"""
+        list(models.Tag.objects.all())
+        querylog.query_log.flush()
+        # A second process ran the same statement.
+        path = os.path.join(self.directory, f"{os.getpid()}.json")
+        with open(path) as f:
+            data = f.read()
+        with open(os.path.join(self.directory, "1.json"), "w") as f:
+            f.write(data)
+
+        out = io.StringIO()
+        call_command("slow_queries", "--json", "--sort=calls", stdout=out)
+
+        report = json.loads(out.getvalue())
+        tags = [s for s in report if "core_tag" in s["sql"]]
+        self.assertEqual(tags[0]["calls"], 2)
+        self.assertIn("p99_ms", tags[0])
+        self.assertNotIn("plan", tags[0])
+
+    def test_reset(self):
+        """Test the command deletes the log"""
+        querylog.query_log.flush()
+
+        call_command("slow_queries", "--reset", stdout=io.StringIO())
+
+        self.assertEqual(os.listdir(self.directory), [])
@@ -0,0 +1,85 @@
+"""
+Tests for the reprocess_images command.
+"""
+
+import io
+import json
+import os
+import tempfile
+from decimal import Decimal
+
+from core import images, models
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase
+from PIL import Image
+
+
+class ReprocessImagesTests(TestCase):
+    """Test regenerating image variants in bulk."""
+
+    def setUp(self):
+        user = get_user_model().objects.create_user("user@example.com", "pass123")
+        self.recipes = []
+        for color in ["red", "green", "blue"]:
+            recipe = models.Recipe.objects.create(
+                user=user, title=color, time_minutes=5, price=Decimal("1.00")
+            )
+            buffer = io.BytesIO()
+            Image.new("RGB", (300, 200), color).save(buffer, format="JPEG")
+            recipe.image.save(f"{color}.jpg", ContentFile(buffer.getvalue()))
+            self.recipes.append(recipe)
+
+        self.checkpoint = os.path.join(tempfile.mkdtemp(), "checkpoint")
+
+    def tearDown(self):
+        for recipe in self.recipes:
+            recipe.refresh_from_db()
+            images.delete_files(recipe.image_variants.values())
+            recipe.image.delete()
+
+    def reprocess(self, *args):
+        out = io.StringIO()
+        call_command(
+            "reprocess_images",
+            "--workers=2",
+            "--batch-size=2",
+            f"--checkpoint={self.checkpoint}",
+            *args,
+            stdout=out,
+        )
+        return out.getvalue()
+
+    def test_reprocess_all(self):
+        """Test variants are rendered for every image"""
+        out = self.reprocess()
+
+        for recipe in self.recipes:
+            recipe.refresh_from_db()
+            self.assertEqual(recipe.image_status, models.Recipe.ImageStatus.READY)
+            self.assertEqual(set(recipe.image_variants), {"thumbnail", "medium"})
+        self.assertIn("Processed 3 image(s), 0 failed", out)
+        with open(self.checkpoint) as f:
+            self.assertEqual(json.load(f)["last_id"], self.recipes[-1].id)
+
+    def test_resume_from_checkpoint(self):
+        """Test a run resumes after the checkpointed recipe"""
+        with open(self.checkpoint, "w") as f:
+            json.dump({"last_id": self.recipes[0].id}, f)
+
+        out = self.reprocess()
+
+        self.recipes[0].refresh_from_db()
+        self.assertEqual(self.recipes[0].image_variants, {})
+        self.assertIn("2 image(s) to process", out)
+
+    def test_dry_run(self):
+        """Test a dry run changes nothing"""
+        out = self.reprocess("--dry-run")
+
+        self.assertIn("3 image(s) to process", out)
+        self.assertFalse(os.path.exists(self.checkpoint))
+        for recipe in self.recipes:
+            recipe.refresh_from_db()
+            self.assertEqual(recipe.image_variants, {})
@@ -0,0 +1,150 @@
+"""
+Tests for the content addressed image storage.
+"""
+
+import hashlib
+import io
+import os
+from datetime import timedelta
+from decimal import Decimal
+
+from core import models
+from core.images import render_variants
+from core.storage import recipe_images
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from PIL import Image
+
+
+def sample_image(color="red"):
+    """Return a sample JPEG file"""
+    buffer = io.BytesIO()
+    Image.new("RGB", (10, 10), color).save(buffer, format="JPEG")
+
+    return ContentFile(buffer.getvalue(), name="sample.jpg")
+
+
+def refcount(name):
+    """Return the reference count of a stored file"""
+    return models.StoredFile.objects.get(name=name).refcount
+
+
+class ContentAddressedStorageTests(TestCase):
+    """Test deduplicating and reference counting recipe images."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("user@example.com", "pass123")
+
+    def create_recipe(self):
+        return models.Recipe.objects.create(
+            user=self.user, title="Sample", time_minutes=5, price=Decimal("5.25")
+        )
+
+    def test_name_is_content_hash(self):
+        """Test images are named after their content"""
+        image = sample_image()
+        digest = hashlib.sha256(image.read()).hexdigest()
+
+        recipe = self.create_recipe()
+        recipe.image.save("photo.JPG", image)
+
+        self.assertEqual(recipe.image.name, f"uploads/recipe/{digest[:2]}/{digest}.jpg")
+        self.assertTrue(os.path.exists(recipe.image.path))
+
+    def test_identical_images_stored_once(self):
+        """Test identical uploads share one file"""
+        first, second = self.create_recipe(), self.create_recipe()
+
+        first.image.save("a.jpg", sample_image())
+        second.image.save("b.jpg", sample_image())
+
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(refcount(first.image.name), 2)
+
+    def test_replacing_image_releases_previous(self):
+        """Test replacing an image releases the old one"""
+        recipe = self.create_recipe()
+        recipe.image.save("a.jpg", sample_image("red"))
+        old_name = recipe.image.name
+
+        recipe = models.Recipe.objects.get(id=recipe.id)
+        recipe.image = sample_image("blue")
+        recipe.save()
+
+        self.assertNotEqual(recipe.image.name, old_name)
+        self.assertEqual(refcount(old_name), 0)
+        self.assertEqual(refcount(recipe.image.name), 1)
+
+    def test_deleting_recipe_releases_image(self):
+        """Test deleting a recipe releases its image"""
+        recipe = self.create_recipe()
+        recipe.image.save("a.jpg", sample_image())
+        name = recipe.image.name
+
+        recipe.delete()
+
+        self.assertEqual(refcount(name), 0)
+
+    def test_deleting_recipe_releases_variants(self):
+        """Test deleting a recipe releases its image variants"""
+        recipe = self.create_recipe()
+        recipe.image.save("a.jpg", sample_image())
+        recipe.image_variants = render_variants(recipe.image.name)
+        recipe.save()
+        self.assertTrue(recipe.image_variants)
+
+        recipe.delete()
+
+        for name in recipe.image_variants.values():
+            self.assertEqual(refcount(name), 0)
+
+    def test_gc_removes_unreferenced_files(self):
+        """Test collecting files nobody references"""
+        recipe = self.create_recipe()
+        recipe.image.save("a.jpg", sample_image())
+        path, name = recipe.image.path, recipe.image.name
+        recipe.delete()
+        models.StoredFile.objects.filter(name=name).update(
+            updated_at=timezone.now() - timedelta(days=2)
+        )
+
+        call_command("gc_media", stdout=io.StringIO())
+
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(models.StoredFile.objects.filter(name=name).exists())
+
+    def test_gc_keeps_referenced_files(self):
+        """Test referenced and recent files are kept"""
+        recipe = self.create_recipe()
+        recipe.image.save("a.jpg", sample_image())
+
+        call_command("gc_media", "--grace-hours", "0", stdout=io.StringIO())
+
+        self.assertTrue(os.path.exists(recipe.image.path))
+        recipe.image.delete()
+
+    def test_gc_removes_orphaned_files(self):
+        """Test collecting files unknown to the database"""
+        name = recipe_images.save("uploads/recipe/orphan.jpg", sample_image("green"))
+        models.StoredFile.objects.filter(name=name).delete()
+        path = recipe_images.path(name)
+        old = (timezone.now() - timedelta(days=2)).timestamp()
+        os.utime(path, (old, old))
+
+        call_command("gc_media", stdout=io.StringIO())
+
+        self.assertFalse(os.path.exists(path))
+
+    def test_gc_recount(self):
+        """Test recounting references from the recipes"""
+        recipe = self.create_recipe()
+        recipe.image.save("a.jpg", sample_image())
+        models.StoredFile.objects.filter(name=recipe.image.name).update(refcount=7)
+
+        call_command("gc_media", "--recount", stdout=io.StringIO())
+
+        self.assertEqual(refcount(recipe.image.name), 1)
+        recipe.image.delete()
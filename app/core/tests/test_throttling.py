@@ -0,0 +1,130 @@
+"""
+Tests for request throttling.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from core import throttling
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+TAGS_URL = reverse("recipe:tag-list")
+CREATE_USER_URL = reverse("user:create")
+TOKEN_URL = reverse("user:token")
+HEALTH_CHECK_URL = reverse("health-check")
+
+RATES = {
+    "user_read": "2/min",
+    "user_write": "1/min",
+    "anon_write": "1/min",
+    "anon_token": "1/min",
+}
+
+
+def create_user(email="user@example.com", password="testpass123"):
+    """Create and return user"""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+class SlidingWindowTests(SimpleTestCase):
+    """Test the sliding window counters."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_burst_then_rate(self):
+        """Test a budget allows its requests at once, then the rate"""
+        waits = [throttling.take("budget", "3/min", now=100) for _ in range(4)]
+
+        self.assertEqual(waits[:3], [0, 0, 0])
+        self.assertAlmostEqual(waits[3], 40)
+        self.assertGreater(throttling.take("budget", "3/min", now=130), 0)
+        self.assertEqual(throttling.take("budget", "3/min", now=140), 0)
+        self.assertGreater(throttling.take("budget", "3/min", now=140), 0)
+
+    def test_refused_not_counted(self):
+        """Test refused requests do not use up the budget"""
+        for _ in range(10):
+            throttling.take("budget", "2/min", now=30)
+
+        self.assertEqual(cache.get("budget:0"), 2)
+
+    def test_concurrent_requests(self):
+        """Test concurrent requests cannot pass together over the budget"""
+        barrier = threading.Barrier(8)
+
+        def requests():
+            barrier.wait()
+            return [throttling.take("budget", "20/min", now=10) for _ in range(5)]
+
+        with ThreadPoolExecutor(8) as executor:
+            waits = [
+                w for ws in executor.map(lambda _: requests(), range(8)) for w in ws
+            ]
+
+        self.assertEqual(waits.count(0), 20)
+
+    def test_parse_rate(self):
+        self.assertEqual(throttling.parse_rate("100/min"), (100, 60))
+        self.assertEqual(throttling.parse_rate("5/s"), (5, 1))
+
+
+@override_settings(
+    REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": RATES}
+)
+class ThrottlingApiTests(TestCase):
+    """Test the throttled API."""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_user_budgets(self):
+        """Test reads and writes have separate budgets per user"""
+        statuses = [self.client.get(TAGS_URL).status_code for _ in range(3)]
+
+        self.assertEqual(statuses, [200, 200, 429])
+        res = self.client.get(TAGS_URL)
+        self.assertIn(int(res["Retry-After"]), range(1, 121))
+        res = self.client.post(reverse("recipe:tag-bulk-delete"), {"ids": []})
+        self.assertNotEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+        other = APIClient()
+        other.force_authenticate(create_user(email="other@example.com"))
+        self.assertEqual(other.get(TAGS_URL).status_code, status.HTTP_200_OK)
+
+    def test_token_budget_per_ip(self):
+        payload = {"email": self.user.email, "password": "wrong"}
+
+        first = APIClient().post(TOKEN_URL, payload)
+        second = APIClient().post(TOKEN_URL, payload)
+        elsewhere = APIClient(REMOTE_ADDR="10.0.0.2").post(TOKEN_URL, payload)
+
+        self.assertEqual(first.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(second.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn("Retry-After", second)
+        self.assertEqual(elsewhere.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_forwarded_for_ignored(self):
+        """Test clients cannot pick their IP address with a header"""
+        client = APIClient()
+        client.post(CREATE_USER_URL, {}, HTTP_X_FORWARDED_FOR="10.0.0.3")
+
+        res = client.post(CREATE_USER_URL, {}, HTTP_X_FORWARDED_FOR="10.0.0.4")
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_health_check_not_throttled(self):
+        client = APIClient()
+
+        for _ in range(3):
+            self.assertEqual(client.get(HEALTH_CHECK_URL).status_code, 200)
@@ -0,0 +1,144 @@
+"""
+Request throttling with sliding window counters.
+
+Every client has a counter per budget and window of the period of its
+rate, e.g. a minute for "60/min". A request is let through while the
+requests of the current window, plus those of the previous one weighted
+by how much of it still overlaps the last period, stay within the
+budget. Otherwise it is refused with 429 and a Retry-After header
+telling when the window has slid far enough, so bursts up to the budget
+pass while sustained traffic is held to the rate.
+
+Counters are only changed with the atomic `add` and `incr` of the cache,
+every request counts itself before comparing, so concurrent requests of
+one client in several workers see distinct counts and cannot pass
+together on the last request of a budget. Refused requests are taken
+back out and do not count.
+
+Authenticated requests are counted per user and anonymous ones per IP
+address, against separate budgets for reads, writes, image uploads and
+token requests named in DEFAULT_THROTTLE_RATES, e.g. "user_read" or
+"anon_token". Views pick the uploads or token budget with their
+`throttle_scope`, others use reads or writes by method. Budgets without
+a rate are not throttled.
+
+Counters are kept in the default cache. With the local memory cache each
+uWSGI worker has its own counters, a shared cache like memcached makes
+them span the workers.
+"""
+
+import time
+
+from django.core.cache import cache
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_rate(rate):
+    """Return the requests and period in seconds of a rate like '100/min'"""
+    requests, period = rate.split("/")
+
+    return int(requests), PERIODS[period[0]]
+
+
+def increment(key, timeout):
+    """Atomically add one to a counter, creating it, return its new value"""
+    while True:
+        if cache.add(key, 1, timeout):
+            return 1
+        try:
+            return cache.incr(key)
+        except ValueError:
+            # Expired between the add and the incr.
+            continue
+
+
+def take(key, rate, now=None):
+    """
+    Count a request against a budget, return 0 or the seconds until one
+    more request fits into it.
+    """
+    capacity, period = parse_rate(rate)
+    now = time.time() if now is None else now
+    window, elapsed = divmod(now, period)
+    current = f"{key}:{int(window)}"
+    # Windows are kept through the next one, which weighs them in.
+    count = increment(current, 2 * period)
+    previous = cache.get(f"{key}:{int(window) - 1}", 0)
+    if previous * (1 - elapsed / period) + count <= capacity:
+        return 0
+
+    try:
+        cache.decr(current)
+    except ValueError:
+        pass
+    count -= 1
+
+    if count < capacity and previous:
+        # Room once enough of the previous window slid out.
+        wait = period * (1 - (capacity - count - 1) / previous) - elapsed
+    else:
+        # Room once enough of this window slid out, during the next one.
+        wait = period - elapsed + period * max(0, 1 - (capacity - 1) / max(count, 1))
+
+    return max(wait, 0.001)
+
+
+class SlidingWindowThrottle(BaseThrottle):
+    """Base class of throttles counting requests per client and budget"""
+
+    prefix = None
+
+    def client(self, request):
+        """Return the key of the client of a request, None to not throttle it"""
+        raise NotImplementedError
+
+    def budget(self, request, view):
+        """Return the name of the budget a request counts against"""
+        scope = getattr(view, "throttle_scope", None)
+        if scope is None:
+            scope = "read" if request.method in READ_METHODS else "write"
+
+        return f"{self.prefix}_{scope}"
+
+    def allow_request(self, request, view):
+        self.delay = 0
+        client = self.client(request)
+        budget = self.budget(request, view)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(budget)
+        if client is None or rate is None:
+            return True
+
+        self.delay = take(f"throttle:{budget}:{client}", rate)
+        return not self.delay
+
+    def wait(self):
+        return self.delay
+
+
+class UserRateThrottle(SlidingWindowThrottle):
+    """Throttle authenticated requests per user"""
+
+    prefix = "user"
+
+    def client(self, request):
+        if request.user and request.user.is_authenticated:
+            return request.user.pk
+
+        return None
+
+
+class AnonRateThrottle(SlidingWindowThrottle):
+    """Throttle anonymous requests per IP address"""
+
+    prefix = "anon"
+
+    def client(self, request):
+        if request.user and request.user.is_authenticated:
+            return None
+
+        return self.get_ident(request)
@@ -0,0 +1,133 @@
+"""
+Chunked, resumable image uploads.
+
+Chunks are streamed from the request straight into a partial file under
+`IMAGE_UPLOAD_TEMP_DIR`. Once complete, the file is checksummed and moved
+into place as the recipe image without being read into memory.
+"""
+
+import os
+import re
+
+from django.conf import settings
+from django.core.files import File
+from PIL import Image
+
+from core import images, storage
+
+CONTENT_RANGE_RE = re.compile(r"^bytes (\d+)-(\d+)/(\d+|\*)$")
+COPY_BUFFER_SIZE = 64 * 1024
+
+
+class UploadError(Exception):
+    """Raised when a chunk or a finished upload is rejected."""
+
+
+class OffsetMismatch(UploadError):
+    """Raised when a chunk does not continue the received bytes."""
+
+
+class PartialFile(File):
+    """Partial upload that storages move into place instead of copying."""
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def partial_path(upload):
+    """Return the path of the file collecting the upload chunks"""
+    return os.path.join(settings.IMAGE_UPLOAD_TEMP_DIR, f"{upload.pk}.part")
+
+
+def start(upload):
+    """Create the empty partial file for a new upload"""
+    os.makedirs(settings.IMAGE_UPLOAD_TEMP_DIR, exist_ok=True)
+    open(partial_path(upload), "wb").close()
+
+
+def discard(upload):
+    """Remove an upload and its partial file"""
+    try:
+        os.remove(partial_path(upload))
+    except FileNotFoundError:
+        pass
+
+    upload.delete()
+
+
+def parse_content_range(header, size):
+    """Return the (first, last) byte positions of a Content-Range header"""
+    match = CONTENT_RANGE_RE.match(header or "")
+
+    if match is None:
+        raise UploadError("Content-Range must look like 'bytes first-last/total'.")
+
+    first, last, total = match.groups()
+    first, last = int(first), int(last)
+
+    if last < first:
+        raise UploadError("Content-Range is empty.")
+    if total != "*" and int(total) != size:
+        raise UploadError("Content-Range total does not match the upload size.")
+    if last >= size:
+        raise UploadError("Content-Range goes past the end of the upload.")
+    if last - first + 1 > settings.IMAGE_UPLOAD_MAX_CHUNK_SIZE:
+        raise UploadError("Chunk is too large.")
+
+    return first, last
+
+
+def write_chunk(upload, stream, first, last):
+    """
+    Stream a chunk into the partial file at its offset.
+
+    Chunks may overlap what was already received, so a client that lost the
+    response to a chunk can simply resend it. Resending an earlier chunk
+    keeps the bytes received after it. Returns the received count.
+    """
+    if first > upload.received:
+        raise OffsetMismatch(f"Expected a chunk starting at {upload.received}.")
+
+    remaining = last - first + 1
+    with open(partial_path(upload), "r+b") as partial:
+        partial.seek(first)
+        while remaining:
+            data = stream.read(min(COPY_BUFFER_SIZE, remaining))
+            if not data:
+                break
+            partial.write(data)
+            remaining -= len(data)
+        upload.received = max(upload.received, partial.tell())
+
+    upload.save(update_fields=["received", "updated_at"])
+
+    if remaining:
+        raise UploadError("Chunk ended before Content-Range was satisfied.")
+
+    return upload.received
+
+
+def finish(upload):
+    """Verify a complete upload and make it the recipe image"""
+    path = partial_path(upload)
+
+    if upload.received != upload.size:
+        raise UploadError(f"Received {upload.received} of {upload.size} bytes.")
+    if storage.file_digest(path) != upload.checksum.lower():
+        raise UploadError("Checksum does not match the uploaded data.")
+
+    try:
+        with Image.open(path) as img:
+            img.verify()
+    except Exception:
+        raise UploadError("Upload is not a valid image.")
+
+    recipe = upload.recipe
+    with open(path, "rb") as f:
+        recipe.image.save(upload.filename, PartialFile(f), save=True)
+
+    # The partial file is left behind when identical content was stored.
+    discard(upload)
+    images.schedule_processing(recipe)
+
+    return recipe
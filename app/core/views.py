@@ -1,8 +1,108 @@
-from rest_framework.decorators import api_view
+import io
+import os
+
+from django.conf import settings
+from django.http import FileResponse, Http404
+from drf_spectacular.utils import extend_schema
+from rest_framework import (
+    authentication,
+    parsers,
+    permissions,
+    renderers,
+    status,
+)
+from rest_framework.decorators import (
+    api_view,
+    authentication_classes,
+    permission_classes,
+    renderer_classes,
+    throttle_classes,
+)
 from rest_framework.response import Response
 
+from core import batch as core_batch
+from core import metrics as core_metrics
+from core import profiling, serializers
+from core.authentication import BatchAuthentication
+
 
 @api_view(["GET"])
+@throttle_classes([])
 def health_check(request):
     """Return sucessful response"""
     return Response({"healthy": True})
+
+
+class PlainTextRenderer(renderers.BaseRenderer):
+    """Accept the text exposition format scrapers ask for"""
+
+    media_type = "text/plain"
+    format = "txt"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Errors are rendered as their message.
+        if isinstance(data, dict):
+            data = data.get("detail", "")
+        return data if isinstance(data, bytes) else str(data).encode()
+
+
+@extend_schema(exclude=True)
+@api_view(["GET"])
+@authentication_classes([authentication.TokenAuthentication, BatchAuthentication])
+@permission_classes([permissions.IsAdminUser])
+@renderer_classes([PlainTextRenderer])
+def metrics(request):
+    """Return the Prometheus metrics of all workers to staff"""
+    return Response(core_metrics.exposition(), content_type=core_metrics.CONTENT_TYPE)
+
+
+@api_view(["GET"])
+@authentication_classes(
+    [
+        authentication.TokenAuthentication,
+        authentication.SessionAuthentication,
+        BatchAuthentication,
+    ]
+)
+@permission_classes([permissions.IsAdminUser])
+def profile(request, profile_id):
+    """Download the stats of a profiled request"""
+    path = profiling.path(profile_id)
+    if path is None or not os.path.exists(path):
+        raise Http404
+
+    return FileResponse(
+        open(path, "rb"), as_attachment=True, filename=f"{profile_id}.prof"
+    )
+
+
+@extend_schema(
+    request=serializers.BatchSerializer,
+    responses=serializers.BatchResponseSerializer,
+)
+@api_view(["POST"])
+@authentication_classes([authentication.TokenAuthentication])
+@permission_classes([permissions.IsAuthenticated])
+def batch(request):
+    """Run several API operations in one request"""
+    # Checked on the bytes read, the Content-Length header may be missing
+    # or wrong.
+    body = b""
+    if request.stream is not None:
+        body = request.stream.read(settings.BATCH_MAX_BODY_SIZE + 1)
+    if len(body) > settings.BATCH_MAX_BODY_SIZE:
+        return Response(
+            {"detail": f"Batches are limited to {settings.BATCH_MAX_BODY_SIZE} bytes."},
+            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        )
+
+    data = parsers.JSONParser().parse(io.BytesIO(body)) if body else {}
+    serializer = serializers.BatchSerializer(data=data)
+    serializer.is_valid(raise_exception=True)
+    results, committed = core_batch.run(
+        request,
+        serializer.validated_data["operations"],
+        parallel=serializer.validated_data["parallel"],
+    )
+
+    return Response({"committed": committed, "results": results})
@@ -0,0 +1,170 @@
+"""
+Per-user vocabularies of tag and ingredient names.
+
+Tag and ingredient names are unique per user. Recipe writes link them by
+name through `add`, which maps the names to ids with the vocabulary of
+the user kept in the cache, so a write using known names runs no lookup
+queries. Names missing from it are inserted with ON CONFLICT DO NOTHING,
+so concurrent writers creating the same name end up with one row.
+
+Cached ids are trusted only as far as the join table insert linking
+them, which selects the given ids still carrying the given names and
+locks them against deletion. Entries gone stale, e.g. renamed or
+deleted by another process or rolled back, are linked nowhere; the
+vocabulary is then dropped and those names are resolved again.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from core import metrics, sync
+from core.models import Ingredient, Recipe, Tag
+
+# Models linked to recipes by name, with the field of the recipe linking them.
+LINKS = {Tag: Recipe.tags, Ingredient: Recipe.ingredients}
+
+INSERT = """
+    INSERT INTO {table} (user_id, name, recipe_count)
+    SELECT %(user)s, names.name, 0 FROM unnest(%(names)s::text[]) AS names (name)
+    ON CONFLICT (user_id, name) DO NOTHING
+    RETURNING name, id
+"""
+
+LINK = """
+    WITH valid AS (
+        SELECT object.id FROM {table} object
+        JOIN unnest(%(ids)s::bigint[], %(names)s::text[]) AS cached (id, name)
+        ON object.id = cached.id AND object.name = cached.name
+        WHERE object.user_id = %(user)s
+        FOR KEY SHARE OF object
+    ),
+    linked AS (
+        INSERT INTO {through} (recipe_id, {column})
+        SELECT %(recipe)s, id FROM valid
+        ON CONFLICT DO NOTHING
+        RETURNING {column}
+    )
+    SELECT
+        ARRAY(SELECT id FROM valid),
+        ARRAY(SELECT {column} FROM linked)
+"""
+
+
+def key(model, user_id):
+    """Return the cache key of the vocabulary of a user"""
+    return f"vocabulary:{model._meta.model_name}:{user_id}"
+
+
+def forget(model, user_id):
+    """Drop the cached vocabulary of a user"""
+    cache.delete(key(model, user_id))
+
+
+def create(model, user_id, names):
+    """Insert the names a user does not have yet, return their ids by name"""
+    sql = INSERT.format(table=connection.ops.quote_name(model._meta.db_table))
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {"user": user_id, "names": names})
+        created = dict(cursor.fetchall())
+
+    sync.record(user_id, sync.KINDS[model], created.values())
+
+    # Inserted concurrently, or missing from a stale vocabulary.
+    existing = [name for name in names if name not in created]
+    if existing:
+        created.update(
+            model.objects.filter(user_id=user_id, name__in=existing).values_list(
+                "name", "id"
+            )
+        )
+
+    return created
+
+
+def resolve(model, user_id, names):
+    """Return the ids of tags or ingredients by name, creating missing ones"""
+    names = list(dict.fromkeys(names))
+    vocabulary = cache.get(key(model, user_id))
+    loaded = vocabulary is None
+    if loaded:
+        vocabulary = dict(
+            model.objects.filter(user_id=user_id).values_list("name", "id")
+        )
+
+    missing = [name for name in names if name not in vocabulary]
+    metrics.cache_lookup("vocabulary", not (loaded or missing))
+    if missing:
+        vocabulary.update(create(model, user_id, missing))
+    if loaded or missing:
+        cache.set(key(model, user_id), vocabulary, settings.VOCABULARY_CACHE_TIMEOUT)
+
+    return {name: vocabulary[name] for name in names}
+
+
+def link(recipe, model, ids):
+    """
+    Link tags or ingredients to a recipe by id, ids mapping names to ids,
+    return the names whose ids no longer carry them.
+    """
+    field = LINKS[model]
+    through = field.through
+    column = field.field.m2m_reverse_field_name() + "_id"
+    quote = connection.ops.quote_name
+    sql = LINK.format(
+        table=quote(model._meta.db_table),
+        through=quote(through._meta.db_table),
+        column=quote(column),
+    )
+    # Sent like Manager.add() does, for the handlers keeping derived data.
+    signal = {
+        "sender": through,
+        "instance": recipe,
+        "reverse": False,
+        "model": model,
+        "using": connection.alias,
+    }
+    m2m_changed.send(action="pre_add", pk_set=set(ids.values()), **signal)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            sql,
+            {
+                "user": recipe.user_id,
+                "recipe": recipe.pk,
+                "ids": list(ids.values()),
+                "names": list(ids),
+            },
+        )
+        valid, linked = cursor.fetchone()
+    m2m_changed.send(action="post_add", pk_set=set(linked), **signal)
+
+    valid = set(valid)
+    return [name for name, pk in ids.items() if pk not in valid]
+
+
+def add(recipe, model, names):
+    """Link tags or ingredients to a recipe by name, creating missing ones"""
+    names = list(dict.fromkeys(names))
+    if not names:
+        return
+
+    stale = link(recipe, model, resolve(model, recipe.user_id, names))
+    if stale:
+        forget(model, recipe.user_id)
+        link(recipe, model, resolve(model, recipe.user_id, stale))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def attribute_saved(sender, instance, created, raw=False, **kwargs):
+    # New names are found by the insert, renamed ones must be dropped.
+    if not created and not raw:
+        forget(sender, instance.user_id)
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def attribute_deleted(sender, instance, **kwargs):
+    forget(sender, instance.user_id)
@@ -2,29 +2,55 @@
 Serializers for Recipe API.
 """
 
-from core import models
-from rest_framework import serializers
+import re
+from decimal import Decimal
 
+from core import duplicates, models, stats, vocabulary
+from core.deferred import coalesced
+from core.instrumentation import TimedSerializerMixin
+from django.conf import settings
+from django.db import transaction
+from django.urls import reverse
+from rest_framework import exceptions, serializers
 
-class TagSerializer(serializers.ModelSerializer):
+
+DUPLICATE_MODES = ("flag", "merge", "allow")
+
+# Fields a merged recipe must not contradict, its title is kept.
+MERGE_CONFLICTS = ("time_minutes", "price", "description", "link")
+
+
+class MergeConflict(exceptions.APIException):
+    """Raised when a merged recipe contradicts the recipe it duplicates"""
+
+    status_code = 409
+    default_detail = "The recipe contradicts the recipe it duplicates."
+    default_code = "merge_conflict"
+
+    def __init__(self, recipe_id, conflicts):
+        super().__init__(conflicts)
+        self.detail["duplicate_of"] = recipe_id
+
+
+class TagSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for tag object"""
 
     class Meta:
         model = models.Tag
-        fields = ["id", "name"]
-        read_only_fields = ["id"]
+        fields = ["id", "name", "recipe_count"]
+        read_only_fields = ["id", "recipe_count"]
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for ingredient object"""
 
     class Meta:
         model = models.Ingredient
-        fields = ["id", "name"]
-        read_only_fields = ["id"]
+        fields = ["id", "name", "recipe_count"]
+        read_only_fields = ["id", "recipe_count"]
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for recipe object"""
 
     tags = TagSerializer(many=True, required=False)
@@ -36,36 +62,111 @@ class RecipeSerializer(serializers.ModelSerializer):
         read_only_fields = ["id"]
 
 
-class RecipeDetailSerializer(RecipeSerializer):
+class SimilarRecipeSerializer(RecipeSerializer):
+    """Serializer for a recipe with its similarity to another one"""
+
+    similarity = serializers.FloatField(read_only=True)
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + ["similarity"]
+
+
+class ImageURLsMixin(serializers.Serializer):
+    """Add the access checked URLs of a recipe image and its variants"""
+
+    image_urls = serializers.SerializerMethodField()
+
+    def get_image_urls(self, recipe) -> dict:
+        """Map the original and each variant to its URL"""
+        if not recipe.image:
+            return {}
+
+        url = reverse("recipe:recipe-image", args=[recipe.id])
+        request = self.context.get("request")
+        if request is not None:
+            url = request.build_absolute_uri(url)
+
+        urls = {"original": url}
+        for variant in recipe.image_variants:
+            urls[variant] = f"{url}?variant={variant}"
+
+        return urls
+
+
+class RecipeDetailSerializer(ImageURLsMixin, RecipeSerializer):
     """Serializer for recipe detail"""
 
     class Meta(RecipeSerializer.Meta):
-        fields = RecipeSerializer.Meta.fields + ["description", "image"]
+        fields = RecipeSerializer.Meta.fields + [
+            "description",
+            "image",
+            "image_status",
+            "image_variants",
+            "image_urls",
+            "duplicate_of",
+        ]
+        read_only_fields = RecipeSerializer.Meta.read_only_fields + [
+            "image_status",
+            "image_variants",
+            "duplicate_of",
+        ]
 
     def _get_or_create_tags(self, tags, recipe):
         """Handle getting or creating tags"""
-        auth_user = self.context["request"].user
-
-        for tag in tags:
-            tag_object, created = models.Tag.objects.get_or_create(
-                user=auth_user, **tag
-            )
-            recipe.tags.add(tag_object)
+        vocabulary.add(recipe, models.Tag, [tag["name"] for tag in tags])
 
     def _get_or_create_ingredients(self, ingredients, recipe):
         """Handle getting or creating ingredients"""
-        auth_user = self.context["request"].user
+        names = [ingredient["name"] for ingredient in ingredients]
+        vocabulary.add(recipe, models.Ingredient, names)
 
-        for ingredient in ingredients:
-            ingredient_object, created = models.Ingredient.objects.get_or_create(
-                user=auth_user, **ingredient
+    def _duplicates_mode(self):
+        """Return how to handle a duplicate, from the duplicates parameter"""
+        mode = self.context["request"].query_params.get("duplicates", "flag")
+        if mode not in DUPLICATE_MODES:
+            raise serializers.ValidationError(
+                {"duplicates": [f"Must be one of {', '.join(DUPLICATE_MODES)}."]}
             )
-            recipe.ingredients.add(ingredient_object)
 
+        return mode
+
+    @transaction.atomic
+    @coalesced()
     def create(self, validated_data):
-        """Create a recipe"""
+        """
+        Create a recipe, counting its tags and ingredients atomically.
+
+        A near-duplicate of an existing recipe is flagged as such, or with
+        merge its tags and ingredients are added to the existing recipe
+        which is returned, keeping its title. Other fields differing from
+        the existing recipe raise MergeConflict.
+        """
         tags = validated_data.pop("tags", [])
         ingredients = validated_data.pop("ingredients", [])
+        mode = self._duplicates_mode()
+
+        if mode != "allow":
+            validated_data["duplicate_of_id"] = duplicates.find(
+                validated_data["user"].id,
+                validated_data["title"],
+                [ingredient["name"] for ingredient in ingredients],
+            )
+        if mode == "merge" and validated_data["duplicate_of_id"]:
+            recipe = models.Recipe.objects.get(pk=validated_data["duplicate_of_id"])
+            conflicts = {
+                field: [f"Differs from {getattr(recipe, field)!r} of the recipe."]
+                for field in MERGE_CONFLICTS
+                if field in validated_data
+                and validated_data[field] != getattr(recipe, field)
+            }
+            if conflicts:
+                raise MergeConflict(recipe.id, conflicts)
+
+            self._get_or_create_tags(tags, recipe)
+            self._get_or_create_ingredients(ingredients, recipe)
+            recipe.merged = True
+            return recipe
+
         recipe = models.Recipe.objects.create(**validated_data)
 
         self._get_or_create_tags(tags, recipe)
@@ -73,8 +174,10 @@ class RecipeDetailSerializer(RecipeSerializer):
 
         return recipe
 
+    @transaction.atomic
+    @coalesced()
     def update(self, instance, validated_data):
-        """Update recipe"""
+        """Update recipe, recounting its tags and ingredients atomically"""
         tags = validated_data.pop("tags", None)
         ingredients = validated_data.pop("ingredients", None)
 
@@ -94,11 +197,325 @@ class RecipeDetailSerializer(RecipeSerializer):
         return instance
 
 
-class RecipeImageSerializer(serializers.ModelSerializer):
+class RecipeImageSerializer(
+    TimedSerializerMixin, ImageURLsMixin, serializers.ModelSerializer
+):
     """Serializer for image"""
 
     class Meta:
         model = models.Recipe
-        fields = ["id", "image"]
-        read_only_fields = ["id"]
+        fields = ["id", "image", "image_status", "image_variants", "image_urls"]
+        read_only_fields = ["id", "image_status", "image_variants"]
         extra_kwargs = {"image": {"required": "True"}}
+
+
+class ImageUploadSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """Serializer for chunked image uploads"""
+
+    class Meta:
+        model = models.ImageUpload
+        fields = ["id", "recipe", "filename", "size", "checksum", "received"]
+        read_only_fields = ["id", "received"]
+
+    def validate_recipe(self, value):
+        """Only allow uploading to the authenticated user recipes"""
+        if value.user != self.context["request"].user:
+            raise serializers.ValidationError("Recipe not found.")
+
+        return value
+
+    def validate_size(self, value):
+        """Check the announced size against the upload limit"""
+        if not 0 < value <= settings.IMAGE_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(
+                f"Size must be between 1 and {settings.IMAGE_UPLOAD_MAX_SIZE} bytes."
+            )
+
+        return value
+
+    def validate_checksum(self, value):
+        """Check for a SHA-256 hex digest"""
+        if not re.fullmatch(r"[0-9a-fA-F]{64}", value):
+            raise serializers.ValidationError("Checksum must be a SHA-256 hex digest.")
+
+        return value.lower()
+
+
+class RecipeStatsSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """Serializer for the recipe statistics of a user"""
+
+    average_time_minutes = serializers.SerializerMethodField()
+    average_price = serializers.SerializerMethodField()
+    top_tags = serializers.SerializerMethodField()
+    top_ingredients = serializers.SerializerMethodField()
+
+    class Meta:
+        model = models.RecipeStats
+        fields = [
+            "recipe_count",
+            "average_time_minutes",
+            "average_price",
+            "top_tags",
+            "top_ingredients",
+        ]
+        read_only_fields = fields
+
+    def get_average_time_minutes(self, obj) -> float:
+        if not obj.recipe_count:
+            return None
+
+        return round(obj.total_time_minutes / obj.recipe_count, 2)
+
+    def get_average_price(self, obj) -> str:
+        if not obj.recipe_count:
+            return None
+
+        return str((obj.total_price / obj.recipe_count).quantize(Decimal("0.01")))
+
+    def get_top_tags(self, obj) -> list:
+        return stats.top(obj.user_id, models.Tag)
+
+    def get_top_ingredients(self, obj) -> list:
+        return stats.top(obj.user_id, models.Ingredient)
+
+
+class ShoppingListRequestSerializer(serializers.Serializer):
+    """Serializer for the recipes of a shopping list"""
+
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        min_length=1,
+        max_length=1000,
+        help_text="Recipe IDs, repeated for recipes cooked several times",
+    )
+
+
+class ShoppingListItemSerializer(serializers.Serializer):
+    """Serializer for an ingredient of a shopping list"""
+
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    count = serializers.IntegerField()
+    recipes = serializers.ListField(child=serializers.IntegerField())
+
+
+class ShoppingListSerializer(serializers.Serializer):
+    """Serializer for a shopping list"""
+
+    recipe_count = serializers.IntegerField()
+    total_price = serializers.DecimalField(max_digits=14, decimal_places=2)
+    total_time_minutes = serializers.IntegerField()
+    ingredients = ShoppingListItemSerializer(many=True)
+
+
+class RecipeCostItemSerializer(serializers.Serializer):
+    """Serializer for a recipe to cost"""
+
+    id = serializers.IntegerField(min_value=1)
+    scale = serializers.DecimalField(
+        max_digits=9,
+        decimal_places=4,
+        min_value=Decimal("0.0001"),
+        default=Decimal(1),
+        help_text="Factor the recipe is scaled by, e.g. 1.5 for 6 of 4 servings",
+    )
+    price = serializers.DecimalField(max_digits=5, decimal_places=2, read_only=True)
+    scaled_price = serializers.DecimalField(
+        max_digits=14, decimal_places=2, read_only=True
+    )
+
+
+class RecipeCostSerializer(serializers.Serializer):
+    """Serializer for the costs of a batch of recipes"""
+
+    recipes = serializers.ListField(
+        child=RecipeCostItemSerializer(), min_length=1, max_length=10000
+    )
+    total_price = serializers.DecimalField(
+        max_digits=14, decimal_places=2, read_only=True
+    )
+    total_time_minutes = serializers.IntegerField(read_only=True)
+
+
+class SyncRecipeSerializer(ImageURLsMixin, serializers.ModelSerializer):
+    """Serializer for a recipe changed since a sync cursor"""
+
+    class Meta:
+        model = models.Recipe
+        fields = [
+            "id",
+            "title",
+            "description",
+            "time_minutes",
+            "price",
+            "link",
+            "tags",
+            "ingredients",
+            "image_urls",
+        ]
+        read_only_fields = fields
+
+
+class SyncTagSerializer(serializers.ModelSerializer):
+    """Serializer for a tag changed since a sync cursor"""
+
+    class Meta:
+        model = models.Tag
+        fields = ["id", "name"]
+        read_only_fields = fields
+
+
+class SyncIngredientSerializer(serializers.ModelSerializer):
+    """Serializer for an ingredient changed since a sync cursor"""
+
+    class Meta:
+        model = models.Ingredient
+        fields = ["id", "name"]
+        read_only_fields = fields
+
+
+class SyncDeletedSerializer(serializers.Serializer):
+    """Serializer for the ids of objects deleted since a sync cursor"""
+
+    recipes = serializers.ListField(child=serializers.IntegerField())
+    tags = serializers.ListField(child=serializers.IntegerField())
+    ingredients = serializers.ListField(child=serializers.IntegerField())
+
+
+class SyncSerializer(serializers.Serializer):
+    """Serializer for the changes since a sync cursor"""
+
+    cursor = serializers.IntegerField(
+        help_text="Pass as since to get the following changes"
+    )
+    more = serializers.BooleanField(help_text="Whether more changes follow")
+    recipes = SyncRecipeSerializer(many=True)
+    tags = SyncTagSerializer(many=True)
+    ingredients = SyncIngredientSerializer(many=True)
+    deleted = SyncDeletedSerializer()
+
+
+class BulkSelectSerializer(serializers.Serializer):
+    """Serializer selecting objects by ids or by a filter"""
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        max_length=10000,
+        required=False,
+    )
+
+    def validate(self, attrs):
+        if "ids" not in attrs and "filter" not in attrs:
+            raise serializers.ValidationError("Either ids or filter is required.")
+
+        return attrs
+
+    def selection(self):
+        """Return the keyword arguments selecting the objects"""
+        data = self.validated_data
+
+        return {"ids": data.get("ids"), **data.get("filter", {})}
+
+
+class RecipeFilterSerializer(serializers.Serializer):
+    """Serializer for a filter of recipes, empty for every recipe"""
+
+    tags = serializers.ListField(child=serializers.IntegerField(), required=False)
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(), required=False
+    )
+    title = serializers.CharField(
+        required=False, help_text="Case insensitive part of the title"
+    )
+
+
+class RecipeBulkDeleteSerializer(BulkSelectSerializer):
+    """Serializer for deleting recipes in bulk"""
+
+    filter = RecipeFilterSerializer(required=False)
+
+
+class RecipeValuesSerializer(serializers.ModelSerializer):
+    """Serializer for the field values set on recipes in bulk"""
+
+    class Meta:
+        model = models.Recipe
+        fields = ["title", "description", "time_minutes", "price", "link"]
+        extra_kwargs = {field: {"required": False} for field in fields}
+
+
+class RecipeBulkUpdateSerializer(RecipeBulkDeleteSerializer):
+    """Serializer for updating recipes in bulk"""
+
+    set = RecipeValuesSerializer(required=False)
+    add_tags = serializers.ListField(child=serializers.IntegerField(), default=list)
+    remove_tags = serializers.ListField(child=serializers.IntegerField(), default=list)
+    add_ingredients = serializers.ListField(
+        child=serializers.IntegerField(), default=list
+    )
+    remove_ingredients = serializers.ListField(
+        child=serializers.IntegerField(), default=list
+    )
+
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        links = ["add_tags", "remove_tags", "add_ingredients", "remove_ingredients"]
+        if not attrs.get("set") and not any(attrs[name] for name in links):
+            raise serializers.ValidationError("Nothing to update.")
+
+        return attrs
+
+    def links(self):
+        """Return the ids to add and remove by linked model"""
+        data = self.validated_data
+
+        return {
+            models.Tag: (data["add_tags"], data["remove_tags"]),
+            models.Ingredient: (data["add_ingredients"], data["remove_ingredients"]),
+        }
+
+
+class AttrFilterSerializer(serializers.Serializer):
+    """Serializer for a filter of tags or ingredients"""
+
+    name = serializers.CharField(
+        required=False, help_text="Case insensitive part of the name"
+    )
+    assigned = serializers.BooleanField(
+        required=False,
+        allow_null=True,
+        default=None,
+        help_text="Only the ones assigned to recipes, or not assigned",
+    )
+
+
+class AttrBulkDeleteSerializer(BulkSelectSerializer):
+    """Serializer for deleting tags or ingredients in bulk"""
+
+    filter = AttrFilterSerializer(required=False)
+
+
+class AttrBulkUpdateSerializer(serializers.Serializer):
+    """Serializer for renaming tags or ingredients in bulk"""
+
+    names = serializers.DictField(
+        child=serializers.CharField(max_length=255),
+        help_text="New names by id",
+    )
+
+    def validate_names(self, value):
+        if not value:
+            raise serializers.ValidationError("Nothing to rename.")
+        try:
+            return {int(pk): name for pk, name in value.items()}
+        except ValueError:
+            raise serializers.ValidationError("Keys must be ids.")
+
+
+class BulkResultSerializer(serializers.Serializer):
+    """Serializer for the counts of a bulk update or delete"""
+
+    updated = serializers.IntegerField(required=False)
+    deleted = serializers.IntegerField(required=False)
+    links_added = serializers.IntegerField(required=False)
+    links_removed = serializers.IntegerField(required=False)
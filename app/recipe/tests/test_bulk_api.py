@@ -0,0 +1,225 @@
+"""
+Tests for the bulk update and delete APIs.
+"""
+
+from decimal import Decimal
+
+from core import models
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+RECIPE_BULK_UPDATE_URL = reverse("recipe:recipe-bulk-update")
+RECIPE_BULK_DELETE_URL = reverse("recipe:recipe-bulk-delete")
+TAG_BULK_UPDATE_URL = reverse("recipe:tag-bulk-update")
+TAG_BULK_DELETE_URL = reverse("recipe:tag-bulk-delete")
+INGREDIENT_BULK_DELETE_URL = reverse("recipe:ingredient-bulk-delete")
+
+
+def create_user(email="user@example.com", password="testpass123"):
+    """Create and return user"""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def create_recipe(user, **params):
+    """Create and return a sample recipe."""
+    defaults = {"title": "Sample recipe", "time_minutes": 10, "price": Decimal("5.00")}
+    defaults.update(params)
+
+    return models.Recipe.objects.create(user=user, **defaults)
+
+
+class PublicBulkApiTests(TestCase):
+    """Test unauthenticated API requests."""
+
+    def test_auth_required(self):
+        res = APIClient().post(RECIPE_BULK_DELETE_URL, {"ids": [1]}, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateBulkApiTests(TestCase):
+    """Test authenticated API requests."""
+
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.vegan = models.Tag.objects.create(user=self.user, name="Vegan")
+        self.quick = models.Tag.objects.create(user=self.user, name="Quick")
+        self.rice = models.Ingredient.objects.create(user=self.user, name="Rice")
+        self.recipes = []
+        for i in range(3):
+            recipe = create_recipe(self.user, title=f"Curry {i}")
+            recipe.tags.add(self.vegan)
+            self.recipes.append(recipe)
+        self.other = create_recipe(self.user, title="Stew")
+
+    def post(self, url, data):
+        return self.client.post(url, data, format="json")
+
+    def assert_recipe_counts(self):
+        """Check the maintained recipe counts match the join rows"""
+        for tag in models.Tag.objects.all():
+            self.assertEqual(tag.recipe_count, tag.recipe_set.count(), tag.name)
+        for ingredient in models.Ingredient.objects.all():
+            self.assertEqual(
+                ingredient.recipe_count, ingredient.recipe_set.count(), ingredient.name
+            )
+
+    def test_update_by_ids(self):
+        ids = [recipe.id for recipe in self.recipes[:2]]
+
+        res = self.post(
+            RECIPE_BULK_UPDATE_URL,
+            {"ids": ids, "set": {"time_minutes": 45, "price": "7.25"}},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["updated"], 2)
+        self.assertEqual(
+            set(
+                models.Recipe.objects.filter(
+                    time_minutes=45, price=Decimal("7.25")
+                ).values_list("id", flat=True)
+            ),
+            set(ids),
+        )
+        stats = models.RecipeStats.objects.get(user=self.user)
+        self.assertEqual(stats.total_time_minutes, 45 * 2 + 10 * 2)
+        self.assertEqual(stats.total_price, Decimal("24.50"))
+
+    def test_retag_by_filter(self):
+        """Test tags and ingredients are edited on every recipe matching"""
+        res = self.post(
+            RECIPE_BULK_UPDATE_URL,
+            {
+                "filter": {"tags": [self.vegan.id], "title": "curry"},
+                "add_tags": [self.quick.id],
+                "remove_tags": [self.vegan.id],
+                "add_ingredients": [self.rice.id],
+            },
+        )
+
+        self.assertEqual(res.data["updated"], 3)
+        self.assertEqual(res.data["links_added"], 6)
+        self.assertEqual(res.data["links_removed"], 3)
+        self.assertEqual(self.quick.recipe_set.count(), 3)
+        self.assertFalse(self.vegan.recipe_set.exists())
+        self.assert_recipe_counts()
+
+    def test_changes_recorded(self):
+        """Test bulk updates reach the sync change log"""
+        before = models.ChangeSequence.objects.get(user=self.user).value
+
+        self.post(RECIPE_BULK_UPDATE_URL, {"filter": {}, "set": {"link": "x"}})
+
+        changed = models.Change.objects.filter(
+            user=self.user, kind="recipe", sequence__gt=before
+        )
+        self.assertEqual(changed.count(), 4)
+
+    def test_other_users_recipes_rejected(self):
+        foreign = create_recipe(create_user(email="other@example.com"))
+
+        res = self.post(
+            RECIPE_BULK_DELETE_URL, {"ids": [self.recipes[0].id, foreign.id]}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn(str(foreign.id), res.data["ids"][0])
+        self.assertEqual(models.Recipe.objects.count(), 5)
+
+    def test_other_users_tags_rejected(self):
+        foreign = models.Tag.objects.create(
+            user=create_user(email="other@example.com"), name="Foreign"
+        )
+
+        res = self.post(
+            RECIPE_BULK_UPDATE_URL, {"filter": {}, "add_tags": [foreign.id]}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(foreign.recipe_set.exists())
+
+    def test_invalid_payloads(self):
+        for url, data in [
+            (RECIPE_BULK_DELETE_URL, {}),
+            (RECIPE_BULK_UPDATE_URL, {"ids": [self.other.id]}),
+            (TAG_BULK_UPDATE_URL, {"names": {"tag": "Name"}}),
+        ]:
+            res = self.post(url, data)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_delete_by_filter(self):
+        res = self.post(RECIPE_BULK_DELETE_URL, {"filter": {"title": "CURRY"}})
+
+        self.assertEqual(res.data["deleted"], 3)
+        self.assertEqual(list(models.Recipe.objects.all()), [self.other])
+        self.assertEqual(models.RecipeStats.objects.get(user=self.user).recipe_count, 1)
+        self.assertEqual(
+            models.Change.objects.filter(deleted=True, kind="recipe").count(), 3
+        )
+        self.assert_recipe_counts()
+
+    def test_delete_queries_independent_of_count(self):
+        """Test bulk deletes are set-based"""
+        for i in range(20):
+            create_recipe(self.user, title=f"Soup {i}").tags.add(self.quick)
+
+        counts = []
+        for title in ("Curry", "Soup"):
+            with CaptureQueriesContext(connection) as queries:
+                self.post(RECIPE_BULK_DELETE_URL, {"filter": {"title": title}})
+            counts.append(len(queries))
+
+        self.assertEqual(counts[0], counts[1])
+
+    def test_rename_tags(self):
+        res = self.post(
+            TAG_BULK_UPDATE_URL,
+            {"names": {str(self.vegan.id): "Plant based", str(self.quick.id): "Fast"}},
+        )
+
+        self.assertEqual(res.data["updated"], 2)
+        self.assertEqual(
+            set(models.Tag.objects.values_list("name", flat=True)),
+            {"Plant based", "Fast"},
+        )
+
+    def test_rename_records_recipes(self):
+        """Test renaming tags records the recipes using them as changed"""
+        before = models.ChangeSequence.objects.get(user=self.user).value
+
+        self.post(TAG_BULK_UPDATE_URL, {"names": {str(self.vegan.id): "Plant based"}})
+
+        changed = models.Change.objects.filter(user=self.user, sequence__gt=before)
+        self.assertEqual(
+            set(changed.filter(kind="recipe").values_list("object_id", flat=True)),
+            set(self.vegan.recipe_set.values_list("id", flat=True)),
+        )
+        self.assertTrue(changed.filter(kind="tag", object_id=self.vegan.id).exists())
+
+    def test_delete_unassigned(self):
+        """Test deleting the tags and ingredients not used by any recipe"""
+        res = self.post(TAG_BULK_DELETE_URL, {"filter": {"assigned": False}})
+        self.assertEqual(res.data["deleted"], 1)
+        res = self.post(INGREDIENT_BULK_DELETE_URL, {"filter": {"assigned": False}})
+        self.assertEqual(res.data["deleted"], 1)
+
+        self.assertEqual(list(models.Tag.objects.all()), [self.vegan])
+        self.assertFalse(models.Ingredient.objects.exists())
+
+    def test_delete_tags_by_ids(self):
+        res = self.post(TAG_BULK_DELETE_URL, {"ids": [self.vegan.id]})
+
+        self.assertEqual(res.data["deleted"], 1)
+        self.assertEqual(
+            models.Change.objects.filter(kind="recipe", deleted=False).count(), 4
+        )
+        self.assertFalse(models.Recipe.tags.through.objects.exists())
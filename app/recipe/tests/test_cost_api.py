@@ -0,0 +1,92 @@
+"""
+Tests for the recipe cost API.
+"""
+
+from decimal import Decimal
+
+from core import models
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+COST_URL = reverse("recipe:cost")
+
+
+def create_user(email="user@example.com", password="testpass123"):
+    """Create and return user"""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def create_recipe(user, **params):
+    """Create and return a sample recipe."""
+    defaults = {"title": "Sample recipe", "time_minutes": 10, "price": Decimal("5.00")}
+    defaults.update(params)
+
+    return models.Recipe.objects.create(user=user, **defaults)
+
+
+class PublicCostApiTests(TestCase):
+    """Test unauthenticated API requests."""
+
+    def test_auth_required(self):
+        res = APIClient().post(COST_URL, {"recipes": [{"id": 1}]}, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateCostApiTests(TestCase):
+    """Test authenticated API requests."""
+
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.soup = create_recipe(self.user, price=Decimal("3.33"), time_minutes=20)
+        self.pie = create_recipe(self.user, price=Decimal("10.01"), time_minutes=60)
+
+    def post(self, recipes):
+        return self.client.post(COST_URL, {"recipes": recipes}, format="json")
+
+    def test_cost(self):
+        """Test recipes are scaled in order with exact totals"""
+        res = self.post(
+            [
+                {"id": self.pie.id, "scale": "1.5"},
+                {"id": self.soup.id},
+                {"id": self.pie.id, "scale": "0.5"},
+            ]
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(item["id"], item["scaled_price"]) for item in res.data["recipes"]],
+            [(self.pie.id, "15.02"), (self.soup.id, "3.33"), (self.pie.id, "5.01")],
+        )
+        self.assertEqual(res.data["recipes"][0]["price"], "10.01")
+        self.assertEqual(res.data["recipes"][1]["scale"], "1.0000")
+        self.assertEqual(res.data["total_price"], "23.36")
+        self.assertEqual(res.data["total_time_minutes"], 140)
+
+    def test_cost_query_count(self):
+        recipes = [{"id": create_recipe(self.user).id} for _ in range(50)]
+
+        with self.assertNumQueries(1):
+            res = self.post(recipes)
+
+        self.assertEqual(res.data["total_price"], "250.00")
+
+    def test_other_users_recipes_rejected(self):
+        other = create_recipe(create_user(email="other@example.com"))
+
+        res = self.post([{"id": self.soup.id}, {"id": other.id}])
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn(str(other.id), res.data["recipes"][0])
+
+    def test_invalid_scale(self):
+        for scale in ("0", "-1", "abc"):
+            res = self.post([{"id": self.soup.id, "scale": scale}])
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,229 @@
+"""
+Tests for duplicate recipe detection.
+"""
+
+import io
+from decimal import Decimal
+
+import numpy as np
+
+from core import duplicates, models
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+RECIPES_URL = reverse("recipe:recipe-list")
+
+
+def create_user(email="user@example.com", password="testpass123"):
+    """Create and return user"""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def payload(title="Chicken Curry", ingredients=("Chicken", "Rice", "Curry paste")):
+    return {
+        "title": title,
+        "time_minutes": 30,
+        "price": "10.00",
+        "tags": [{"name": "Dinner"}],
+        "ingredients": [{"name": name} for name in ingredients],
+    }
+
+
+class FingerprintTests(SimpleTestCase):
+    """Test the fingerprints"""
+
+    def test_ignores_casing_whitespace_and_order(self):
+        self.assertEqual(
+            duplicates.fingerprint("Chicken  Curry", ["Rice", "chicken"]),
+            duplicates.fingerprint(" chicken curry", ["CHICKEN ", "rice"]),
+        )
+        self.assertNotEqual(
+            duplicates.fingerprint("Chicken Curry", ["Rice"]),
+            duplicates.fingerprint("Chicken Curry", ["Noodles"]),
+        )
+
+
+class PrivateDuplicatesApiTests(TestCase):
+    """Test authenticated API requests."""
+
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.original = self.client.post(RECIPES_URL, payload(), format="json").data
+
+    def test_flag_duplicate(self):
+        """Test a recipe differing by casing and whitespace is flagged"""
+        res = self.client.post(
+            RECIPES_URL,
+            payload(" chicken   CURRY", ["rice", "CHICKEN", "curry Paste "]),
+            format="json",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data["duplicate_of"], self.original["id"])
+        self.assertIsNone(self.original["duplicate_of"])
+
+    def test_flag_near_duplicate(self):
+        """Test a recipe with a typo in a long title is flagged"""
+        original = self.client.post(
+            RECIPES_URL,
+            payload(
+                "Slow cooked lamb shoulder with rosemary and garlic",
+                ["Lamb shoulder", "Rosemary", "Garlic", "Olive oil", "Salt"],
+            ),
+            format="json",
+        )
+
+        res = self.client.post(
+            RECIPES_URL,
+            payload(
+                "Slow cooked lamb shoulder with rosemary & garlic",
+                ["Lamb shoulder", "Rosemary", "Garlic", "Olive oil", "Salt"],
+            ),
+            format="json",
+        )
+
+        self.assertEqual(res.data["duplicate_of"], original.data["id"])
+
+    def test_different_recipe_not_flagged(self):
+        res = self.client.post(
+            RECIPES_URL, payload("Beef stew", ["Beef", "Carrots"]), format="json"
+        )
+
+        self.assertIsNone(res.data["duplicate_of"])
+
+    def test_merge_duplicate(self):
+        """Test merging returns the existing recipe with the new tags"""
+        data = payload("CHICKEN CURRY")
+        data["tags"] = [{"name": "Spicy"}]
+
+        res = self.client.post(RECIPES_URL + "?duplicates=merge", data, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["id"], self.original["id"])
+        self.assertEqual(models.Recipe.objects.count(), 1)
+        self.assertEqual(
+            sorted(tag["name"] for tag in res.data["tags"]), ["Dinner", "Spicy"]
+        )
+
+    def test_merge_adds_ingredients(self):
+        """Test merging adds the new ingredients to the existing recipe"""
+        data = payload("Chicken curry", ["Chicken", "Rice", "Curry paste", "Lime"])
+
+        res = self.client.post(RECIPES_URL + "?duplicates=merge", data, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["id"], self.original["id"])
+        self.assertEqual(
+            sorted(ingredient["name"] for ingredient in res.data["ingredients"]),
+            ["Chicken", "Curry paste", "Lime", "Rice"],
+        )
+
+    def test_merge_conflict(self):
+        """Test merging a recipe contradicting the existing one is refused"""
+        data = payload("CHICKEN CURRY", ["Chicken", "Rice", "Lime"])
+        data["price"] = "12.00"
+
+        res = self.client.post(RECIPES_URL + "?duplicates=merge", data, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(res.data["duplicate_of"], self.original["id"])
+        self.assertIn("price", res.data)
+        recipe = models.Recipe.objects.get()
+        self.assertEqual(recipe.price, Decimal("10.00"))
+        self.assertFalse(recipe.ingredients.filter(name="Lime").exists())
+
+    def test_allow_duplicate(self):
+        res = self.client.post(
+            RECIPES_URL + "?duplicates=allow", payload(), format="json"
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertIsNone(res.data["duplicate_of"])
+
+    def test_invalid_mode(self):
+        res = self.client.post(
+            RECIPES_URL + "?duplicates=drop", payload(), format="json"
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(models.Recipe.objects.count(), 1)
+
+    def test_duplicates_limited_to_user(self):
+        other = APIClient()
+        other.force_authenticate(create_user(email="other@example.com"))
+
+        res = other.post(RECIPES_URL, payload(), format="json")
+
+        self.assertIsNone(res.data["duplicate_of"])
+
+
+class GroupsTests(TestCase):
+    """Test grouping the duplicates of a user"""
+
+    def test_chained_recipes_not_grouped(self):
+        """A recipe duplicating a duplicate, but not the first, starts a group"""
+        user = create_user()
+        minhash = np.arange(64, dtype="<u4")
+        ids = []
+        # Each recipe changes 12 of the 64 hashes of the previous one.
+        for changed in [slice(0), slice(0, 12), slice(12, 24)]:
+            minhash[changed] += 100
+            recipe = models.Recipe.objects.create(
+                user=user, title=f"Recipe {len(ids)}", time_minutes=5, price=1
+            )
+            models.RecipeFingerprint.objects.filter(recipe=recipe).update(
+                fingerprint=str(len(ids)), minhash=minhash.tobytes(), buckets=[1]
+            )
+            ids.append(recipe.id)
+
+        self.assertEqual(duplicates.groups(user.id), [ids[:2]])
+
+
+class DedupeCommandTests(TestCase):
+    """Test the dedupe command"""
+
+    def setUp(self):
+        self.user = create_user()
+        self.recipes = []
+        for title in ["Pad Thai", "pad  thai", "PAD THAI", "Green curry"]:
+            recipe = models.Recipe.objects.create(
+                user=self.user, title=title, time_minutes=5, price=Decimal(1)
+            )
+            tag = models.Tag.objects.create(user=self.user, name=f"Tag {title}")
+            recipe.tags.add(tag)
+            self.recipes.append(recipe)
+        # Imported without signals, so not fingerprinted yet.
+        models.RecipeFingerprint.objects.all().delete()
+
+    def call(self, *args):
+        out = io.StringIO()
+        call_command("dedupe_recipes", "--workers=1", *args, stdout=out)
+
+        return out.getvalue()
+
+    def test_dry_run(self):
+        out = self.call("--dry-run")
+
+        self.assertIn("Found 2 duplicate(s) in 1 group(s)", out)
+        self.assertFalse(models.Recipe.objects.filter(duplicate_of__isnull=False))
+
+    def test_flag(self):
+        self.call()
+
+        flagged = models.Recipe.objects.filter(duplicate_of=self.recipes[0])
+        self.assertEqual(set(flagged), set(self.recipes[1:3]))
+
+    def test_merge(self):
+        out = self.call("--merge")
+
+        self.assertIn("Merged 2 duplicate(s)", out)
+        self.assertEqual(
+            set(models.Recipe.objects.all()), {self.recipes[0], self.recipes[3]}
+        )
+        self.assertEqual(self.recipes[0].tags.count(), 3)
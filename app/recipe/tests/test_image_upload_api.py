@@ -0,0 +1,175 @@
+"""
+Tests for the chunked image upload API.
+"""
+
+import hashlib
+import io
+import os
+from decimal import Decimal
+
+from core import models, uploads
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APIClient
+
+UPLOADS_URL = reverse("recipe:imageupload-list")
+
+
+def chunk_url(upload_id):
+    """Create and return a chunk url"""
+    return reverse("recipe:imageupload-chunk", args=[upload_id])
+
+
+def finalize_url(upload_id):
+    """Create and return a finalize url"""
+    return reverse("recipe:imageupload-finalize", args=[upload_id])
+
+
+def sample_image():
+    """Return the bytes of a sample JPEG"""
+    buffer = io.BytesIO()
+    Image.new("RGB", (100, 100)).save(buffer, format="JPEG")
+
+    return buffer.getvalue()
+
+
+class ChunkedUploadAPITests(TestCase):
+    """Test uploading images in chunks."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "user@example.com", "testpass123"
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = models.Recipe.objects.create(
+            user=self.user, title="Sample", time_minutes=5, price=Decimal("5.25")
+        )
+        self.data = sample_image()
+
+    def tearDown(self):
+        self.recipe.refresh_from_db()
+        if self.recipe.image:
+            self.recipe.image.delete()
+        for upload in models.ImageUpload.objects.all():
+            uploads.discard(upload)
+
+    def start_upload(self, **params):
+        payload = {
+            "recipe": self.recipe.id,
+            "filename": "photo.jpg",
+            "size": len(self.data),
+            "checksum": hashlib.sha256(self.data).hexdigest(),
+        }
+        payload.update(params)
+
+        return self.client.post(UPLOADS_URL, payload)
+
+    def send_chunk(self, upload_id, first, last):
+        end = last + 1
+        return self.client.put(
+            chunk_url(upload_id),
+            self.data[first:end],
+            content_type="application/octet-stream",
+            HTTP_CONTENT_RANGE=f"bytes {first}-{last}/{len(self.data)}",
+        )
+
+    def test_chunked_upload(self):
+        """Test uploading an image in chunks and finalizing it"""
+        upload_id = self.start_upload().data["id"]
+        middle = len(self.data) // 2
+
+        res = self.send_chunk(upload_id, 0, middle - 1)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["received"], middle)
+
+        res = self.send_chunk(upload_id, middle, len(self.data) - 1)
+        self.assertEqual(res.data["received"], len(self.data))
+
+        res = self.client.post(finalize_url(upload_id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+        with open(self.recipe.image.path, "rb") as f:
+            self.assertEqual(f.read(), self.data)
+        self.assertEqual(self.recipe.image_status, models.Recipe.ImageStatus.PENDING)
+        self.assertFalse(models.ImageUpload.objects.exists())
+
+    def test_resend_chunk(self):
+        """Test resending an already received chunk is accepted"""
+        upload_id = self.start_upload().data["id"]
+
+        self.send_chunk(upload_id, 0, 99)
+        res = self.send_chunk(upload_id, 0, 99)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["received"], 100)
+
+    def test_resend_earlier_chunk(self):
+        """Test resending an earlier chunk keeps the bytes received after it"""
+        upload_id = self.start_upload().data["id"]
+        last = len(self.data) - 1
+
+        self.send_chunk(upload_id, 0, 99)
+        self.send_chunk(upload_id, 100, last)
+        res = self.send_chunk(upload_id, 0, 99)
+
+        self.assertEqual(res.data["received"], len(self.data))
+        res = self.client.post(finalize_url(upload_id))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_chunk_gap_rejected(self):
+        """Test a chunk past the received bytes is rejected"""
+        upload_id = self.start_upload().data["id"]
+
+        res = self.send_chunk(upload_id, 100, 199)
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(res.data["received"], 0)
+
+    def test_checksum_mismatch(self):
+        """Test finalizing with a wrong checksum fails"""
+        upload_id = self.start_upload(checksum="0" * 64).data["id"]
+        self.send_chunk(upload_id, 0, len(self.data) - 1)
+
+        res = self.client.post(finalize_url(upload_id))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+
+    def test_finalize_incomplete(self):
+        """Test finalizing an incomplete upload fails"""
+        upload_id = self.start_upload().data["id"]
+        self.send_chunk(upload_id, 0, 99)
+
+        res = self.client.post(finalize_url(upload_id))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_upload_to_other_user_recipe(self):
+        """Test uploading to another user recipe is not allowed"""
+        other_user = get_user_model().objects.create_user(
+            "other@example.com", "testpass123"
+        )
+        recipe = models.Recipe.objects.create(
+            user=other_user, title="Other", time_minutes=5, price=Decimal("1.00")
+        )
+
+        res = self.start_upload(recipe=recipe.id)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_abort_upload(self):
+        """Test aborting an upload removes its partial file"""
+        upload = models.ImageUpload.objects.get(id=self.start_upload().data["id"])
+        path = uploads.partial_path(upload)
+        self.assertTrue(os.path.exists(path))
+
+        res = self.client.delete(reverse("recipe:imageupload-detail", args=[upload.id]))
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(os.path.exists(path))
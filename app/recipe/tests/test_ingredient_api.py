@@ -108,6 +108,7 @@ class PrivateIngredientAPITests(TestCase):
             user=self.user, title="Apple Pie", time_minutes=5, price=Decimal("4.5")
         )
         recipe.ingredients.add(ing_one)
+        ing_one.refresh_from_db()
 
         res = self.client.get(INGREDIENTS_URL, {"assigned_only": "1"})
 
@@ -0,0 +1,241 @@
+"""
+Query count and query plan regression tests for the hot endpoints.
+
+Query counts are pinned and must not grow with the number of rows. Plans
+are compared to the snapshots in query_plans.json, reduced to whether each
+table is read through an index. Sequential scans are disabled while
+explaining, so a table only shows up as scanned when no index applies.
+Run with UPDATE_QUERY_PLANS=1 to rewrite the snapshots after an intended
+change.
+"""
+
+import json
+import os
+import re
+from decimal import Decimal
+
+from core import models
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+PLANS_PATH = os.path.join(os.path.dirname(__file__), "query_plans.json")
+
+SCAN = re.compile(
+    r"^\s*(?:->\s*)?(Seq Scan|Index Scan|Index Only Scan|Bitmap Heap Scan)"
+    r"(?: Backward)?(?: using \S+)? on (\S+)"
+)
+
+
+def normalize_plan(lines):
+    """Reduce an EXPLAIN output to how each table is accessed"""
+    paths = set()
+    for line in lines:
+        match = SCAN.search(line)
+        if match is not None:
+            kind, table = match.groups()
+            access = "seq scan" if kind == "Seq Scan" else "index scan"
+            paths.add(f"{access} on {table}")
+
+    return sorted(paths)
+
+
+def main_query(queries, table):
+    """Return the first captured SELECT reading from a table"""
+    pattern = re.compile(rf'^SELECT .*? FROM "{table}"(?: |$)', re.DOTALL)
+    for query in queries:
+        if pattern.match(query["sql"]):
+            return query["sql"]
+
+    raise AssertionError(f"No query read from {table}")
+
+
+def explain(sql):
+    """Return the normalized plan of a statement, preferring indexes"""
+    with connection.cursor() as cursor:
+        cursor.execute("SET enable_seqscan = off")
+        try:
+            cursor.execute(f"EXPLAIN (COSTS OFF) {sql}")
+            return normalize_plan(row[0] for row in cursor.fetchall())
+        finally:
+            cursor.execute("RESET enable_seqscan")
+
+
+class QueryRegressionTests(TestCase):
+    """Pin the queries of the recipe endpoints"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("user@example.com", "pass")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tags = [
+            models.Tag.objects.create(user=self.user, name=f"Tag {i}") for i in range(3)
+        ]
+        self.ingredients = [
+            models.Ingredient.objects.create(user=self.user, name=f"Ingredient {i}")
+            for i in range(3)
+        ]
+        self.recipe = self.create_recipes(1)[0]
+
+    def create_recipes(self, count):
+        recipes = []
+        for i in range(count):
+            recipe = models.Recipe.objects.create(
+                user=self.user, title=f"Recipe {i}", time_minutes=5, price=Decimal("1")
+            )
+            recipe.tags.set(self.tags[:2])
+            recipe.ingredients.set(self.ingredients[:2])
+            recipes.append(recipe)
+
+        return recipes
+
+    def get(self, url, params=None):
+        """Request a URL and return the SQL statements it ran"""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(url, params)
+
+        self.assertEqual(res.status_code, 200)
+        return [query["sql"] for query in queries]
+
+    def assert_constant_queries(self, expected, url, params=None):
+        """Check the query count is pinned and independent of the rows"""
+        small = self.get(url, params)
+        self.create_recipes(10)
+        large = self.get(url, params)
+
+        self.assertEqual(len(small), expected, "\n".join(small))
+        self.assertEqual(len(large), expected, "\n".join(large))
+
+        return large
+
+    def test_recipe_list(self):
+        """Test listing recipes runs a fixed number of queries"""
+        self.assert_constant_queries(3, reverse("recipe:recipe-list"))
+
+    def test_recipe_list_filtered(self):
+        """Test filtering recipes by tags and ingredients adds no queries"""
+        params = {
+            "tags": ",".join(str(tag.id) for tag in self.tags),
+            "ingredients": ",".join(str(i.id) for i in self.ingredients),
+        }
+
+        self.assert_constant_queries(3, reverse("recipe:recipe-list"), params)
+
+    def test_recipe_detail(self):
+        """Test retrieving a recipe runs a fixed number of queries"""
+        url = reverse("recipe:recipe-detail", args=[self.recipe.id])
+
+        self.assert_constant_queries(3, url)
+
+    def test_tag_list(self):
+        """Test listing assigned tags runs one query"""
+        self.assert_constant_queries(
+            1, reverse("recipe:tag-list"), {"assigned_only": 1}
+        )
+
+    def test_ingredient_list(self):
+        """Test listing assigned ingredients runs one query"""
+        url = reverse("recipe:ingredient-list")
+
+        self.assert_constant_queries(1, url, {"assigned_only": 1})
+
+    def test_tag_list_by_popularity(self):
+        """Test ordering tags by recipe count runs one query"""
+        url = reverse("recipe:tag-list")
+
+        self.assert_constant_queries(1, url, {"ordering": "-recipe_count"})
+
+    def test_recipe_create(self):
+        """Test creating a recipe with known names runs a fixed number of queries"""
+        payload = {
+            "title": "Soup",
+            "time_minutes": 5,
+            "price": "1.00",
+            "tags": [{"name": tag.name} for tag in self.tags[:2]],
+            "ingredients": [{"name": i.name} for i in self.ingredients[:2]],
+        }
+        url = reverse("recipe:recipe-list")
+        self.client.post(url, payload, format="json")
+        self.create_recipes(10)
+
+        with self.assertNumQueries(27):
+            res = self.client.post(url, payload, format="json")
+
+        self.assertEqual(res.status_code, 201)
+
+    def test_recipe_update(self):
+        """Test updating a recipe and its tags runs a fixed number of queries"""
+        url = reverse("recipe:recipe-detail", args=[self.recipe.id])
+        payload = {"title": "Stew", "tags": [{"name": self.tags[2].name}]}
+        self.client.patch(url, payload, format="json")
+        self.create_recipes(10)
+
+        with self.assertNumQueries(29):
+            res = self.client.patch(url, {**payload, "price": "2.00"}, format="json")
+
+        self.assertEqual(res.status_code, 200)
+
+    def test_recipe_stats(self):
+        """Test the recipe statistics run a fixed number of queries"""
+        self.assert_constant_queries(3, reverse("recipe:stats"))
+
+
+class QueryPlanTests(TestCase):
+    """Compare the plans of the main queries with their snapshots"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("user@example.com", "pass")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        tag = models.Tag.objects.create(user=self.user, name="Vegan")
+        ingredient = models.Ingredient.objects.create(user=self.user, name="Salt")
+        recipe = models.Recipe.objects.create(
+            user=self.user, title="Soup", time_minutes=5, price=Decimal("1")
+        )
+        recipe.tags.add(tag)
+        recipe.ingredients.add(ingredient)
+
+        # The URL, query parameters and table of the main query by name.
+        recipes, tags = reverse("recipe:recipe-list"), reverse("recipe:tag-list")
+        self.queries = {
+            "recipe-list": (recipes, {}, "core_recipe"),
+            "recipe-filter": (
+                recipes,
+                {"tags": tag.id, "ingredients": ingredient.id},
+                "core_recipe",
+            ),
+            "recipe-detail": (
+                reverse("recipe:recipe-detail", args=[recipe.id]),
+                {},
+                "core_recipe",
+            ),
+            "tag-assigned": (tags, {"assigned_only": 1}, "core_tag"),
+            "ingredient-assigned": (
+                reverse("recipe:ingredient-list"),
+                {"assigned_only": 1},
+                "core_ingredient",
+            ),
+            "tag-popular": (tags, {"ordering": "-recipe_count"}, "core_tag"),
+        }
+
+    def test_query_plans(self):
+        """Test the main query of each endpoint keeps its access paths"""
+        plans = {}
+        for name, (url, params, table) in self.queries.items():
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(url, params)
+            plans[name] = explain(main_query(queries, table))
+
+        if os.environ.get("UPDATE_QUERY_PLANS"):
+            with open(PLANS_PATH, "w") as f:
+                json.dump(plans, f, indent=2, sort_keys=True)
+                f.write("\n")
+
+        with open(PLANS_PATH) as f:
+            snapshots = json.load(f)
+
+        for name, plan in plans.items():
+            self.assertEqual(plan, snapshots.get(name), f"Query plan of {name}")
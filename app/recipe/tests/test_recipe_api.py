@@ -9,7 +9,8 @@ from decimal import Decimal
 
 from core import models
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.files import File
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from PIL import Image
 from recipe.serializers import RecipeDetailSerializer, RecipeSerializer
@@ -24,6 +25,11 @@ def image_upload_url(recipe_id):
     return reverse("recipe:recipe-upload-image", args=[recipe_id])
 
 
+def image_url(recipe_id):
+    """Create and return a recipe image url"""
+    return reverse("recipe:recipe-image", args=[recipe_id])
+
+
 def create_recipe(user, **params):
     """Create and return a sample recipe."""
     defaults = {
@@ -486,6 +492,22 @@ class ImageUploadAPITests(TestCase):
         self.assertIn("image", res.data)
         self.assertTrue(os.path.exists(self.recipe.image.path))
 
+    def test_upload_image_queues_processing(self):
+        """Test uploading an image queues rendering its variants"""
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix=".jpg") as image_file:
+            img = Image.new("RGB", (10, 10))
+            img.save(image_file, format="JPEG")
+            image_file.seek(0)
+            res = self.client.post(url, {"image": image_file}, format="multipart")
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(res.data["image_status"], "pending")
+        self.assertEqual(self.recipe.image_status, models.Recipe.ImageStatus.PENDING)
+        job = models.Job.objects.get(kind="process_recipe_image")
+        self.assertEqual(job.payload["recipe_id"], self.recipe.id)
+        self.assertEqual(job.payload["image_name"], self.recipe.image.name)
+
     def test_upload_image_bad_request(self):
         """Test uploading invalid image"""
         url = image_upload_url(self.recipe.id)
@@ -493,3 +515,80 @@ class ImageUploadAPITests(TestCase):
         res = self.client.post(url, payload, format="multipart")
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RecipeImageDeliveryTests(TestCase):
+    """Tests delivering recipe images through the proxy."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "user@example.com", "testpass123"
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = create_recipe(user=self.user)
+
+        with tempfile.NamedTemporaryFile(suffix=".jpg") as image_file:
+            Image.new("RGB", (10, 10)).save(image_file, format="JPEG")
+            image_file.seek(0)
+            self.recipe.image.save("sample.jpg", File(image_file))
+
+    def tearDown(self):
+        self.recipe.image.delete()
+
+    def test_image_handed_to_proxy(self):
+        """Test the image is sent with X-Accel-Redirect"""
+        res = self.client.get(image_url(self.recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res["X-Accel-Redirect"], f"/protected-media/{self.recipe.image.name}"
+        )
+        self.assertEqual(res["Content-Type"], "image/jpeg")
+        self.assertIn("private", res["Cache-Control"])
+        self.assertEqual(res.content, b"")
+
+    def test_image_not_modified(self):
+        """Test a matching ETag returns not modified"""
+        etag = self.client.get(image_url(self.recipe.id))["ETag"]
+
+        res = self.client.get(image_url(self.recipe.id), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertNotIn("X-Accel-Redirect", res)
+
+    def test_image_variant(self):
+        """Test delivering an image variant"""
+        self.recipe.image_variants = {"thumbnail": "uploads/recipe/variants/t.jpg"}
+        self.recipe.save()
+
+        res = self.client.get(image_url(self.recipe.id), {"variant": "thumbnail"})
+
+        self.assertEqual(
+            res["X-Accel-Redirect"], "/protected-media/uploads/recipe/variants/t.jpg"
+        )
+
+    def test_unknown_variant(self):
+        """Test an unknown variant is not found"""
+        res = self.client.get(image_url(self.recipe.id), {"variant": "huge"})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_other_user_image(self):
+        """Test other users cannot fetch the image"""
+        other_user = create_user(email="other@example.com", password="pass123")
+        self.client.force_authenticate(other_user)
+
+        res = self.client.get(image_url(self.recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertNotIn("X-Accel-Redirect", res)
+
+    @override_settings(MEDIA_X_ACCEL_REDIRECT=False)
+    def test_image_served_without_proxy(self):
+        """Test the image is streamed when not behind the proxy"""
+        res = self.client.get(image_url(self.recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        with open(self.recipe.image.path, "rb") as f:
+            self.assertEqual(b"".join(res.streaming_content), f.read())
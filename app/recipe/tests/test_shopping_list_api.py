@@ -0,0 +1,112 @@
+"""
+Tests for the shopping list API.
+"""
+
+from decimal import Decimal
+
+from core import models
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+SHOPPING_LIST_URL = reverse("recipe:shopping-list")
+
+
+def create_user(email="user@example.com", password="testpass123"):
+    """Create and return user"""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def create_recipe(user, ingredients=(), **params):
+    """Create and return a sample recipe with ingredients"""
+    defaults = {"title": "Sample recipe", "time_minutes": 10, "price": Decimal("5.00")}
+    defaults.update(params)
+    recipe = models.Recipe.objects.create(user=user, **defaults)
+    recipe.ingredients.set(
+        models.Ingredient.objects.get_or_create(user=user, name=name)[0]
+        for name in ingredients
+    )
+
+    return recipe
+
+
+class PublicShoppingListApiTests(TestCase):
+    """Test unauthenticated API requests."""
+
+    def test_auth_required(self):
+        res = APIClient().post(SHOPPING_LIST_URL, {"recipes": [1]}, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateShoppingListApiTests(TestCase):
+    """Test authenticated API requests."""
+
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.curry = create_recipe(
+            self.user,
+            ["Rice", "Chicken", "Curry paste"],
+            time_minutes=30,
+            price=Decimal("7.10"),
+        )
+        self.stew = create_recipe(
+            self.user, ["Beef", "Rice"], time_minutes=90, price=Decimal("12.35")
+        )
+
+    def post(self, recipes):
+        return self.client.post(SHOPPING_LIST_URL, {"recipes": recipes}, format="json")
+
+    def test_shopping_list(self):
+        """Test ingredients are aggregated over recipes and repetitions"""
+        res = self.post([self.curry.id, self.stew.id, self.curry.id])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["recipe_count"], 3)
+        self.assertEqual(res.data["total_price"], "26.55")
+        self.assertEqual(res.data["total_time_minutes"], 150)
+        self.assertEqual(
+            [(item["name"], item["count"]) for item in res.data["ingredients"]],
+            [("Rice", 3), ("Chicken", 2), ("Curry paste", 2), ("Beef", 1)],
+        )
+        rice = res.data["ingredients"][0]
+        self.assertEqual(rice["recipes"], sorted([self.curry.id, self.stew.id]))
+
+    def test_price_summed_exactly(self):
+        """Test prices that do not add up in binary floating point"""
+        recipes = [create_recipe(self.user, price=Decimal("0.10")).id for _ in range(3)]
+
+        res = self.post(recipes)
+
+        self.assertEqual(res.data["total_price"], "0.30")
+        self.assertEqual(res.data["ingredients"], [])
+
+    def test_query_count(self):
+        """Test the list takes a fixed number of queries"""
+        recipes = [
+            create_recipe(self.user, [f"Ingredient {i}", "Salt"]).id for i in range(20)
+        ]
+
+        with self.assertNumQueries(2):
+            res = self.post(recipes)
+
+        self.assertEqual(len(res.data["ingredients"]), 21)
+
+    def test_other_users_recipes_rejected(self):
+        other = create_recipe(create_user(email="other@example.com"), ["Tofu"])
+
+        res = self.post([self.curry.id, other.id, 999999])
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn(str(other.id), res.data["recipes"][0])
+        self.assertIn("999999", res.data["recipes"][0])
+
+    def test_invalid_payload(self):
+        for recipes in ([], ["curry"], [0]):
+            res = self.post(recipes)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
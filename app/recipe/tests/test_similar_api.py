@@ -0,0 +1,155 @@
+"""
+Tests for the similar recipes API.
+"""
+
+import io
+from decimal import Decimal
+
+import numpy as np
+from core import models, similarity
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+
+def similar_url(recipe_id):
+    """Create and return the similar recipes url of a recipe"""
+    return reverse("recipe:recipe-similar", args=[recipe_id])
+
+
+def create_user(email="user@example.com", password="testpass123"):
+    """Create and return user"""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+class MinHashTests(SimpleTestCase):
+    """Test the signatures"""
+
+    def test_estimates_jaccard_similarity(self):
+        """Test equal signature positions approximate the Jaccard similarity"""
+        base = {f"i:ingredient {i}" for i in range(30)}
+        other = set(list(base)[:20]) | {f"i:other {i}" for i in range(10)}
+        matrix = similarity.signatures([sorted(base), sorted(other), []])
+
+        estimate = similarity.similarities(matrix[0], matrix[1:2])[0]
+
+        self.assertAlmostEqual(estimate, 0.5, delta=0.15)
+        self.assertEqual(matrix.dtype, np.dtype("<u4"))
+        self.assertTrue((matrix[2] == np.iinfo(np.uint32).max).all())
+
+    def test_buckets_depend_on_user(self):
+        matrix = similarity.signatures([["t:soup"], ["t:soup"]])
+
+        keys = similarity.buckets(matrix, [1, 2])
+
+        self.assertEqual(keys.shape, (2, similarity.BANDS))
+        self.assertFalse(set(keys[0]) & set(keys[1]))
+
+
+class PrivateSimilarApiTests(TestCase):
+    """Test authenticated API requests."""
+
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.ingredients = [
+            models.Ingredient.objects.create(user=self.user, name=f"Ingredient {i}")
+            for i in range(12)
+        ]
+
+    def create_recipe(self, ingredients, user=None):
+        recipe = models.Recipe.objects.create(
+            user=user or self.user, title="Recipe", time_minutes=5, price=Decimal(1)
+        )
+        recipe.ingredients.add(*ingredients)
+
+        return recipe
+
+    def test_similar_recipes(self):
+        """Test near-duplicates are returned by similarity, others are not"""
+        recipe = self.create_recipe(self.ingredients[:8])
+        close = self.create_recipe(self.ingredients[:6])
+        closer = self.create_recipe(self.ingredients[:8] + self.ingredients[8:9])
+        self.create_recipe(self.ingredients[8:])
+
+        res = self.client.get(similar_url(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r["id"] for r in res.data], [closer.id, close.id])
+        self.assertGreater(res.data[0]["similarity"], 0.7)
+
+    def test_index_follows_relation_changes(self):
+        """Test changing the ingredients of a recipe reindexes it"""
+        recipe = self.create_recipe(self.ingredients[:6])
+        other = self.create_recipe(self.ingredients[6:])
+        self.assertEqual(similarity.similar(recipe), [])
+
+        other.ingredients.set(self.ingredients[:6])
+        self.assertEqual(similarity.similar(recipe), [(other.id, 1.0)])
+
+        self.ingredients[0].name = "Renamed"
+        self.ingredients[0].save()
+        self.ingredients[1].delete()
+        recipe.refresh_from_db()
+        self.assertEqual(similarity.similar(recipe), [(other.id, 1.0)])
+
+        other.ingredients.clear()
+        self.assertEqual(similarity.similar(recipe), [])
+        self.assertFalse(models.RecipeSignature.objects.filter(recipe=other).exists())
+
+    def test_similar_limited_to_user(self):
+        other_user = create_user(email="other@example.com")
+        recipe = self.create_recipe(self.ingredients[:6])
+        foreign = [
+            models.Ingredient.objects.create(user=other_user, name=i.name)
+            for i in self.ingredients[:6]
+        ]
+        self.create_recipe(foreign, user=other_user)
+
+        res = self.client.get(similar_url(recipe.id))
+
+        self.assertEqual(res.data, [])
+
+    def test_invalid_limit(self):
+        """Test limits that are not positive integers are rejected"""
+        recipe = self.create_recipe(self.ingredients[:6])
+
+        for limit in ["many", "0", "-1"]:
+            res = self.client.get(similar_url(recipe.id), {"limit": limit})
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST, limit)
+
+    def test_rebuild_command(self):
+        """Test the rebuild command recreates the maintained signatures"""
+        for i in range(4):
+            self.create_recipe(self.ingredients[i:][:6])
+        expected = sorted(
+            (s.recipe_id, bytes(s.minhash), s.buckets)
+            for s in models.RecipeSignature.objects.all()
+        )
+
+        models.RecipeSignature.objects.all().delete()
+        out = io.StringIO()
+        call_command("rebuild_similarity_index", "--batch-size=3", stdout=out)
+
+        rebuilt = sorted(
+            (s.recipe_id, bytes(s.minhash), s.buckets)
+            for s in models.RecipeSignature.objects.all()
+        )
+        self.assertEqual(rebuilt, expected)
+        self.assertIn("Indexed 4 recipe(s)", out.getvalue())
+
+    def test_rebuild_missing(self):
+        """Test the rebuild command indexes only the recipes not indexed yet"""
+        recipes = [self.create_recipe(self.ingredients[i:][:6]) for i in range(3)]
+        models.RecipeSignature.objects.filter(recipe=recipes[1]).delete()
+        out = io.StringIO()
+
+        call_command("rebuild_similarity_index", "--missing", stdout=out)
+
+        self.assertEqual(models.RecipeSignature.objects.count(), 3)
+        self.assertIn("Indexed 1 recipe(s)", out.getvalue())
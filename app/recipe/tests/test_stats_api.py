@@ -0,0 +1,203 @@
+"""
+Tests for the recipe statistics API.
+"""
+
+import io
+from decimal import Decimal
+
+from core import models
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+STATS_URL = reverse("recipe:stats")
+RECIPES_URL = reverse("recipe:recipe-list")
+
+
+def detail_url(recipe_id):
+    """Create and return detail url for recipe."""
+    return reverse("recipe:recipe-detail", args=[recipe_id])
+
+
+def create_user(email="user@example.com", password="testpass123"):
+    """Create and return user"""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def create_recipe(user, **params):
+    """Create and return a sample recipe."""
+    defaults = {"title": "Sample recipe", "time_minutes": 10, "price": Decimal("5.00")}
+    defaults.update(params)
+
+    return models.Recipe.objects.create(user=user, **defaults)
+
+
+def stored_stats(user):
+    """Return the comparable fields of the statistics row of a user"""
+    stats = models.RecipeStats.objects.get(user=user)
+
+    return stats.recipe_count, stats.total_time_minutes, stats.total_price
+
+
+def recipe_counts(user):
+    """Return the recipe counts of the tags and ingredients of a user"""
+    return [
+        dict(model.objects.filter(user=user).values_list("name", "recipe_count"))
+        for model in (models.Tag, models.Ingredient)
+    ]
+
+
+class PublicStatsApiTests(TestCase):
+    """Test unauthenticated API requests."""
+
+    def test_auth_required(self):
+        res = APIClient().get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateStatsApiTests(TestCase):
+    """Test authenticated API requests."""
+
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_empty_stats(self):
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["recipe_count"], 0)
+        self.assertIsNone(res.data["average_price"])
+        self.assertEqual(res.data["top_tags"], [])
+
+    def test_stats_follow_api_changes(self):
+        """Test creating, updating and deleting recipes updates the stats"""
+        first = self.client.post(
+            RECIPES_URL,
+            {
+                "title": "Curry",
+                "time_minutes": 30,
+                "price": "10.00",
+                "tags": [{"name": "Dinner"}, {"name": "Spicy"}],
+                "ingredients": [{"name": "Rice"}],
+            },
+            format="json",
+        )
+        second = self.client.post(
+            RECIPES_URL,
+            {
+                "title": "Soup",
+                "time_minutes": 10,
+                "price": "5.00",
+                "tags": [{"name": "Dinner"}],
+                "ingredients": [{"name": "Rice"}, {"name": "Leek"}],
+            },
+            format="json",
+        )
+        dinner = models.Tag.objects.get(user=self.user, name="Dinner")
+
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.data["recipe_count"], 2)
+        self.assertEqual(res.data["average_time_minutes"], 20)
+        self.assertEqual(res.data["average_price"], "7.50")
+        self.assertEqual(
+            res.data["top_tags"][0],
+            {"id": dinner.id, "name": "Dinner", "recipe_count": 2},
+        )
+        self.assertEqual(res.data["top_ingredients"][0]["name"], "Rice")
+
+        self.client.patch(
+            detail_url(second.data["id"]),
+            {"time_minutes": 50, "tags": [{"name": "Quick"}]},
+            format="json",
+        )
+        self.client.delete(detail_url(first.data["id"]))
+
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.data["recipe_count"], 1)
+        self.assertEqual(res.data["average_time_minutes"], 50)
+        self.assertEqual(res.data["average_price"], "5.00")
+        self.assertEqual([t["name"] for t in res.data["top_tags"]], ["Quick"])
+        self.assertEqual(
+            sorted(i["name"] for i in res.data["top_ingredients"]), ["Leek", "Rice"]
+        )
+
+    def test_stats_limited_to_user(self):
+        create_recipe(create_user(email="other@example.com"))
+        create_recipe(self.user, price=Decimal("3.00"))
+
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.data["recipe_count"], 1)
+        self.assertEqual(res.data["average_price"], "3.00")
+
+    def test_reverse_assignment_counts_recipes(self):
+        """Test assigning a tag to recipes from the tag side counts them"""
+        recipes = [create_recipe(self.user), create_recipe(self.user)]
+        tag = models.Tag.objects.create(user=self.user, name="Vegan")
+
+        tag.recipe_set.add(*recipes)
+        tag.refresh_from_db()
+        self.assertEqual(tag.recipe_count, 2)
+
+        tag.recipe_set.clear()
+        tag.refresh_from_db()
+        self.assertEqual(tag.recipe_count, 0)
+
+    def test_recipe_delete_decrements_counts(self):
+        recipe = create_recipe(self.user)
+        recipe.tags.add(models.Tag.objects.create(user=self.user, name="Vegan"))
+        recipe.ingredients.add(
+            models.Ingredient.objects.create(user=self.user, name="Salt")
+        )
+
+        recipe.delete()
+
+        self.assertEqual(recipe_counts(self.user), [{"Vegan": 0}, {"Salt": 0}])
+
+    def test_saving_other_fields_skips_totals(self):
+        """Test saves leaving out time and price do not read the totals"""
+        recipe = create_recipe(self.user)
+        recipe.image_status = models.Recipe.ImageStatus.READY
+
+        # The recipe update and its change record.
+        with self.assertNumQueries(2):
+            recipe.save(update_fields=["image_status"])
+
+        self.assertEqual(stored_stats(self.user), (1, 10, Decimal("5.00")))
+
+    def test_user_delete_removes_stats(self):
+        create_recipe(self.user)
+
+        self.user.delete()
+
+        self.assertFalse(models.RecipeStats.objects.exists())
+
+    def test_rebuild_matches_incremental_stats(self):
+        """Test the rebuild command recomputes the maintained statistics"""
+        tags = [models.Tag.objects.create(user=self.user, name=n) for n in "ABC"]
+        ingredient = models.Ingredient.objects.create(user=self.user, name="Salt")
+        for i in range(5):
+            recipe = create_recipe(
+                self.user, time_minutes=i + 1, price=Decimal(i) + Decimal("0.25")
+            )
+            recipe.tags.add(*tags[: i % 3 + 1])
+            recipe.ingredients.add(ingredient)
+        recipe.tags.remove(tags[0])
+        expected = stored_stats(self.user), recipe_counts(self.user)
+
+        models.RecipeStats.objects.all().delete()
+        models.Tag.objects.update(recipe_count=7)
+        out = io.StringIO()
+        call_command("rebuild_recipe_stats", stdout=out)
+
+        self.assertEqual((stored_stats(self.user), recipe_counts(self.user)), expected)
+        self.assertEqual(expected[1][0], {"A": 4, "B": 3, "C": 1})
+        self.assertIn("3 tag(s) and 0 ingredient(s)", out.getvalue())
@@ -0,0 +1,179 @@
+"""
+Tests for the sync API.
+"""
+
+from decimal import Decimal
+
+from core import models, sync
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+SYNC_URL = reverse("recipe:sync")
+RECIPES_URL = reverse("recipe:recipe-list")
+
+
+def detail_url(recipe_id):
+    """Create and return detail url for recipe."""
+    return reverse("recipe:recipe-detail", args=[recipe_id])
+
+
+def create_user(email="user@example.com", password="testpass123"):
+    """Create and return user"""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def create_recipe(user, **params):
+    """Create and return a sample recipe."""
+    defaults = {"title": "Sample recipe", "time_minutes": 10, "price": Decimal("5.00")}
+    defaults.update(params)
+
+    return models.Recipe.objects.create(user=user, **defaults)
+
+
+class PublicSyncApiTests(TestCase):
+    """Test unauthenticated API requests."""
+
+    def test_auth_required(self):
+        res = APIClient().get(SYNC_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateSyncApiTests(TestCase):
+    """Test authenticated API requests."""
+
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        payload = {
+            "title": "Thai curry",
+            "time_minutes": 30,
+            "price": "8.50",
+            "tags": [{"name": "Dinner"}],
+            "ingredients": [{"name": "Rice"}, {"name": "Coconut milk"}],
+        }
+        self.recipe = models.Recipe.objects.get(
+            id=self.client.post(RECIPES_URL, payload, format="json").data["id"]
+        )
+
+    def sync(self, since=None, **params):
+        if since is not None:
+            params["since"] = since
+        res = self.client.get(SYNC_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK, res.data)
+
+        return res.data
+
+    def test_full_sync(self):
+        """Test syncing from scratch returns every object"""
+        data = self.sync()
+
+        self.assertFalse(data["more"])
+        self.assertEqual(data["cursor"], sync.current(self.user))
+        self.assertEqual([r["title"] for r in data["recipes"]], ["Thai curry"])
+        self.assertEqual(
+            data["recipes"][0]["tags"], [tag.id for tag in self.recipe.tags.all()]
+        )
+        self.assertEqual([tag["name"] for tag in data["tags"]], ["Dinner"])
+        self.assertEqual(len(data["ingredients"]), 2)
+
+    def test_incremental_sync(self):
+        """Test only the objects changed since the cursor are returned"""
+        cursor = self.sync()["cursor"]
+        self.assertEqual(self.sync(cursor)["recipes"], [])
+
+        self.client.patch(detail_url(self.recipe.id), {"title": "Green curry"})
+        data = self.sync(cursor)
+
+        self.assertEqual([r["title"] for r in data["recipes"]], ["Green curry"])
+        self.assertEqual(data["tags"], [])
+        self.assertEqual(data["ingredients"], [])
+        self.assertGreater(data["cursor"], cursor)
+
+    def test_rename_changes_recipes(self):
+        """Test renaming a tag returns the recipes using it"""
+        cursor = self.sync()["cursor"]
+        tag = self.recipe.tags.get()
+
+        self.client.patch(
+            reverse("recipe:tag-detail", args=[tag.id]), {"name": "Supper"}
+        )
+        data = self.sync(cursor)
+
+        self.assertEqual([t["name"] for t in data["tags"]], ["Supper"])
+        self.assertEqual([r["id"] for r in data["recipes"]], [self.recipe.id])
+
+    def test_deletes_are_tombstones(self):
+        cursor = self.sync()["cursor"]
+        tag = self.recipe.tags.get()
+        other = create_recipe(self.user)
+        other_id = other.id
+
+        self.client.delete(reverse("recipe:tag-detail", args=[tag.id]))
+        other.delete()
+        data = self.sync(cursor)
+
+        self.assertEqual(data["deleted"]["tags"], [tag.id])
+        self.assertEqual(data["deleted"]["recipes"], [other_id])
+        self.assertEqual([r["id"] for r in data["recipes"]], [self.recipe.id])
+        self.assertEqual(data["recipes"][0]["tags"], [])
+
+    def test_paginated_sync(self):
+        """Test following the cursor returns each change once"""
+        for i in range(4):
+            create_recipe(self.user, title=f"Recipe {i}")
+
+        seen, cursor, more = [], 0, True
+        while more:
+            data = self.sync(cursor, limit=3)
+            seen.extend(r["id"] for r in data["recipes"])
+            cursor, more = data["cursor"], data["more"]
+
+        self.assertEqual(
+            sorted(seen), sorted(r.id for r in models.Recipe.objects.all())
+        )
+
+    def test_sync_limited_to_user(self):
+        other = create_user(email="other@example.com")
+        create_recipe(other, title="Other recipe")
+
+        data = self.sync()
+
+        self.assertEqual([r["title"] for r in data["recipes"]], ["Thai curry"])
+        self.assertEqual(sync.current(other), 1)
+
+    def test_invalid_cursor(self):
+        for since in ("abc", -1, sync.current(self.user) + 1):
+            res = self.client.get(SYNC_URL, {"since": since})
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_query_count(self):
+        """Test the sync takes a fixed number of queries"""
+        for i in range(10):
+            create_recipe(self.user).tags.create(user=self.user, name=f"Tag {i}")
+
+        with self.assertNumQueries(7):
+            self.sync()
+
+    def test_delete_user(self):
+        """Test changes recorded by deletes cascading from a user are dropped"""
+        self.user.delete()
+
+        self.assertFalse(models.Change.objects.exists())
+        self.assertFalse(models.ChangeSequence.objects.exists())
+
+    def test_backfill(self):
+        """Test objects written without signals get changes after the last"""
+        last = sync.current(self.user)
+        models.Change.objects.filter(kind=models.Change.Kind.RECIPE).delete()
+
+        self.assertEqual(sync.backfill(), 1)
+
+        change = models.Change.objects.get(kind=models.Change.Kind.RECIPE)
+        self.assertEqual(change.sequence, last + 1)
+        self.assertEqual(sync.current(self.user), last + 1)
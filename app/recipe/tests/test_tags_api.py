@@ -106,6 +106,7 @@ class PrivateTagAPITests(TestCase):
         )
 
         recipe.tags.add(tag_one)
+        tag_one.refresh_from_db()
 
         res = self.client.get(TAGS_URL, {"assigned_only": "1"})
 
@@ -135,3 +136,23 @@ class PrivateTagAPITests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(len(res.data), 1)
+
+    def test_order_tags_by_recipe_count(self):
+        """Test sorting tags by the number of recipes using them"""
+        tags = [
+            models.Tag.objects.create(user=self.user, name=name)
+            for name in ["Rare", "Popular", "Common"]
+        ]
+        for i in range(3):
+            recipe = models.Recipe.objects.create(
+                user=self.user, title=f"Recipe {i}", time_minutes=5, price=Decimal(1)
+            )
+            recipe.tags.add(*tags[1:][: i + 1])
+
+        res = self.client.get(TAGS_URL, {"ordering": "-recipe_count"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(tag["name"], tag["recipe_count"]) for tag in res.data],
+            [("Popular", 3), ("Common", 2), ("Rare", 0)],
+        )
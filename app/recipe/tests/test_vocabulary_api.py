@@ -0,0 +1,158 @@
+"""
+Tests for resolving tag and ingredient names on recipe writes.
+"""
+
+from decimal import Decimal
+
+from core import models, vocabulary
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+RECIPES_URL = reverse("recipe:recipe-list")
+TAG_BULK_UPDATE_URL = reverse("recipe:tag-bulk-update")
+
+
+def create_user(email="user@example.com", password="testpass123"):
+    """Create and return user"""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def recipe_payload(title, tags=(), ingredients=()):
+    return {
+        "title": title,
+        "time_minutes": 5,
+        "price": Decimal("2.50"),
+        "tags": [{"name": name} for name in tags],
+        "ingredients": [{"name": name} for name in ingredients],
+    }
+
+
+class VocabularyApiTests(TestCase):
+    """Test authenticated API requests."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_recipe(self, title, tags=(), ingredients=()):
+        res = self.client.post(
+            RECIPES_URL, recipe_payload(title, tags, ingredients), format="json"
+        )
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        return models.Recipe.objects.get(id=res.data["id"])
+
+    def test_known_names_resolved_without_queries(self):
+        models.Tag.objects.create(user=self.user, name="Vegan")
+        vocabulary.resolve(models.Tag, self.user.id, ["Vegan", "Quick"])
+
+        with self.assertNumQueries(0):
+            ids = vocabulary.resolve(models.Tag, self.user.id, ["Quick", "Vegan"])
+
+        self.assertEqual(
+            ids, dict(models.Tag.objects.values_list("name", "id").order_by("-name"))
+        )
+
+    def test_names_unique_per_user(self):
+        """Test repeated and existing names reuse one tag"""
+        other = create_user(email="other@example.com")
+        models.Tag.objects.create(user=other, name="Vegan")
+        first = self.create_recipe("Curry", tags=["Vegan", "Vegan"])
+        second = self.create_recipe("Stew", tags=["Vegan"], ingredients=["Rice"])
+
+        tag = models.Tag.objects.get(user=self.user)
+        self.assertEqual(list(first.tags.all()), [tag])
+        self.assertEqual(list(second.tags.all()), [tag])
+        self.assertEqual(tag.recipe_count, 2)
+        self.assertEqual(second.ingredients.get().name, "Rice")
+
+    def test_existing_name_not_inserted_twice(self):
+        """Test names inserted concurrently resolve to the existing row"""
+        tag = models.Tag.objects.create(user=self.user, name="Vegan")
+
+        ids = vocabulary.create(models.Tag, self.user.id, ["Vegan", "Quick"])
+
+        self.assertEqual(ids["Vegan"], tag.id)
+        self.assertEqual(models.Tag.objects.count(), 2)
+
+    def test_created_names_recorded(self):
+        """Test tags created by a recipe write reach the sync change log"""
+        recipe = self.create_recipe("Curry", tags=["Vegan"])
+
+        tag = recipe.tags.get()
+        self.assertTrue(
+            models.Change.objects.filter(kind="tag", object_id=tag.id).exists()
+        )
+
+    def test_stale_entries_not_linked(self):
+        """Test ids renamed or deleted behind the cache are resolved again"""
+        renamed = models.Tag.objects.create(user=self.user, name="Vegan")
+        vocabulary.resolve(models.Tag, self.user.id, ["Vegan"])
+        # Changed without signals, as by another process.
+        models.Tag.objects.filter(id=renamed.id).update(name="Plant based")
+        cache.set(
+            vocabulary.key(models.Tag, self.user.id), {"Vegan": renamed.id, "Gone": 0}
+        )
+
+        recipe = self.create_recipe("Curry", tags=["Vegan", "Gone"])
+
+        self.assertEqual(
+            set(recipe.tags.values_list("name", flat=True)), {"Vegan", "Gone"}
+        )
+        self.assertFalse(renamed.recipe_set.exists())
+
+    def test_write_maintains_indexes_once(self):
+        """Test a recipe write indexes and records the recipe once"""
+        self.create_recipe("Curry", tags=["Vegan", "Quick"], ingredients=["Rice"])
+        sequence = models.ChangeSequence.objects.get(user=self.user)
+
+        payload = recipe_payload("Stew", ["Vegan", "Quick"], ["Rice", "Salt"])
+
+        with self.assertNumQueries(30):
+            res = self.client.post(RECIPES_URL, payload, format="json")
+
+        recipe = models.Recipe.objects.get(id=res.data["id"])
+        sequence.refresh_from_db()
+        # The new ingredient and the recipe.
+        self.assertEqual(sequence.value, 6)
+        self.assertTrue(models.RecipeSignature.objects.filter(recipe=recipe).exists())
+        self.assertEqual(
+            models.RecipeFingerprint.objects.get(recipe=recipe).user_id, self.user.id
+        )
+
+    def test_renamed_names_forgotten(self):
+        tag = models.Tag.objects.create(user=self.user, name="Vegan")
+        vocabulary.resolve(models.Tag, self.user.id, ["Vegan"])
+
+        res = self.client.patch(
+            reverse("recipe:tag-detail", args=[tag.id]), {"name": "Plant based"}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIsNone(cache.get(vocabulary.key(models.Tag, self.user.id)))
+
+    def test_rename_to_used_name(self):
+        vegan = models.Tag.objects.create(user=self.user, name="Vegan")
+        quick = models.Tag.objects.create(user=self.user, name="Quick")
+
+        res = self.client.patch(
+            reverse("recipe:tag-detail", args=[quick.id]), {"name": "Vegan"}
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.post(
+            TAG_BULK_UPDATE_URL,
+            {"names": {str(vegan.id): "Quick", str(quick.id): "Vegan"}},
+            format="json",
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("Quick", res.data["names"][0])
+        self.assertEqual(
+            set(models.Tag.objects.values_list("name", flat=True)), {"Vegan", "Quick"}
+        )
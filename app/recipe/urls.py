@@ -11,7 +11,16 @@ router = DefaultRouter()
 router.register("recipes", views.RecipeViewSets)
 router.register("tags", views.TagViewSets)
 router.register("ingridients", views.IngredientViewSets)
+router.register("uploads", views.ImageUploadViewSets)
 
 app_name = "recipe"
 
-urlpatterns = [path("", include(router.urls))]
+urlpatterns = [
+    path("stats/", views.RecipeStatsView.as_view(), name="stats"),
+    path(
+        "shopping-list/", views.ShoppingListView.as_view(), name="shopping-list"
+    ),
+    path("cost/", views.RecipeCostView.as_view(), name="cost"),
+    path("sync/", views.SyncView.as_view(), name="sync"),
+    path("", include(router.urls)),
+]
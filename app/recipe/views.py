@@ -2,23 +2,60 @@
 Views for Recipe API.
 """
 
-from core import models
+from core import (
+    bulk,
+    images,
+    media,
+    models,
+    shopping,
+    similarity,
+    sync,
+    uploads,
+)
+from core.authentication import BatchAuthentication
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef
+from django.http import Http404
+from django.shortcuts import get_object_or_404
 from drf_spectacular.utils import (
     OpenApiParameter,
     OpenApiTypes,
     extend_schema,
     extend_schema_view,
 )
-from rest_framework import mixins, status, viewsets
+from rest_framework import generics, mixins, status, viewsets
 from rest_framework.authentication import TokenAuthentication
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 
 from recipe import serializers
 
 
+def unknown_objects(exc):
+    """Return the response to ids of objects of other users"""
+    return Response(
+        {exc.field: [f"Unknown ids: {exc.ids}"]}, status=status.HTTP_400_BAD_REQUEST
+    )
+
+
 @extend_schema_view(
+    create=extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "duplicates",
+                OpenApiTypes.STR,
+                enum=list(serializers.DUPLICATE_MODES),
+                description="Flag a near-duplicate of an existing recipe, the "
+                "default, merge it into the existing recipe or allow it. Merging "
+                "adds the tags and ingredients to the existing recipe, keeps its "
+                "title and returns it with 200. Time, price, description or link "
+                "differing from it are refused with 409.",
+            ),
+        ]
+    ),
     list=extend_schema(
         parameters=[
             OpenApiParameter(
@@ -32,16 +69,21 @@ from recipe import serializers
                 description="Comma separated list of ingredient IDs to filter",
             ),
         ]
-    )
+    ),
 )
 class RecipeViewSets(viewsets.ModelViewSet):
     """Viewsets for Recipe list"""
 
     serializer_class = serializers.RecipeDetailSerializer
     queryset = models.Recipe.objects.all()
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [TokenAuthentication, BatchAuthentication]
     permission_classes = [IsAuthenticated]
 
+    @property
+    def throttle_scope(self):
+        """Count image uploads against the uploads budget"""
+        return "upload" if self.action == "upload_image" else None
+
     def _params_to_int(self, qs):
         """Convert a list of string to integer"""
         return [int(str_id) for str_id in qs.split(",")]
@@ -52,21 +94,27 @@ class RecipeViewSets(viewsets.ModelViewSet):
         ingredients = self.request.query_params.get("ingredients")
         queryset = self.queryset
 
+        # Subqueries on the join tables keep recipes unique without DISTINCT.
         if tags:
             tag_ids = self._params_to_int(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
+            queryset = queryset.filter(
+                id__in=models.Recipe.tags.through.objects.filter(
+                    tag_id__in=tag_ids
+                ).values("recipe_id")
+            )
 
         if ingredients:
             ing_ids = self._params_to_int(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ing_ids)
-
-        return (
-            queryset.filter(
-                user=self.request.user,
+            queryset = queryset.filter(
+                id__in=models.Recipe.ingredients.through.objects.filter(
+                    ingredient_id__in=ing_ids
+                ).values("recipe_id")
             )
-            .order_by("-id")
-            .distinct()
-        )
+
+        if self.action in ("list", "retrieve"):
+            queryset = queryset.prefetch_related("tags", "ingredients")
+
+        return queryset.filter(user=self.request.user).order_by("-id")
 
     def get_serializer_class(self):
         """Retrieve serializer class"""
@@ -74,9 +122,30 @@ class RecipeViewSets(viewsets.ModelViewSet):
             return serializers.RecipeSerializer
         elif self.action == "upload_image":
             return serializers.RecipeImageSerializer
+        elif self.action == "similar":
+            return serializers.SimilarRecipeSerializer
+        elif self.action == "bulk_update":
+            return serializers.RecipeBulkUpdateSerializer
+        elif self.action == "bulk_delete":
+            return serializers.RecipeBulkDeleteSerializer
 
         return self.serializer_class
 
+    def create(self, request, *args, **kwargs):
+        """Create a new recipe, or merge it into the recipe it duplicates"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        self.perform_create(serializer)
+
+        if getattr(serializer.instance, "merged", False):
+            return Response(serializer.data, status=status.HTTP_200_OK)
+
+        headers = self.get_success_headers(serializer.data)
+
+        return Response(
+            serializer.data, status=status.HTTP_201_CREATED, headers=headers
+        )
+
     def perform_create(self, serializer):
         """Create a new recipe"""
         serializer.save(user=self.request.user)
@@ -88,11 +157,257 @@ class RecipeViewSets(viewsets.ModelViewSet):
         serializer = self.get_serializer(recipe, data=request.data)
 
         if serializer.is_valid():
-            serializer.save()
+            with transaction.atomic():
+                recipe = serializer.save()
+                images.schedule_processing(recipe)
             return Response(serializer.data, status=status.HTTP_200_OK)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @extend_schema(responses=serializers.BulkResultSerializer)
+    @action(methods=["POST"], detail=False, url_path="bulk-update")
+    def bulk_update(self, request):
+        """Update the fields, tags and ingredients of many recipes at once"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            queryset = bulk.select_recipes(request.user, **serializer.selection())
+            counts = bulk.update_recipes(
+                request.user,
+                queryset,
+                serializer.validated_data.get("set"),
+                serializer.links(),
+            )
+        except bulk.UnknownObjects as exc:
+            return unknown_objects(exc)
+
+        return Response(counts)
+
+    @extend_schema(responses=serializers.BulkResultSerializer)
+    @action(methods=["POST"], detail=False, url_path="bulk-delete")
+    def bulk_delete(self, request):
+        """Delete many recipes at once"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            queryset = bulk.select_recipes(request.user, **serializer.selection())
+        except bulk.UnknownObjects as exc:
+            return unknown_objects(exc)
+
+        return Response({"deleted": bulk.delete_recipes(request.user, queryset)})
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "limit",
+                OpenApiTypes.INT,
+                description="Maximum number of recipes, 10 by default, at most 50",
+            ),
+        ],
+    )
+    @action(methods=["GET"], detail=True)
+    def similar(self, request, pk=None):
+        """List the recipes with the most similar tags and ingredients"""
+        recipe = self.get_object()
+        try:
+            limit = min(int(request.query_params.get("limit", 10)), 50)
+        except ValueError:
+            limit = 0
+        if limit < 1:
+            return Response(
+                {"limit": ["A positive integer is required."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        scores = dict(similarity.similar(recipe, limit))
+        recipes = models.Recipe.objects.filter(id__in=scores).prefetch_related(
+            "tags", "ingredients"
+        )
+        for similar_recipe in recipes:
+            similar_recipe.similarity = scores[similar_recipe.id]
+        recipes = sorted(recipes, key=lambda r: (-r.similarity, r.id))
+        serializer = self.get_serializer(recipes, many=True)
+
+        return Response(serializer.data)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "variant",
+                OpenApiTypes.STR,
+                description="Name of an image variant, the original if omitted",
+            ),
+        ],
+        responses={(200, "image/*"): OpenApiTypes.BINARY},
+    )
+    @action(
+        methods=["GET"],
+        detail=True,
+        renderer_classes=[JSONRenderer, media.ImageRenderer],
+    )
+    def image(self, request, pk=None):
+        """Deliver the recipe image or one of its variants"""
+        recipe = self.get_object()
+        variant = request.query_params.get("variant")
+        name = recipe.image_variants.get(variant) if variant else recipe.image.name
+
+        if not name:
+            raise Http404
+
+        return media.media_response(request, recipe.image.storage, name)
+
+
+# Recipe counts sort through the (user, -recipe_count, -id) index.
+ORDERINGS = {
+    "name": ["name"],
+    "-name": ["-name"],
+    "recipe_count": ["recipe_count", "id"],
+    "-recipe_count": ["-recipe_count", "-id"],
+}
+
+
+class RecipeStatsView(generics.RetrieveAPIView):
+    """Recipe statistics of the authenticated user"""
+
+    serializer_class = serializers.RecipeStatsSerializer
+    authentication_classes = [TokenAuthentication, BatchAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get_object(self):
+        """Read the maintained statistics, empty until the first recipe"""
+        user = self.request.user
+        stats = models.RecipeStats.objects.filter(user=user).first()
+
+        return stats or models.RecipeStats(user=user)
+
+
+class ShoppingListView(generics.GenericAPIView):
+    """Aggregate the ingredients of a set of recipes"""
+
+    serializer_class = serializers.ShoppingListRequestSerializer
+    authentication_classes = [TokenAuthentication, BatchAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(responses=serializers.ShoppingListSerializer)
+    def post(self, request):
+        """Return the ingredients of the recipes with counts and totals"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            result = shopping.shopping_list(
+                request.user, serializer.validated_data["recipes"]
+            )
+        except shopping.UnknownRecipes as exc:
+            return Response(
+                {"recipes": [f"Unknown recipe ids: {exc.ids}"]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        return Response(serializers.ShoppingListSerializer(result).data)
+
+
+class RecipeCostView(generics.GenericAPIView):
+    """Cost a batch of recipes, each scaled by a factor"""
+
+    serializer_class = serializers.RecipeCostSerializer
+    authentication_classes = [TokenAuthentication, BatchAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        """Return the scaled prices of the recipes with totals"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data["recipes"]
+
+        try:
+            result = shopping.cost(
+                request.user,
+                [item["id"] for item in items],
+                [item["scale"] for item in items],
+            )
+        except shopping.UnknownRecipes as exc:
+            return Response(
+                {"recipes": [f"Unknown recipe ids: {exc.ids}"]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        return Response(self.get_serializer(result).data)
+
+
+class SyncView(generics.GenericAPIView):
+    """Recipes, tags and ingredients changed since a cursor"""
+
+    serializer_class = serializers.SyncSerializer
+    authentication_classes = [TokenAuthentication, BatchAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "since",
+                OpenApiTypes.INT,
+                description="Cursor of the last sync, 0 or omitted for everything",
+            ),
+            OpenApiParameter(
+                "limit",
+                OpenApiTypes.INT,
+                description="Maximum number of changes, 500 by default, at most 1000",
+            ),
+        ],
+    )
+    def get(self, request):
+        """Return the objects changed and the ids deleted since the cursor"""
+        user = request.user
+        try:
+            since = int(request.query_params.get("since", 0))
+            limit = min(int(request.query_params.get("limit", 500)), 1000)
+        except ValueError:
+            return Response(
+                {"detail": "since and limit must be integers."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if since < 0 or limit < 1 or since > sync.current(user):
+            return Response(
+                {"since": ["Unknown cursor, sync again from 0."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        changes = sync.changes(user, since, limit + 1)
+        more = len(changes) > limit
+        changes = changes[:limit]
+
+        changed = {kind: [] for kind in models.Change.Kind.values}
+        deleted = {kind: [] for kind in models.Change.Kind.values}
+        for kind, object_id, is_deleted, _ in changes:
+            (deleted if is_deleted else changed)[kind].append(object_id)
+
+        recipes = models.Recipe.objects.none()
+        if changed["recipe"]:
+            recipes = models.Recipe.objects.filter(
+                user=user, id__in=changed["recipe"]
+            ).prefetch_related("tags", "ingredients")
+
+        result = {
+            "cursor": changes[-1][3] if changes else since,
+            "more": more,
+            "recipes": recipes.order_by("id"),
+            "tags": models.Tag.objects.filter(user=user, id__in=changed["tag"]),
+            "ingredients": models.Ingredient.objects.filter(
+                user=user, id__in=changed["ingredient"]
+            ),
+            "deleted": {
+                "recipes": deleted["recipe"],
+                "tags": deleted["tag"],
+                "ingredients": deleted["ingredient"],
+            },
+        }
+
+        return Response(self.get_serializer(result).data)
+
 
 @extend_schema_view(
     list=extend_schema(
@@ -103,6 +418,13 @@ class RecipeViewSets(viewsets.ModelViewSet):
                 enum=[0, 1],
                 description="Filter by items assigned to recipes.",
             ),
+            OpenApiParameter(
+                "ordering",
+                OpenApiTypes.STR,
+                enum=list(ORDERINGS),
+                description="Sort by name or by number of recipes, "
+                "descending with a leading minus.",
+            ),
         ]
     )
 )
@@ -114,7 +436,7 @@ class BaseRecipeAttrViewSet(
 ):
     """Base viewset for recipe attributes"""
 
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [TokenAuthentication, BatchAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
@@ -123,9 +445,73 @@ class BaseRecipeAttrViewSet(
         queryset = self.queryset
 
         if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
+            through = queryset.model.recipe_set.through
+            queryset = queryset.filter(
+                Exists(
+                    through.objects.filter(
+                        **{queryset.model._meta.model_name: OuterRef("pk")}
+                    )
+                )
+            )
+
+        ordering = ORDERINGS.get(self.request.query_params.get("ordering"), ["-name"])
+
+        return queryset.filter(user=self.request.user).order_by(*ordering)
+
+    def get_serializer_class(self):
+        """Retrieve serializer class"""
+        if self.action == "bulk_update":
+            return serializers.AttrBulkUpdateSerializer
+        elif self.action == "bulk_delete":
+            return serializers.AttrBulkDeleteSerializer
+
+        return self.serializer_class
+
+    def perform_update(self, serializer):
+        """Rename an item, unless another one has the name"""
+        try:
+            with transaction.atomic():
+                serializer.save()
+        except IntegrityError:
+            raise ValidationError(
+                {"name": ["You already have an item with this name."]}
+            )
+
+    @extend_schema(responses=serializers.BulkResultSerializer)
+    @action(methods=["POST"], detail=False, url_path="bulk-update")
+    def bulk_update(self, request):
+        """Rename many items at once"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            renamed = bulk.rename_attrs(
+                self.queryset.model, request.user, serializer.validated_data["names"]
+            )
+        except bulk.UnknownObjects as exc:
+            return unknown_objects(exc)
+        except bulk.DuplicateNames as exc:
+            return Response(
+                {"names": [f"Names already used: {exc.names}"]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
-        return queryset.filter(user=self.request.user).order_by("-name").distinct()
+        return Response({"updated": renamed})
+
+    @extend_schema(responses=serializers.BulkResultSerializer)
+    @action(methods=["POST"], detail=False, url_path="bulk-delete")
+    def bulk_delete(self, request):
+        """Delete many items at once"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        model = self.queryset.model
+
+        try:
+            queryset = bulk.select_attrs(model, request.user, **serializer.selection())
+        except bulk.UnknownObjects as exc:
+            return unknown_objects(exc)
+
+        return Response({"deleted": bulk.delete_attrs(model, request.user, queryset)})
 
 
 class TagViewSets(BaseRecipeAttrViewSet):
@@ -140,3 +526,88 @@ class IngredientViewSets(BaseRecipeAttrViewSet):
 
     queryset = models.Ingredient.objects.all()
     serializer_class = serializers.IngredientSerializer
+
+
+class ImageUploadViewSets(
+    mixins.CreateModelMixin,
+    mixins.RetrieveModelMixin,
+    mixins.DestroyModelMixin,
+    viewsets.GenericViewSet,
+):
+    """Viewsets for chunked, resumable recipe image uploads"""
+
+    serializer_class = serializers.ImageUploadSerializer
+    queryset = models.ImageUpload.objects.all()
+    authentication_classes = [TokenAuthentication, BatchAuthentication]
+    permission_classes = [IsAuthenticated]
+    throttle_scope = "upload"
+
+    def get_queryset(self):
+        """Retrieve uploads of only the authenticated user"""
+        return self.queryset.filter(user=self.request.user)
+
+    def perform_create(self, serializer):
+        """Start a new upload"""
+        upload = serializer.save(user=self.request.user)
+        uploads.start(upload)
+
+    def perform_destroy(self, instance):
+        """Abort an upload"""
+        uploads.discard(instance)
+
+    @extend_schema(
+        request=OpenApiTypes.BINARY,
+        parameters=[
+            OpenApiParameter(
+                "Content-Range",
+                OpenApiTypes.STR,
+                OpenApiParameter.HEADER,
+                required=True,
+                description="Byte range of the chunk, e.g. 'bytes 0-1048575/4200000'",
+            ),
+        ],
+    )
+    @action(methods=["PUT"], detail=True)
+    def chunk(self, request, pk=None):
+        """Append a chunk of raw bytes to the upload"""
+        with transaction.atomic():
+            upload = get_object_or_404(self.get_queryset().select_for_update(), pk=pk)
+            try:
+                first, last = uploads.parse_content_range(
+                    request.headers.get("Content-Range"), upload.size
+                )
+                uploads.write_chunk(upload, request.stream, first, last)
+            except uploads.OffsetMismatch as exc:
+                error = Response(
+                    {"detail": str(exc), "received": upload.received},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            except uploads.UploadError as exc:
+                error = Response(
+                    {"detail": str(exc), "received": upload.received},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            else:
+                error = None
+
+        if error is not None:
+            return error
+
+        return Response(self.get_serializer(upload).data, status=status.HTTP_200_OK)
+
+    @extend_schema(request=None, responses=serializers.RecipeImageSerializer)
+    @action(methods=["POST"], detail=True)
+    def finalize(self, request, pk=None):
+        """Verify the complete upload and make it the recipe image"""
+        with transaction.atomic():
+            upload = get_object_or_404(self.get_queryset().select_for_update(), pk=pk)
+            try:
+                recipe = uploads.finish(upload)
+            except uploads.UploadError as exc:
+                return Response(
+                    {"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST
+                )
+
+        return Response(
+            serializers.RecipeImageSerializer(recipe).data, status=status.HTTP_200_OK
+        )
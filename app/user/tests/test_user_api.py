@@ -2,6 +2,7 @@
 Tests for the user API.
 """
 
+from core import models
 from django.contrib.auth import get_user_model
 from django.test import TestCase
 from django.urls import reverse
@@ -164,3 +165,17 @@ class PrivateUserAPITests(TestCase):
         self.assertEqual(self.user.name, payload["name"])
         self.assertTrue(self.user.check_password(payload["password"]))
         self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_delete_user(self):
+        """Test deleting deactivates the user and queues purging their data"""
+        res = self.client.delete(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertIsNotNone(self.user.deleted_at)
+        self.assertTrue(models.Job.objects.filter(kind="purge_user").exists())
+        res = APIClient().post(
+            TOKEN_URL, {"email": self.user.email, "password": "testpass123"}
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -2,8 +2,12 @@
 Views for the user API.
 """
 
-from rest_framework import authentication, generics, permissions
+from core import purge
+from core.authentication import BatchAuthentication
+from core.throttling import AnonRateThrottle
+from rest_framework import authentication, generics, permissions, status
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
 
 from user.serializers import AuthTokenSerializer, UserSerializer
@@ -20,15 +24,25 @@ class CreateTokenView(ObtainAuthToken):
 
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    # Anonymous by design, so guessed passwords count against the IP.
+    authentication_classes = []
+    throttle_classes = [AnonRateThrottle]
+    throttle_scope = "token"
 
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
-    """Update user"""
+class ManageUserView(generics.RetrieveUpdateDestroyAPIView):
+    """Update or delete user"""
 
     serializer_class = UserSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [authentication.TokenAuthentication, BatchAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
         """Retrieve the authenticated user"""
         return self.request.user
+
+    def destroy(self, request, *args, **kwargs):
+        """Deactivate the user now, their data is purged in the background"""
+        purge.delete_user(self.get_object())
+
+        return Response(status=status.HTTP_202_ACCEPTED)
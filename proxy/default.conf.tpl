@@ -1,9 +1,24 @@
 server {
     listen ${LISTEN_PORT};
 
+    location /static/media {
+        deny all;
+    }
     location /static {
         alias /vol/static;
     }
+    location /protected-media/ {
+        internal;
+        alias /vol/static/media/;
+        etag off;
+        add_header ETag $upstream_http_etag;
+    }
+    location ~ ^/api/recipe/uploads/[^/]+/chunk/$ {
+        uwsgi_pass              ${APP_HOST}:${APP_PORT};
+        include                 /etc/nginx/uwsgi_params;
+        client_max_body_size     5M;
+        uwsgi_request_buffering  off;
+    }
     location / {
         uwsgi_pass              ${APP_HOST}:${APP_PORT};
         include                 /etc/nginx/uwsgi_params;
@@ -2,8 +2,18 @@
 
 set -e
 
+# Shared metric files of the uWSGI workers, stale ones would be summed in.
+export PROMETHEUS_MULTIPROC_DIR=/vol/metrics
+rm -rf "$PROMETHEUS_MULTIPROC_DIR"/*
+
+# Per worker query logs, merged by the slow_queries command.
+export QUERY_LOG_DIR=/vol/querylog
+rm -rf "$QUERY_LOG_DIR"/*
+
 python manage.py wait_for_db
 python manage.py collectstatic --noinput
 python manage.py migrate
+# Recipes created before the similarity index or without signals.
+python manage.py rebuild_similarity_index --missing
 
 uwsgi --socket :9000 --workers 4 --master --enable-threads --module app.wsgi
\ No newline at end of file